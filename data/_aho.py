@@ -0,0 +1,81 @@
+# python
+"""
+Automate Aho-Corasick sur les synonymes normalisés de CATEGORIES.
+
+Permet de retrouver les catégories citées dans une phrase libre
+("je cherche une boulangerie pas chère près de Lyon") en UN seul passage
+sur le texte, au lieu d'un test `in` par synonyme.
+Construit une seule fois à l'import (pur Python, pas de dépendance).
+"""
+from collections import deque
+from typing import Dict, List, Tuple
+
+from data.categories import SYNONYM_INDEX, _norm
+
+# Noeud i : transitions _GOTO[i], lien d'échec _FAIL[i], sorties _OUT[i] (synonyme, category_key)
+_GOTO: List[Dict[str, int]] = [{}]
+_FAIL: List[int] = [0]
+_OUT: List[List[Tuple[str, str]]] = [[]]
+
+
+def _build(index: Dict[str, str]) -> None:
+    for word, category_key in index.items():
+        if not word:
+            continue
+        state = 0
+        for ch in word:
+            nxt = _GOTO[state].get(ch)
+            if nxt is None:
+                nxt = len(_GOTO)
+                _GOTO.append({})
+                _FAIL.append(0)
+                _OUT.append([])
+                _GOTO[state][ch] = nxt
+            state = nxt
+        _OUT[state].append((word, category_key))
+
+    # BFS : liens d'échec + fusion des sorties
+    queue = deque(_GOTO[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, nxt in _GOTO[state].items():
+            queue.append(nxt)
+            fail = _FAIL[state]
+            while fail and ch not in _GOTO[fail]:
+                fail = _FAIL[fail]
+            _FAIL[nxt] = _GOTO[fail].get(ch, 0)
+            _OUT[nxt] = _OUT[nxt] + _OUT[_FAIL[nxt]]
+
+
+_build(SYNONYM_INDEX)
+
+
+def _is_boundary(text: str, idx: int) -> bool:
+    return idx < 0 or idx >= len(text) or not text[idx].isalnum()
+
+
+def match_query(text: str) -> List[str]:
+    """
+    Retourne les category_key dont un synonyme apparaît (mot entier) dans `text`,
+    sans doublon, le synonyme le plus long (= le plus spécifique) en premier.
+    """
+    norm = _norm(text)
+    hits: List[Tuple[int, int, str]] = []  # (-longueur, position, category_key)
+
+    state = 0
+    for end, ch in enumerate(norm):
+        while state and ch not in _GOTO[state]:
+            state = _FAIL[state]
+        state = _GOTO[state].get(ch, 0)
+        for word, category_key in _OUT[state]:
+            start = end - len(word) + 1
+            if _is_boundary(norm, start - 1) and _is_boundary(norm, end + 1):
+                hits.append((-len(word), start, category_key))
+
+    seen = set()
+    keys: List[str] = []
+    for _, _, category_key in sorted(hits):
+        if category_key not in seen:
+            seen.add(category_key)
+            keys.append(category_key)
+    return keys
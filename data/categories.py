@@ -1,7 +1,22 @@
 # python
-from typing import List, Dict, Any
+import functools
+import sys
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple
 
-CATEGORIES: List[Dict[str, Any]] = [
+
+@dataclass(frozen=True, slots=True)
+class Category:
+    label: str
+    key: str
+    sel_type: str    # tag OSM (ex: "shop", "amenity")
+    sel_value: str   # valeur OSM (ex: "bakery")
+    synonyms: Tuple[str, ...]
+
+
+# Définitions lisibles (format historique) -> converties en CATEGORIES plus bas.
+_CATEGORY_DEFS: List[Dict[str, Any]] = [
     # -----------------------------
     # FOOD / BOISSON
     # -----------------------------
@@ -600,3 +615,41 @@ CATEGORIES: List[Dict[str, Any]] = [
         "synonyms": ["déchetterie", "dechetterie", "dépôt déchets", "depot dechets"],
     },
 ]
+
+
+# Chaînes internées : les doublons ("vélo", "bricolage", "amenity"...) partagent
+# un seul objet et les lookups dans les index comparent d'abord par identité.
+CATEGORIES: Tuple[Category, ...] = tuple(
+    Category(
+        label=sys.intern(d["label"]),
+        key=sys.intern(d["key"]),
+        sel_type=sys.intern(d["selector"]["type"]),
+        sel_value=sys.intern(d["selector"]["value"]),
+        synonyms=tuple(sys.intern(syn) for syn in d.get("synonyms") or ()),
+    )
+    for d in _CATEGORY_DEFS
+)
+del _CATEGORY_DEFS
+
+
+@functools.lru_cache(maxsize=4096)
+def _norm(s: str) -> str:
+    """Minuscules + suppression des accents (clé des index ci-dessous)."""
+    return unicodedata.normalize("NFKD", s or "").encode("ascii", "ignore").decode().lower().strip()
+
+
+# Index construits une seule fois à l'import.
+# Priorité identique à l'ancien scan linéaire : key > label > synonyms
+# (setdefault => la première catégorie déclarée gagne en cas de doublon).
+KEY_INDEX: Dict[str, Category] = {c.key: c for c in CATEGORIES}
+SELECTOR_BY_KEY: Dict[str, Tuple[str, str]] = {c.key: (c.sel_type, c.sel_value) for c in CATEGORIES}
+
+SYNONYM_INDEX: Dict[str, str] = {}
+for _cat in CATEGORIES:
+    SYNONYM_INDEX.setdefault(sys.intern(_norm(_cat.key)), _cat.key)
+for _cat in CATEGORIES:
+    SYNONYM_INDEX.setdefault(sys.intern(_norm(_cat.label)), _cat.key)
+for _cat in CATEGORIES:
+    for _syn in _cat.synonyms:
+        SYNONYM_INDEX.setdefault(sys.intern(_norm(_syn)), _cat.key)
+del _cat, _syn
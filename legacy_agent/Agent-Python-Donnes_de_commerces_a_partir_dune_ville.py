@@ -1,26 +1,39 @@
 # python
 import argparse
+import functools
 import json
-import xml.etree.ElementTree as ET
+import logging
+import mmap
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 from langchain_core.messages import ToolMessage, SystemMessage
 import re
 import unicodedata
-from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 import os
 import time
 import random
 import requests
-import difflib
-import re
-import unicodedata
-from data.categories import CATEGORIES
-
-load_dotenv()
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict, deque
+from contextlib import closing
+from requests.adapters import HTTPAdapter
+from rapidfuzz import fuzz, process
+import orjson
+from data._aho import match_query
+from data.categories import (
+    CATEGORIES,
+    KEY_INDEX,
+    SELECTOR_BY_KEY,
+    SYNONYM_INDEX,
+    Category,
+    _norm,
+)
 
 
 
@@ -69,8 +82,35 @@ SYSTEM_MESSAGE = (
 
 
 
+logger = logging.getLogger(__name__)
+
+# Regex de normalisation compilées une seule fois (hot path matching/slug)
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_MULTI_UNDERSCORE_RE = re.compile(r"_+")
+_NON_WORD_RE = re.compile(r"[^a-z0-9\s_-]+")
+_WS_RE = re.compile(r"\s+")
+
+class _AccentTable(dict):
+    """
+    Table str.translate de suppression des diacritiques (après NFKD), remplie à la demande :
+    chaque code point rencontré n'est testé qu'une fois avec unicodedata.combining,
+    au lieu de balayer tout le BMP à l'import.
+    """
+
+    def __missing__(self, cp: int) -> int | None:
+        value = None if unicodedata.combining(chr(cp)) else cp
+        self[cp] = value
+        return value
+
+
+_ACCENT_TABLE = _AccentTable()
+# Variante pour _normalize_text : "-" et "_" deviennent des espaces dans la même passe
+_NORMALIZE_TABLE = _AccentTable({ord("-"): " ", ord("_"): " "})
+
+
 MAX_HISTORY = 20        # maîtrise la mémoire (coût / stabilité)
 MAX_TOOL_STEPS = 30      # évite les boucles infinies tool -> tool -> tool
+MAX_PARALLEL_TOOLS = 4   # tool_calls d'une même réponse LLM exécutés en parallèle
 
 
 
@@ -86,65 +126,91 @@ NOMINATIM_MIRRORS = (
     "https://nominatim.openstreetmap.fr/search",
 )
 
+# Nominatim exige un User-Agent explicite (et idéalement un contact)
+USER_AGENT = "MyAI-Agent/1.0 (contact: kylian.strub@icloud.com)"
+
+
+def _build_session() -> requests.Session:
+    """
+    Session HTTP partagée : keep-alive + pool de connexions par hôte
+    (évite un handshake TCP/TLS à chaque appel Overpass/Nominatim).
+    Les retries restent gérés par _request_with_retry (bascule entre miroirs).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+SESSION = _build_session()
+
+# Hedging miroirs : délai avant de lancer le miroir suivant si le premier n'a pas répondu.
+# Overpass répond en plusieurs secondes => délai plus long pour ne pas doubler la charge.
+# Nominatim n'est jamais doublé (politique d'usage : 1 req/s, pas de requêtes en double) :
+# bascule séquentielle sur le miroir suivant uniquement après un échec.
+OVERPASS_HEDGE_DELAY = 3.0
+
+# Circuit breaker par miroir : après N échecs consécutifs, le miroir est ignoré pendant un cooldown
+MIRROR_FAILURE_THRESHOLD = 3
+MIRROR_COOLDOWN_SECONDS = 60.0
+
+# Cache géocodage : LRU mémoire + SQLite sur disque (persiste entre les runs)
+GEOCODE_CACHE_PATH = Path("data/cache/nominatim.sqlite")
+GEOCODE_MEMO_SIZE = 512
+GEOCODE_TTL_SECONDS = 30 * 24 * 3600  # une bbox de ville ne bouge pas, mais on rafraîchit tous les 30 jours
+
+# Dossier des JSON résultats (write_json)
+RESULT_DIR = Path("data/result")
+
+# Précision des coordonnées écrites dans les JSON résultats
+COORD_DECIMALS = 6
+
 
 # =========================================================
 # 2) TOOLS (AJOUTE ICI TES OUTILS)
 # =========================================================
 
 # python
-def _get_selector(cat: dict) -> tuple[str, str] | None:
-    """
-    Supporte 2 formats :
-    - { selector: { type, value } }
-    - { type, value }
-    Retourne (key, value) ou None si invalide.
-    """
-    sel = cat.get("selector")
-    if isinstance(sel, dict):
-        k = sel.get("type")
-        v = sel.get("value")
-        if k and v:
-            return k, v
-
-    # fallback format plat
-    k = cat.get("type")
-    v = cat.get("value")
-    if k and v:
-        return k, v
-
-    return None
-
-
-def _parse_overpass_xml(xml_text: str) -> List[Dict[str, Any]]:
+def _parse_overpass_json(body: bytes) -> List[Dict[str, Any]]:
     """
-    Parse XML Overpass et renvoie une liste MINIMALE et exploitable :
+    Parse la réponse JSON Overpass ([out:json], bytes bruts) et renvoie une liste MINIMALE et exploitable :
     - id, name, lat, lon
     - ignore les éléments sans name/lat/lon
+    - dédoublonne à la volée sur (type, id) (unions de sélecteurs qui se recouvrent)
+    - lat/lon arrondis à 6 décimales (~0,11 m à l'équateur) : précision largement
+      suffisante pour des commerces, et un JSON de sortie plus compact
     """
-    root = ET.fromstring(xml_text)
+    data = orjson.loads(body)  # parse les bytes directement (C), sans passer par str
     results: List[Dict[str, Any]] = []
+    append = results.append  # méthode liée hoistée hors de la boucle (milliers de nodes)
+    seen: set[tuple[str, int]] = set()
 
-    for node in root.findall("node"):
-        node_id = node.attrib.get("id")
-        lat = node.attrib.get("lat")
-        lon = node.attrib.get("lon")
+    for el in data.get("elements", []):
+        el_type = el.get("type")
+        if el_type != "node":
+            continue
 
-        # récupérer le tag name
-        name = None
-        for tag in node.findall("tag"):
-            if tag.attrib.get("k") == "name":
-                name = tag.attrib.get("v")
-                break
+        node_id = el.get("id")
+        uid = (el_type, node_id)
+        if uid in seen:
+            continue
+        seen.add(uid)
+        lat = el.get("lat")
+        lon = el.get("lon")
+        name = (el.get("tags") or {}).get("name")
 
         # On ignore si pas exploitable
-        if not node_id or not name or not lat or not lon:
+        if node_id is None or not name or lat is None or lon is None:
             continue
 
-        results.append({
-            "id": node_id,
+        # clés littérales : constantes déjà internées et partagées par tous les dicts
+        append({
+            "id": str(node_id),
             "name": name,
-            "lat": float(lat),
-            "lon": float(lon),
+            "lat": round(float(lat), COORD_DECIMALS),
+            "lon": round(float(lon), COORD_DECIMALS),
         })
 
     return results
@@ -152,6 +218,37 @@ def _parse_overpass_xml(xml_text: str) -> List[Dict[str, Any]]:
 
 
 
+def build_overpass(
+    selectors: Iterable[tuple[str, str]],
+    bbox: tuple[float, float, float, float],
+    timeout_seconds: int = 25,
+) -> str:
+    """
+    Construit UNE requête Overpass (union) pour plusieurs tags OSM (key, value).
+    - bbox = (south, west, north, east)
+    - les valeurs d'un même tag sont regroupées dans un seul filtre regex
+      (ex: amenity=school partagé par école/collège/lycée => une seule fois)
+    """
+    south, west, north, east = bbox
+    area = f"({south},{west},{north},{east})"
+
+    by_type: Dict[str, List[str]] = {}
+    for sel_type, sel_value in selectors:
+        values = by_type.setdefault(sel_type, [])
+        if sel_value not in values:
+            values.append(sel_value)
+
+    clauses: List[str] = []
+    for sel_type, values in by_type.items():
+        if len(values) == 1:
+            clauses.append(f'  node["{sel_type}"="{values[0]}"]{area};')
+        else:
+            clauses.append(f'  node["{sel_type}"~"^({"|".join(values)})$"]{area};')
+
+    body = "\n".join(clauses)
+    return f"[out:json][timeout:{timeout_seconds}];\n(\n{body}\n);\nout;"
+
+
 # python
 @tool
 def overpass_places_bbox(
@@ -167,48 +264,112 @@ def overpass_places_bbox(
     Récupère des POI dans une bbox selon un tag OSM key=value.
     Ajout: retry auto sur 504/503/502/429 + timeouts.
     """
-    query = f"""
-    [out:xml][timeout:{timeout_seconds}];
-    (
-      node[{key}={value}]({south},{west},{north},{east});
-    );
-    out;
-    """.strip()
-
-    response = None
-    errors: List[str] = []
-    for base_url in OVERPASS_MIRRORS:
-        try:
-            response = _request_with_retry(
-                "POST",
-                base_url,
-                data={"data": query},
-                headers={"Accept": "application/osm3s+xml"},
-                timeout=timeout_seconds + 5,
-                max_retries=4,
-                base_delay=1.2,
-            )
-            break
-        except Exception as exc:
-            errors.append(f"{base_url}: {exc}")
-            response = None
+    query = build_overpass([(key, value)], (south, west, north, east), timeout_seconds)
 
-    if response is None:
-        error_text = " ; ".join(errors) if errors else "Overpass indisponible"
+    try:
+        response = _hedged_request(
+            "POST",
+            OVERPASS_MIRRORS,
+            hedge_delay=OVERPASS_HEDGE_DELAY,
+            data={"data": query},
+            headers={"Accept": "application/json"},
+            timeout=timeout_seconds + 5,
+            max_retries=4,
+            base_delay=1.2,
+            stream=True,
+        )
+    except Exception as exc:
         return {
             "ok": False,
-            "error": f"HTTP error: {error_text}",
+            "error": f"HTTP error: {exc}",
         }
 
+    # stream=True : seul le miroir gagnant télécharge le corps ; on le lit d'un bloc
+    # (orjson ne parse pas incrémentalement) puis on rend la connexion au pool.
     try:
-        items = _parse_overpass_xml(response.text)
-    except ET.ParseError as e:
-        return {"ok": False, "error": f"XML parse error: {e}", "raw": response.text[:500]}
+        body = response.content
+    except requests.RequestException as exc:
+        return {"ok": False, "error": f"HTTP error: {exc}"}
+    finally:
+        response.close()
+
+    try:
+        items = _parse_overpass_json(body)
+    except orjson.JSONDecodeError as e:
+        return {"ok": False, "error": f"JSON parse error: {e}", "raw": response.text[:500]}
 
     return {"ok": True, "count": len(items), "items": items}
 
 
 
+# python
+_GEOCODE_MEMO: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()  # key -> (créé à, geo)
+_GEOCODE_MEMO_LOCK = threading.Lock()  # tool_calls parallèles (run_agent)
+
+
+def _geocode_cache_key(city: str, country: str) -> str:
+    """"Lyon", "lyon ", "LYÖN" => même clé."""
+    canon = " ".join(_norm(city).split()) + "|" + " ".join(_norm(country).split())
+    return hashlib.sha1(canon.encode("utf-8")).hexdigest()
+
+
+def _geocode_db() -> sqlite3.Connection:
+    GEOCODE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(GEOCODE_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geocode "
+        "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    return conn
+
+
+def _geocode_memo_put(key: str, value: Dict[str, Any], created_at: float) -> None:
+    with _GEOCODE_MEMO_LOCK:
+        _GEOCODE_MEMO[key] = (created_at, value)
+        _GEOCODE_MEMO.move_to_end(key)
+        while len(_GEOCODE_MEMO) > GEOCODE_MEMO_SIZE:
+            _GEOCODE_MEMO.popitem(last=False)
+
+
+def _geocode_cache_get(key: str) -> Dict[str, Any] | None:
+    min_created_at = time.time() - GEOCODE_TTL_SECONDS
+    with _GEOCODE_MEMO_LOCK:
+        hit = _GEOCODE_MEMO.get(key)
+        if hit is not None:
+            if hit[0] >= min_created_at:
+                _GEOCODE_MEMO.move_to_end(key)
+                return hit[1]
+            del _GEOCODE_MEMO[key]
+
+    try:
+        with closing(_geocode_db()) as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM geocode WHERE key = ? AND created_at >= ?",
+                (key, min_created_at),
+            ).fetchone()
+    except sqlite3.Error:
+        return None  # cache best-effort : jamais bloquant
+    if row is None:
+        return None  # absent ou expiré : l'appel Nominatim réécrira l'entrée
+
+    value = json.loads(row[0])
+    _geocode_memo_put(key, value, row[1])
+    return value
+
+
+def _geocode_cache_set(key: str, value: Dict[str, Any]) -> None:
+    now = time.time()
+    _geocode_memo_put(key, value, now)
+    try:
+        with closing(_geocode_db()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now),
+            )
+    except sqlite3.Error:
+        pass
+
+
 @tool
 def city_to_bbox(city: str, country: str = "France", timeout_seconds: int = 10) -> Dict[str, Any]:
     """
@@ -229,6 +390,12 @@ def city_to_bbox(city: str, country: str = "France", timeout_seconds: int = 10)
       {"ok": False, "error": "..."}
     """
 
+    # 0) Cache (seuls les succès sont mis en cache)
+    cache_key = _geocode_cache_key(city, country)
+    cached = _geocode_cache_get(cache_key)
+    if cached is not None:
+        return {"ok": True, "city": city, **cached}
+
     # 1) Construire la requête de géocodage
     # "q" = texte libre : ville + pays (évite les collisions)
     params = {
@@ -238,39 +405,23 @@ def city_to_bbox(city: str, country: str = "France", timeout_seconds: int = 10)
         "addressdetails": 0,
     }
 
-    # 2) Nominatim exige un User-Agent explicite (et idéalement un contact)
-    headers = {
-        "User-Agent": "MyAI-Agent/1.0 (contact: kylian.strub@icloud.com)"
-    }
-
-    data = None
-    response = None
-    errors: List[str] = []
-    for base_url in NOMINATIM_MIRRORS:
-        try:
-            response = _request_with_retry(
-                "GET",
-                base_url,
-                params=params,
-                headers=headers,
-                timeout=timeout_seconds,
-                max_retries=3,
-                base_delay=0.8,
-            )
-        except Exception as exc:
-            errors.append(f"{base_url}: {exc}")
-            response = None
-            continue
-
-        try:
-            data = response.json()
-        except ValueError as e:
-            return {"ok": False, "error": f"JSON parse error: {e}"}
-        break
+    try:
+        response = _hedged_request(
+            "GET",
+            NOMINATIM_MIRRORS,
+            hedge_delay=None,
+            params=params,
+            timeout=timeout_seconds,
+            max_retries=3,
+            base_delay=0.8,
+        )
+    except Exception as exc:
+        return {"ok": False, "error": f"HTTP error: {exc}"}
 
-    if response is None:
-        error_text = " ; ".join(errors) if errors else "Nominatim indisponible"
-        return {"ok": False, "error": f"HTTP error: {error_text}"}
+    try:
+        data = response.json()
+    except ValueError as e:
+        return {"ok": False, "error": f"JSON parse error: {e}"}
 
     # 3) Vérifier qu'on a un résultat
     if not data:
@@ -289,15 +440,16 @@ def city_to_bbox(city: str, country: str = "France", timeout_seconds: int = 10)
     except Exception as e:
         return {"ok": False, "error": f"boundingbox manquante ou invalide: {e}"}
 
-    return {
-        "ok": True,
-        "city": city,
+    geo = {
         "display_name": best.get("display_name"),
         "south": south,
         "west": west,
         "north": north,
         "east": east,
     }
+    _geocode_cache_set(cache_key, geo)
+
+    return {"ok": True, "city": city, **geo}
 
 # python
 @tool
@@ -312,23 +464,33 @@ def write_json(filepath: str, data: dict) -> dict:
     - count (si data["items"] existe)
     """
     try:
-        # 1) Dossier cible
-        base_dir = "data/result"
-        os.makedirs(base_dir, exist_ok=True)
+        # 1) Nettoyage du nom de fichier (sécurité) => toujours dans RESULT_DIR
+        final_path = RESULT_DIR / os.path.basename(filepath)
 
-        # 2) Nettoyage du nom de fichier (sécurité)
-        filename = os.path.basename(filepath)
-        full_path = os.path.join(base_dir, filename)
+        # 2) Sérialisation JSON (orjson : bytes UTF-8 directement)
+        raw = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
 
-        # 3) Écriture JSON
-        with open(full_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 3) Écriture atomique : un crash ne laisse jamais un JSON tronqué à la place du fichier final.
+        # Le dossier n'est créé qu'au premier échec (pas de makedirs/stat à chaque appel).
+        # Fichier temporaire propre à chaque écriture : deux exécutions pour la même ville/catégorie
+        # ne se partagent pas le même .tmp (pas de replace sur un fichier déjà déplacé ou à moitié écrit).
+        tmp_path = final_path.with_name(f"{final_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            try:
+                tmp_path.write_bytes(raw)
+            except FileNotFoundError:
+                RESULT_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_bytes(raw)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
 
         count = len(data.get("items", [])) if isinstance(data, dict) else None
 
         return {
             "ok": True,
-            "filepath": full_path,
+            "filepath": str(final_path),
             "count": count,
         }
 
@@ -340,40 +502,56 @@ def write_json(filepath: str, data: dict) -> dict:
 
 
 # python
-def _expand_bbox(bbox: Dict[str, float], ratio: float = 0.35) -> Dict[str, float]:
+def expand_bounds(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    ratio: float,
+) -> tuple[float, float, float, float]:
     """
-    Agrandit une bbox en % autour de son centre.
-    ratio=0.35 => +35% en hauteur et largeur (de chaque côté).
+    Calcul pur (scalaires uniquement) de l'agrandissement d'une bbox.
+    Retourne (south, west, north, east) ; bbox inchangée si dégénérée.
     """
-    ratio = max(0.0, min(float(ratio), 1.0))  # clamp 0..1 (sécurité)
-
-    south, west, north, east = bbox["south"], bbox["west"], bbox["north"], bbox["east"]
+    ratio = max(0.0, min(ratio, 1.0))  # clamp 0..1 (sécurité)
 
     height = north - south
     width = east - west
 
     # si bbox trop petite (cas bizarre) -> on évite division/0
     if height <= 0 or width <= 0:
-        return bbox
+        return south, west, north, east
 
     pad_h = height * ratio
     pad_w = width * ratio
 
-    new_south = max(-90.0, south - pad_h)
-    new_north = min(90.0, north + pad_h)
-    new_west = max(-180.0, west - pad_w)
-    new_east = min(180.0, east + pad_w)
+    return (
+        max(-90.0, south - pad_h),
+        max(-180.0, west - pad_w),
+        min(90.0, north + pad_h),
+        min(180.0, east + pad_w),
+    )
+
+
+def _expand_bbox(bbox: Dict[str, float], ratio: float = 0.35) -> Dict[str, float]:
+    """
+    Agrandit une bbox en % autour de son centre.
+    ratio=0.35 => +35% en hauteur et largeur (de chaque côté).
+    """
+    south, west, north, east = bbox["south"], bbox["west"], bbox["north"], bbox["east"]
+    if north - south <= 0 or east - west <= 0:
+        return bbox
 
-    return {"south": new_south, "west": new_west, "north": new_north, "east": new_east}
+    south, west, north, east = expand_bounds(south, west, north, east, float(ratio))
+    return {"south": south, "west": west, "north": north, "east": east}
 
 
 
 def _slugify(s: str) -> str:
     s = (s or "").strip().lower()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
+    s = unicodedata.normalize("NFKD", s).translate(_ACCENT_TABLE)
+    s = _NON_ALNUM_RE.sub("_", s)
+    s = _MULTI_UNDERSCORE_RE.sub("_", s).strip("_")
     return s or "unknown"
 
 
@@ -402,11 +580,7 @@ def fetch_places_to_json(
     if not cat:
         return {"ok": False, "error": f"Catégorie inconnue: {category_key}"}
 
-    sel = _get_selector(cat)
-    if not sel:
-        return {"ok": False, "error": f"Catégorie mal définie pour: {category_key}"}
-
-    key, value = sel
+    key, value = SELECTOR_BY_KEY[cat.key]
 
     # ---------- 2) bbox Nominatim ----------
     bbox_res = city_to_bbox.invoke({"city": city})
@@ -434,7 +608,7 @@ def fetch_places_to_json(
 
     payload = {
         "city": city,
-        "category": {"key": category_key, "label": cat.get("label"), "osm": f"{key}={value}"},
+        "category": {"key": category_key, "label": cat.label, "osm": f"{key}={value}"},
         "bbox": bbox,
         "bbox_mode": mode,
         "expand_ratio": float(expand_ratio) if mode == "around" else 0.0,
@@ -459,14 +633,13 @@ def fetch_places_to_json(
 
 
 # python
+@functools.lru_cache(maxsize=1024)
 def _normalize_text(s: str) -> str:
     """Normalise texte FR pour matching robuste (accents, ponctuation, espaces)."""
     s = (s or "").strip().lower()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"[^a-z0-9\s_-]+", " ", s)   # garde lettres/chiffres/espaces/_/-
-    s = s.replace("-", " ").replace("_", " ")
-    s = re.sub(r"\s+", " ", s).strip()
+    s = unicodedata.normalize("NFKD", s).translate(_NORMALIZE_TABLE)
+    s = _NON_WORD_RE.sub(" ", s)   # garde lettres/chiffres/espaces
+    s = _WS_RE.sub(" ", s).strip()
     return s
 
 
@@ -506,20 +679,40 @@ def _best_fuzzy_match(query: str, candidates: List[tuple[str, str]], cutoff: flo
     # test aussi une variante "singularisée" mot par mot
     q_sing = " ".join(_singularize_fr(w) for w in q.split())
 
+    texts = [c[0] for c in candidates]
+
     # on tente sur q puis q_sing
     for q_try in (q, q_sing):
-        texts = [c[0] for c in candidates]
-        # meilleur match
-        matches = difflib.get_close_matches(q_try, texts, n=1, cutoff=cutoff)
-        if matches:
-            best = matches[0]
-            # retrouver la key
-            for text, key in candidates:
-                if text == best:
-                    return key
+        # meilleur match (fuzz.ratio = même score que difflib, implémenté en C++)
+        match = process.extractOne(q_try, texts, scorer=fuzz.ratio, score_cutoff=cutoff * 100)
+        if match:
+            _, _, idx = match
+            return candidates[idx][1]
     return None
 
 
+def _build_category_index() -> tuple[Dict[str, tuple[int, int, str, str]], List[tuple[str, str]]]:
+    """
+    Normalise une seule fois key/label/synonyms de CATEGORIES.
+    - index : forme normalisée -> (rang catégorie, rang champ key<label<synonym, category_key, type de match)
+      (le plus petit tuple gagne => même priorité que l'ancien parcours linéaire)
+    - candidates : (texte normalisé, category_key) pour le fuzzy match
+    """
+    index: Dict[str, tuple[int, int, str, str]] = {}
+    candidates: List[tuple[str, str]] = []
+    for pos, c in enumerate(CATEGORIES):
+        forms = [(0, "norm:key", c.key), (1, "norm:label", c.label)]
+        forms += [(2, "norm:synonym", s) for s in c.synonyms if s]
+        for rank, match, text in forms:
+            norm = _normalize_text(text)
+            index.setdefault(norm, (pos, rank, c.key, match))
+            candidates.append((norm, c.key))
+    return index, candidates
+
+
+_CATEGORY_INDEX, _FUZZY_CANDIDATES = _build_category_index()
+
+
 # python
 @tool
 def resolve_category_key(user_category: str) -> dict:
@@ -532,79 +725,44 @@ def resolve_category_key(user_category: str) -> dict:
     if not raw:
         return {"ok": False, "error": "Catégorie vide"}
 
-    q = raw.lower()
-
-    # ---------- 1) Match strict sur key ----------
-    for c in CATEGORIES:
-        k = (c.get("key") or "").strip().lower()
-        if k and k == q:
-            return {"ok": True, "category_key": c["key"], "match": "strict:key"}
-
-    # ---------- 2) Match strict sur label ----------
-    for c in CATEGORIES:
-        lab = (c.get("label") or "").strip().lower()
-        if lab and lab == q:
-            return {"ok": True, "category_key": c["key"], "match": "strict:label"}
-
-    # ---------- 3) Match strict sur synonyms ----------
-    for c in CATEGORIES:
-        syns = c.get("synonyms") or []
-        syns_norm = [(s or "").strip().lower() for s in syns]
-        if q in syns_norm:
-            return {"ok": True, "category_key": c["key"], "match": "strict:synonym"}
+    # ---------- 1) Match strict key > label > synonyms (index précalculé) ----------
+    indexed = SYNONYM_INDEX.get(_norm(raw))
+    if indexed:
+        return {"ok": True, "category_key": indexed, "match": "strict:index"}
 
-    # ---------- 4) Interprétation légère (normalisation + pluriel) ----------
+    # ---------- 2) Interprétation légère (normalisation + pluriel) ----------
     q_norm = _normalize_text(raw)
     q_sing = " ".join(_singularize_fr(w) for w in q_norm.split())
 
-    # Essai direct normalisé sur label/synonyms
-    for c in CATEGORIES:
-        if _normalize_text(c.get("key") or "") == q_norm or _normalize_text(c.get("key") or "") == q_sing:
-            return {"ok": True, "category_key": c["key"], "match": "norm:key"}
-
-        if _normalize_text(c.get("label") or "") == q_norm or _normalize_text(c.get("label") or "") == q_sing:
-            return {"ok": True, "category_key": c["key"], "match": "norm:label"}
+    # Essai direct normalisé sur key/label/synonyms (index précalculé)
+    hits = [h for h in (_CATEGORY_INDEX.get(q_norm), _CATEGORY_INDEX.get(q_sing)) if h]
+    if hits:
+        _, _, category_key, match = min(hits)
+        return {"ok": True, "category_key": category_key, "match": match}
 
-        syns = c.get("synonyms") or []
-        syns_norm = [_normalize_text(s) for s in syns if s]
-        if q_norm in syns_norm or q_sing in syns_norm:
-            return {"ok": True, "category_key": c["key"], "match": "norm:synonym"}
+    # ---------- 3) Synonyme cité dans une phrase libre (Aho-Corasick, 1 passage) ----------
+    in_text = match_query(raw)
+    if in_text:
+        return {"ok": True, "category_key": in_text[0], "match": "substring"}
 
-    # ---------- 5) Fuzzy match (dernier recours) ----------
-    # On construit des candidats normalisés (label + key + synonyms)
-    candidates: List[tuple[str, str]] = []
-    for c in CATEGORIES:
-        key = c.get("key")
-        if not key:
-            continue
-        candidates.append((_normalize_text(key), key))
-        if c.get("label"):
-            candidates.append((_normalize_text(c["label"]), key))
-        for s in (c.get("synonyms") or []):
-            if s:
-                candidates.append((_normalize_text(s), key))
-
-    fuzzy_key = _best_fuzzy_match(raw, candidates, cutoff=0.82)
+    # ---------- 4) Fuzzy match (dernier recours) ----------
+    # rapidfuzz sur les candidats normalisés précalculés (key + label + synonyms)
+    fuzzy_key = _best_fuzzy_match(raw, _FUZZY_CANDIDATES, cutoff=0.82)
     if fuzzy_key:
         return {"ok": True, "category_key": fuzzy_key, "match": "fuzzy"}
 
     # debug utile
-    keys = [c.get("key") for c in CATEGORIES if c.get("key")]
+    keys = [c.key for c in CATEGORIES if c.key]
     return {"ok": False, "error": f"Catégorie inconnue: {user_category}", "available_keys": keys}
 
 
 
 
 # python
-def _find_category(category_key: str) -> dict | None:
+def _find_category(category_key: str) -> Category | None:
     if not category_key:
         return None
-    key_norm = category_key.strip().lower()
-
-    for c in CATEGORIES:
-        if (c.get("key") or "").strip().lower() == key_norm:
-            return c
-    return None
+    return KEY_INDEX.get(_norm(category_key))
 
 
 # python
@@ -615,10 +773,9 @@ def list_categories() -> dict:
     """
     out = []
     for c in CATEGORIES:
-        k = c.get("key")
-        if not k:
+        if not c.key:
             continue
-        out.append({"key": k, "label": c.get("label")})
+        out.append({"key": c.key, "label": c.label})
     return {"ok": True, "categories": out}
 
 
@@ -629,20 +786,24 @@ def _request_with_retry(
     *,
     max_retries: int = 4,
     base_delay: float = 1.0,
+    max_delay: float = 15.0,
     timeout: int = 30,
     retry_statuses: set[int] = {429, 500, 502, 503, 504},
     **kwargs,
 ) -> requests.Response:
     """
-    Effectue une requête HTTP avec retry + exponential backoff + jitter.
+    Effectue une requête HTTP avec retry + exponential backoff "full jitter".
     - Retry sur timeouts + erreurs réseau + certains status HTTP (dont 504).
+    - Attente tirée dans [0, min(max_delay, base_delay * 2^(attempt-1))] : évite que
+      plusieurs clients relancent Overpass en même temps après un 504.
+    - Respecte l'en-tête Retry-After s'il est présent, plafonné à max_delay.
     - Lève l'exception finale si tous les essais échouent.
     """
     last_exc: Exception | None = None
 
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.request(method, url, timeout=timeout, **kwargs)
+            resp = SESSION.request(method, url, timeout=timeout, **kwargs)
 
             # Si status à retry (ex: 504), on déclenche une exception contrôlée
             if resp.status_code in retry_statuses:
@@ -661,15 +822,106 @@ def _request_with_retry(
             if attempt == max_retries:
                 raise
 
-            # backoff exponentiel + jitter
-            delay = base_delay * (2 ** (attempt - 1))
-            delay += random.uniform(0, 0.25 * delay)
+            # backoff exponentiel "full jitter"
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+            response = getattr(e, "response", None)
+            if response is not None:
+                response.close()  # stream=True : libère la connexion avant le prochain essai
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            if retry_after:
+                try:
+                    # plafonné : un serveur ne doit pas pouvoir bloquer un worker indéfiniment
+                    delay = max(delay, min(float(retry_after), max_delay))
+                except ValueError:
+                    pass  # format date HTTP : ignoré
+
+            logger.debug("Retry %s %s dans %.2fs (essai %d/%d): %s", method, url, delay, attempt, max_retries, e)
             time.sleep(delay)
 
     # Sécurité (ne devrait jamais arriver)
     raise last_exc if last_exc else RuntimeError("Retry failed with unknown error")
 
 
+_MIRROR_STATE: Dict[str, Dict[str, float]] = {}  # url -> {"failures", "open_until"}
+_MIRROR_STATE_LOCK = threading.Lock()
+
+
+def _mirror_is_open(url: str) -> bool:
+    with _MIRROR_STATE_LOCK:
+        state = _MIRROR_STATE.get(url)
+        return state is not None and time.monotonic() < state["open_until"]
+
+
+def _mirror_record(url: str, ok: bool) -> None:
+    with _MIRROR_STATE_LOCK:
+        if ok:
+            _MIRROR_STATE.pop(url, None)
+            return
+        state = _MIRROR_STATE.setdefault(url, {"failures": 0, "open_until": 0.0})
+        state["failures"] += 1
+        if state["failures"] >= MIRROR_FAILURE_THRESHOLD:
+            state["open_until"] = time.monotonic() + MIRROR_COOLDOWN_SECONDS
+            logger.warning("Miroir %s ignoré %.0fs après %d échecs", url, MIRROR_COOLDOWN_SECONDS, state["failures"])
+
+
+def _close_response(fut: Any) -> None:
+    if not fut.cancelled() and fut.exception() is None:
+        fut.result().close()
+
+
+def _hedged_request(
+    method: str,
+    urls: Iterable[str],
+    *,
+    hedge_delay: float | None = 0.3,
+    **kwargs,
+) -> requests.Response:
+    """
+    Interroge des miroirs en "hedged requests" plutôt qu'en séquentiel :
+    - le miroir suivant est lancé si aucune réponse n'est arrivée après hedge_delay,
+      ou immédiatement si un miroir a échoué
+    - hedge_delay=None : jamais deux requêtes à la fois, bascule seulement après un échec
+    - la première réponse valide gagne, les requêtes restantes sont abandonnées
+    - si tous échouent, lève RuntimeError("url: erreur ; url: erreur")
+    - les miroirs en circuit ouvert (échecs répétés) sont sautés, sauf si tous le sont
+    Chaque miroir garde ses propres retries (_request_with_retry).
+    """
+    urls = list(urls)
+    pending = [url for url in urls if not _mirror_is_open(url)] or urls
+    errors: List[str] = []
+    in_flight: Dict[Any, str] = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, len(pending)))
+    try:
+        while pending or in_flight:
+            if pending:
+                url = pending.pop(0)
+                in_flight[executor.submit(_request_with_retry, method, url, **kwargs)] = url
+
+            done, _ = wait(
+                in_flight,
+                timeout=hedge_delay if pending and hedge_delay is not None else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for fut in done:
+                url = in_flight.pop(fut)
+                try:
+                    response = fut.result()
+                except Exception as exc:
+                    _mirror_record(url, ok=False)
+                    errors.append(f"{url}: {exc}")
+                else:
+                    _mirror_record(url, ok=True)
+                    return response
+    finally:
+        # ne bloque pas sur les miroirs lents : leurs réponses sont fermées dès qu'elles arrivent
+        for fut in in_flight:
+            fut.add_done_callback(_close_response)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    raise RuntimeError(" ; ".join(errors) if errors else "aucun miroir disponible")
+
+
 
 
 
@@ -696,7 +948,18 @@ TOOL_REGISTRY: Dict[str, Any] = {t.name: t for t in TOOLS}
 # =========================================================
 # 3) LLM
 # =========================================================
-llm = ChatOpenAI(model=MODEL, temperature=TEMP).bind_tools(TOOLS)
+# Construit au premier appel : langchain_openai (openai, httpx, tiktoken...) coûte
+# ~1-2 s d'import et n'est pas nécessaire pour les tools / la résolution de catégories.
+_LLM: Any = None
+
+
+def _get_llm() -> Any:
+    global _LLM
+    if _LLM is None:
+        from langchain_openai import ChatOpenAI
+
+        _LLM = ChatOpenAI(model=MODEL, temperature=TEMP).bind_tools(TOOLS)
+    return _LLM
 
 
 # =========================================================
@@ -712,23 +975,43 @@ llm = ChatOpenAI(model=MODEL, temperature=TEMP).bind_tools(TOOLS)
 # run_agent (après tes modifs)
 # -------------------------------------------------------------------
 # python
-def run_agent(user_input: str, history: List[BaseMessage]) -> AIMessage:
+def _invoke_tool_call(tc: Dict[str, Any]) -> tuple[Any, Exception | None]:
+    try:
+        return TOOL_REGISTRY[tc["name"]].invoke(tc["args"]), None
+    except Exception as e:
+        return None, e
+
+
+def _invoke_tool_calls(tool_calls: List[Dict[str, Any]]) -> List[tuple[Any, Exception | None]]:
+    """
+    Exécute les tool_calls d'une même réponse LLM (indépendants par construction).
+    Plusieurs appels => pool de threads : les I/O Nominatim/Overpass se recouvrent.
+    Les résultats sont renvoyés dans l'ordre des tool_calls.
+    """
+    if len(tool_calls) <= 1:
+        return [_invoke_tool_call(tc) for tc in tool_calls]
+    with ThreadPoolExecutor(max_workers=min(len(tool_calls), MAX_PARALLEL_TOOLS)) as executor:
+        return list(executor.map(_invoke_tool_call, tool_calls))
+
+
+def run_agent(user_input: str, history: Iterable[BaseMessage]) -> AIMessage:
     """
     Agent tool-calling robuste (toujours piloté par le LLM) :
     - Le LLM décide des tools à appeler
     - Les résultats de tools sont renvoyés "tels quels" (pas de double wrapper)
     - Si un tool renvoie ok=False => on stop et on renvoie Erreur: ...
     - Limite MAX_TOOL_STEPS conservée pour éviter les boucles infinies
+    - Les tool_calls parallèles d'une réponse sont exécutés en même temps
     """
 
     messages: List[BaseMessage] = (
         [SystemMessage(content=SYSTEM_MESSAGE)]
-        + history
+        + list(history)
         + [HumanMessage(content=user_input)]
     )
 
     for _ in range(MAX_TOOL_STEPS):
-        response = llm.invoke(messages)
+        response = _get_llm().invoke(messages)
 
         # Réponse finale
         if not response.tool_calls:
@@ -739,28 +1022,27 @@ def run_agent(user_input: str, history: List[BaseMessage]) -> AIMessage:
 
         # Exécuter les tool_calls
         for tc in response.tool_calls:
-            tool_name = tc["name"]
-            tool_args = tc["args"]
-            tool_call_id = tc["id"]
+            if tc["name"] not in TOOL_REGISTRY:
+                return AIMessage(content=f"Erreur: Tool inconnu: {tc['name']}")
 
-            tool_obj = TOOL_REGISTRY.get(tool_name)
-            if tool_obj is None:
-                return AIMessage(content=f"Erreur: Tool inconnu: {tool_name}")
+        outcomes = _invoke_tool_calls(response.tool_calls)
 
-            try:
-                result = tool_obj.invoke(tool_args)
-            except Exception as e:
-                return AIMessage(content=f"Erreur: {type(e).__name__}: {e}")
+        for tc, (result, error) in zip(response.tool_calls, outcomes):
+            tool_call_id = tc["id"]
+
+            if error is not None:
+                return AIMessage(content=f"Erreur: {type(error).__name__}: {error}")
 
             # Si le tool a une convention {"ok": False, "error": "..."} => stop immédiat
             if isinstance(result, dict) and result.get("ok") is False:
                 return AIMessage(content=f"Erreur: {result.get('error')}")
 
             # IMPORTANT : renvoyer le résultat BRUT au modèle (pas de wrapper)
+            # orjson : mêmes données que json.dumps(ensure_ascii=False), encodées en C
             messages.append(
                 ToolMessage(
                     tool_call_id=tool_call_id,
-                    content=json.dumps(result, ensure_ascii=False),
+                    content=orjson.dumps(result).decode("utf-8"),
                 )
             )
 
@@ -768,8 +1050,12 @@ def run_agent(user_input: str, history: List[BaseMessage]) -> AIMessage:
 
 
 def _load_result_payload(path: Path) -> Dict[str, Any]:
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    """Lit un JSON résultat via mmap : orjson parse directement les pages du fichier, sans copie en bytes."""
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return orjson.loads(b"")  # mmap refuse les fichiers vides => même JSONDecodeError
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
 
 
 def _build_agent_result(filepath: Path) -> Dict[str, Any]:
@@ -910,9 +1196,8 @@ def run_agent_from_message(
                 raise FileNotFoundError(f"fichier introuvable: {filepath}")
             return _build_agent_result(filepath)
 
-        normalized = unicodedata.normalize("NFKD", content).lower()
-        normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
-        normalized = re.sub(r"[^a-z0-9]+", " ", normalized)
+        normalized = unicodedata.normalize("NFKD", content).lower().translate(_ACCENT_TABLE)
+        normalized = _NON_ALNUM_RE.sub(" ", normalized)
         normalized = normalized.strip()
         if "souhaitez vous etre precis" in normalized:
             current_input = default_answer
@@ -929,7 +1214,8 @@ def _interactive_cli() -> None:
     print("Agent scalable tools | 'exit' pour quitter\n")
     print("[DEBUG] cwd =", os.getcwd())
 
-    history: List[BaseMessage] = []
+    # deque bornée : les messages les plus anciens sortent en O(1) à chaque append
+    history: deque[BaseMessage] = deque(maxlen=MAX_HISTORY)
 
     while True:
         user_input = input("You: ").strip()
@@ -942,8 +1228,7 @@ def _interactive_cli() -> None:
         response = run_agent(user_input, history)
         print("Agent:", response.content, "\n")
 
-        history += [HumanMessage(content=user_input), response]
-        history = history[-MAX_HISTORY:]
+        history.extend((HumanMessage(content=user_input), response))
 
 
 def main_cli() -> None:
@@ -994,4 +1279,7 @@ def main_cli() -> None:
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
     main_cli()
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
 
@@ -17,9 +18,10 @@ def _ensure_src_on_path() -> None:
 
 if __name__ == "__main__":
     _ensure_src_on_path()
+    # API_RELOAD=0 désactive le rechargement à chaud (file watcher) hors développement.
     uvicorn.run(
         "city_insights_api.app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=os.getenv("API_RELOAD", "1") != "0",
     )
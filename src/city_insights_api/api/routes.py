@@ -2,14 +2,26 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import mimetypes
 import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
+from starlette.background import BackgroundTask
 
 from ..core.config import settings
 from ..models.api import (
+    CHAT_RESPONSE_ADAPTER,
+    SESSION_DETAIL_ADAPTER,
+    SESSION_SUMMARIES_ADAPTER,
     ChatData,
     ChatRequest,
     ChatResponse,
@@ -17,7 +29,7 @@ from ..models.api import (
     ChatSessionSummary,
     ParsedInfo,
 )
-from ..services.conversation_agent import CityInsightsAgent, ConversationIntent
+from ..services.conversation_agent import AgentOutcome, CityInsightsAgent, ConversationIntent
 from ..services.chat_history import ChatHistoryStore
 
 logger = logging.getLogger(__name__)
@@ -29,65 +41,134 @@ except Exception as exc:  # noqa: BLE001
     logger.warning("Impossible d'initialiser l'agent conversationnel: %s", exc)
     city_agent = None
 
-try:
-    history_store = ChatHistoryStore()
-except Exception as exc:  # noqa: BLE001
-    logger.warning("Impossible d'initialiser l'historique de chat: %s", exc)
-    history_store = None
+
+async def get_history_store(request: Request) -> ChatHistoryStore | None:
+    """Shared store created in the application lifespan (None if Mongo is unavailable)."""
+    return getattr(request.app.state, "history_store", None)
+
+
+def _json_response(adapter: TypeAdapter, value: object) -> Response:
+    return Response(content=adapter.dump_json(value), media_type="application/json")
+
 
 @router.get("/health")
 def healthcheck() -> dict[str, bool]:
     return {"ok": True}
 
 
-@router.get("/views/{filename}")
-def get_view(filename: str) -> FileResponse:
-    safe_name = os.path.basename(filename)
-    file_path = settings.views_dir / safe_name
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Fichier introuvable")
-    return FileResponse(file_path)
+# Views are small HTML maps polled by the front-end: keep the hot ones in memory,
+# bounded by total bytes rather than entry count.
+_VIEW_CACHE_MAX_FILE_BYTES = 2 << 20  # larger files are streamed from disk
+_VIEW_CACHE_BUDGET_BYTES = 32 << 20
+_view_cache: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+_view_cache_bytes = 0
+_view_cache_lock = threading.Lock()
 
 
-@router.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest) -> ChatResponse:
-    if city_agent is None:
-        return ChatResponse(success=False, message="Agent non initialisé (clé API manquante ?)")
-    if history_store is None:
-        raise HTTPException(status_code=503, detail="Historique indisponible (MongoDB absent ?)")
+def _load_view(path: str, mtime_ns: int) -> bytes:
+    """Return the file contents, re-reading when mtime_ns no longer matches the cached copy."""
+    global _view_cache_bytes
+    with _view_cache_lock:
+        cached = _view_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            _view_cache.move_to_end(path)
+            return cached[1]
+
+    with open(path, "rb") as handle:
+        content = handle.read()
+
+    with _view_cache_lock:
+        previous = _view_cache.pop(path, None)
+        if previous is not None:
+            _view_cache_bytes -= len(previous[1])
+        _view_cache[path] = (mtime_ns, content)
+        _view_cache_bytes += len(content)
+        while _view_cache_bytes > _VIEW_CACHE_BUDGET_BYTES:
+            _, (_, evicted) = _view_cache.popitem(last=False)
+            _view_cache_bytes -= len(evicted)
+    return content
+
+
+def _validators(stat: os.stat_result) -> dict[str, str]:
+    """ETag / Last-Modified computed exactly as FileResponse does, so both paths agree."""
+    etag_base = f"{stat.st_mtime}-{stat.st_size}"
+    return {
+        "etag": f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"',
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+
+
+def _not_modified(request: Request, validators: dict[str, str], stat: os.stat_result) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 §13.2.2).
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or validators["etag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
-    session_id, _ = history_store.ensure_session(request.session_id)
-    prior_turns = history_store.get_recent_turns(session_id)
-    prior_users = history_store.get_recent_user_messages(session_id)
 
+@router.get("/views/{filename}")
+def get_view(filename: str, request: Request) -> Response:
+    safe_name = os.path.basename(filename)
+    file_path = settings.views_dir / safe_name
     try:
-        outcome = city_agent.run(
-            request.message,
-            session_id=session_id,
-            prior_turns=prior_turns,
-            prior_user_messages=prior_users,
-        )
-    except Exception as exc:  # noqa: BLE001
-        logger.exception("Agent error")
-        fallback = city_agent.build_error_answer(request.message, exc)
-        history_store.record_turn(session_id, request.message, fallback)
-        return ChatResponse(success=True, answer=fallback, session_id=session_id)
+        stat = os.stat(file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Fichier introuvable") from None
+    validators = _validators(stat)
+    if _not_modified(request, validators, stat):
+        return Response(status_code=304, headers=validators)
+    if stat.st_size > _VIEW_CACHE_MAX_FILE_BYTES:
+        return FileResponse(file_path, stat_result=stat)
+    media_type = mimetypes.guess_type(safe_name)[0] or "text/html"
+    return Response(
+        content=_load_view(str(file_path), stat.st_mtime_ns),
+        media_type=media_type,
+        headers=validators,
+    )
+
+
+async def _open_session(
+    history_store: ChatHistoryStore,
+    session_id: str | None,
+) -> tuple[str, list[tuple[str, str]], list[str], bool]:
+    # One projected find_one for turns, user messages and title state; insert only if missing.
+    context = await history_store.get_context(session_id)
+    if context is None:
+        return await history_store.create_session(), [], [], True
+    prior_turns, prior_users, needs_title = context
+    return session_id, prior_turns, prior_users, needs_title
 
-    assistant_view_file = None
-    if outcome.map_file:
-        assistant_view_file = outcome.map_file.name
 
-    history_store.record_turn(
+async def _record_turn(
+    history_store: ChatHistoryStore,
+    session_id: str,
+    message: str,
+    outcome: AgentOutcome,
+) -> None:
+    # Awaited before the answer is returned: a quick follow-up message must find this turn.
+    assistant_view_file = outcome.map_file.name if outcome.map_file else None
+    await history_store.record_turn(
         session_id,
-        request.message,
+        message,
         outcome.answer,
         assistant_view_file=assistant_view_file,
     )
 
-    if history_store.needs_title(session_id):
-        title = city_agent.build_title(request.message, outcome.answer)
-        history_store.update_title(session_id, title)
 
+async def _generate_title(history_store: ChatHistoryStore, session_id: str, message: str, answer: str) -> None:
+    # Background only: nothing in the next turn depends on the title.
+    title = await city_agent.abuild_title(message, answer)
+    await history_store.update_title(session_id, title)
+
+
+def _build_chat_response(session_id: str, outcome: AgentOutcome) -> ChatResponse:
     if not outcome.fetch:
         return ChatResponse(success=True, answer=outcome.answer, session_id=session_id)
 
@@ -126,21 +207,114 @@ def chat(request: ChatRequest) -> ChatResponse:
     )
 
 
-@router.get("/chat/sessions", response_model=list[ChatSessionSummary])
-def list_sessions() -> list[ChatSessionSummary]:
+def _sse_event(event: str, payload: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    background: BackgroundTasks,
+    history_store: ChatHistoryStore | None = Depends(get_history_store),
+) -> Response:
+    if city_agent is None:
+        return _json_response(
+            CHAT_RESPONSE_ADAPTER,
+            ChatResponse(success=False, message="Agent non initialisé (clé API manquante ?)"),
+        )
+    if history_store is None:
+        raise HTTPException(status_code=503, detail="Historique indisponible (MongoDB absent ?)")
+
+    session_id, prior_turns, prior_users, needs_title = await _open_session(history_store, request.session_id)
+
+    try:
+        outcome = await city_agent.arun(
+            request.message,
+            session_id=session_id,
+            prior_turns=prior_turns,
+            prior_user_messages=prior_users,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Agent error")
+        fallback = city_agent.build_error_answer(request.message, exc)
+        await history_store.record_turn(session_id, request.message, fallback)
+        return _json_response(
+            CHAT_RESPONSE_ADAPTER,
+            ChatResponse(success=True, answer=fallback, session_id=session_id),
+        )
+
+    await _record_turn(history_store, session_id, request.message, outcome)
+    if needs_title:
+        background.add_task(_generate_title, history_store, session_id, request.message, outcome.answer)
+    return _json_response(CHAT_RESPONSE_ADAPTER, _build_chat_response(session_id, outcome))
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    history_store: ChatHistoryStore | None = Depends(get_history_store),
+) -> StreamingResponse:
+    """Server-Sent Events variant of /chat.
+
+    Events: ``session`` ({"session_id"}), then ``delta`` ({"text"}) chunks as the
+    answer is generated, then ``done`` with the full ChatResponse payload. The turn
+    is persisted before ``done`` is sent; only the title is generated in the background.
+    """
+    if city_agent is None:
+        raise HTTPException(status_code=503, detail="Agent non initialisé (clé API manquante ?)")
     if history_store is None:
-        return []
-    return history_store.list_sessions()
+        raise HTTPException(status_code=503, detail="Historique indisponible (MongoDB absent ?)")
+
+    session_id, prior_turns, prior_users, needs_title = await _open_session(history_store, request.session_id)
+    completed: list[AgentOutcome] = []
+
+    async def events() -> AsyncIterator[bytes]:
+        yield _sse_event("session", orjson.dumps({"session_id": session_id}))
+        async for item in city_agent.astream(
+            request.message,
+            session_id=session_id,
+            prior_turns=prior_turns,
+            prior_user_messages=prior_users,
+        ):
+            if isinstance(item, AgentOutcome):
+                completed.append(item)
+            else:
+                yield _sse_event("delta", orjson.dumps({"text": item}))
+        if completed:  # client gone before the end: nothing consistent to store
+            await _record_turn(history_store, session_id, request.message, completed[0])
+            yield _sse_event("done", CHAT_RESPONSE_ADAPTER.dump_json(_build_chat_response(session_id, completed[0])))
+
+    async def title() -> None:
+        if completed and needs_title:
+            await _generate_title(history_store, session_id, request.message, completed[0].answer)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(title),
+    )
+
+
+@router.get("/chat/sessions", response_model=list[ChatSessionSummary])
+async def list_sessions(
+    history_store: ChatHistoryStore | None = Depends(get_history_store),
+) -> Response:
+    sessions = await history_store.list_sessions() if history_store is not None else []
+    return _json_response(SESSION_SUMMARIES_ADAPTER, SESSION_SUMMARIES_ADAPTER.validate_python(sessions))
 
 
 @router.get("/chat/sessions/{session_id}", response_model=ChatSessionDetail)
-def get_session(session_id: str) -> ChatSessionDetail:
+async def get_session(
+    session_id: str,
+    history_store: ChatHistoryStore | None = Depends(get_history_store),
+) -> Response:
     if history_store is None:
         raise HTTPException(status_code=503, detail="Historique indisponible")
-    detail = history_store.get_session(session_id)
+    detail = await history_store.get_session(session_id)
     if not detail:
         raise HTTPException(status_code=404, detail="Conversation introuvable")
-    return ChatSessionDetail(**detail)
+    return _json_response(SESSION_DETAIL_ADAPTER, ChatSessionDetail(**detail))
 
 
 __all__ = ["router"]
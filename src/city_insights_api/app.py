@@ -3,18 +3,44 @@
 from __future__ import annotations
 
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api.routes import router
+from .api.routes import city_agent, router
 from .core.config import settings
+from .services.chat_history import ChatHistoryStore
 
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create the shared Mongo-backed history store once per application (and close the
+    agent's LLM connection pools on shutdown)."""
+    store: ChatHistoryStore | None = None
+    try:
+        store = ChatHistoryStore()
+        await store.ensure_indexes()
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Impossible d'initialiser l'historique de chat: %s", exc)
+        if store is not None:
+            await store.close()
+        store = None
+    app.state.history_store = store
+    try:
+        yield
+    finally:
+        if store is not None:
+            await store.close()
+        if city_agent is not None:
+            await city_agent.aclose()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="City Insights API", version="1.0.0")
+    app = FastAPI(title="City Insights API", version="1.0.0", lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
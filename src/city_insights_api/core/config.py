@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import logging
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -9,10 +10,16 @@ from typing import Iterable, List
 
 from dotenv import load_dotenv
 
-from ..services.insee_downloader import download_insee_carroyage
+from ..services.insee_downloader import (
+    adopt_insee_carroyage,
+    download_insee_carroyage,
+    verify_insee_carroyage,
+)
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 LEGACY_AGENT_DIR = PROJECT_ROOT / "legacy_agent"
 
@@ -44,6 +51,11 @@ class Settings:
     mongo_dsn: str = field(default_factory=lambda: os.getenv("MONGO_DSN", "mongodb://localhost:27017"))
     mongo_db_name: str = field(default_factory=lambda: os.getenv("MONGO_DB_NAME", "cityinsights"))
     mongo_collection: str = field(default_factory=lambda: os.getenv("MONGO_COLLECTION", "chat_sessions"))
+    llm_max_inflight: int = field(default_factory=lambda: int(os.getenv("LLM_MAX_INFLIGHT", "8")))
+    history_max_turns: int = field(default_factory=lambda: int(os.getenv("HISTORY_MAX_TURNS", "8")))
+    carroyage_cache_max_entries: int = field(
+        default_factory=lambda: int(os.getenv("CARROYAGE_CACHE_MAX_ENTRIES", "256"))
+    )
 
     def __post_init__(self) -> None:
         origins_env = _split_env_list(os.getenv("API_ALLOWED_ORIGINS"))
@@ -68,6 +80,13 @@ class Settings:
             raise FileNotFoundError(
                 "Legacy agent introuvable. Définissez LEGACY_AGENT_PATH ou placez le script dans legacy_agent/."
             )
+        if self.insee_csv_path.exists() and not verify_insee_carroyage(self.insee_csv_path):
+            # A replaced or edited CSV looks like a corrupt one: keep the operator's file.
+            logger.warning(
+                "CSV INSEE %s différent de celui téléchargé (remplacé ou modifié ?) : conservé tel quel.",
+                self.insee_csv_path,
+            )
+            adopt_insee_carroyage(self.insee_csv_path)
         if not self.insee_csv_path.exists():
             try:
                 print("CSV INSEE manquant, téléchargement en cours...")
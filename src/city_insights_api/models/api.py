@@ -5,7 +5,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 from .domain import AgentPlace, BoundingBox, KMeansMetrics, ZoneInsight
 
@@ -63,3 +63,10 @@ class ChatSessionDetail(BaseModel):
     id: str
     title: str
     messages: List[ChatHistoryMessage]
+
+
+# Built once at import: routes serialize with these and return a raw JSON Response,
+# skipping FastAPI's second response_model validation pass.
+CHAT_RESPONSE_ADAPTER = TypeAdapter(ChatResponse)
+SESSION_SUMMARIES_ADAPTER = TypeAdapter(List[ChatSessionSummary])
+SESSION_DETAIL_ADAPTER = TypeAdapter(ChatSessionDetail)
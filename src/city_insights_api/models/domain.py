@@ -5,7 +5,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Any, List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, RootModel
 
 
 class BoundingBox(BaseModel):
@@ -16,12 +16,19 @@ class BoundingBox(BaseModel):
 
 
 class AgentPlace(BaseModel):
+    # OSM ids may arrive as integers from the legacy agent.
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
     id: Optional[str] = None
     name: Optional[str] = None
     lat: float
     lon: float
 
 
+class AgentPlaceList(RootModel[List[AgentPlace]]):
+    """Validates a whole list of raw place dicts in one pydantic-core call."""
+
+
 class AgentPayload(BaseModel):
     model_config = ConfigDict(extra="ignore")
 
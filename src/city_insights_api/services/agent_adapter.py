@@ -3,12 +3,19 @@
 from __future__ import annotations
 
 import importlib.util
+import threading
 from pathlib import Path
 from types import ModuleType
-from typing import Any, Dict
+from typing import Any, Dict, List, Sequence, Tuple
 
 from ..core.config import settings
-from ..models.domain import AgentPayload, AgentPlace, BoundingBox
+from ..models.domain import AgentPayload, AgentPlace, AgentPlaceList, BoundingBox
+
+# Loaded legacy module per resolved path, with the mtime it was loaded at: executing the
+# script (LangChain imports, category indexes, HTTP session) happens once per process, not
+# per adapter. An edited script replaces its entry instead of adding one.
+_MODULE_CACHE: Dict[Path, Tuple[int, ModuleType]] = {}
+_MODULE_CACHE_LOCK = threading.Lock()
 
 
 class AgentAdapter:
@@ -23,9 +30,20 @@ class AgentAdapter:
         self._module = self._load_module()
 
     def _load_module(self) -> ModuleType:
-        spec = importlib.util.spec_from_file_location("city_agent_legacy", self.agent_path)
+        path = self.agent_path.resolve()
+        mtime_ns = path.stat().st_mtime_ns
+        with _MODULE_CACHE_LOCK:
+            cached = _MODULE_CACHE.get(path)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+            module = self._exec_module(path)
+            _MODULE_CACHE[path] = (mtime_ns, module)
+            return module
+
+    def _exec_module(self, path: Path) -> ModuleType:
+        spec = importlib.util.spec_from_file_location("city_agent_legacy", path)
         if spec is None or spec.loader is None:  # pragma: no cover - defensive
-            raise ImportError(f"Impossible de charger le script agent: {self.agent_path}")
+            raise ImportError(f"Impossible de charger le script agent: {path}")
 
         module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(module)
@@ -58,18 +76,15 @@ class AgentAdapter:
         except (TypeError, ValueError) as exc:  # pragma: no cover - guards legacy payloads
             raise ValueError(f"bbox invalide dans le résultat agent: {bbox}") from exc
 
+    def _build_places(self, raw: Sequence[Dict[str, Any]]) -> List[AgentPlace]:
+        # Coercion of the whole list happens in pydantic-core; only places without
+        # coordinates are dropped here.
+        located = [place for place in raw if place.get("lat") is not None and place.get("lon") is not None]
+        return AgentPlaceList.model_validate(located).root
+
     def _to_model(self, data: Dict[str, Any]) -> AgentPayload:
         bbox = self._normalize_bbox(data.get("bbox", {}))
-        places = [
-            AgentPlace(
-                id=str(place.get("id")) if place.get("id") is not None else None,
-                name=place.get("name"),
-                lat=float(place.get("lat")),
-                lon=float(place.get("lon")),
-            )
-            for place in data.get("places", [])
-            if place.get("lat") is not None and place.get("lon") is not None
-        ]
+        places = self._build_places(data.get("places") or [])
 
         payload = data.get("payload") or {}
 
@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, Iterable, List
 
-import pandas as pd
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from pyproj import Transformer
 
 from ..models.domain import BoundingBox
@@ -25,15 +30,31 @@ class CarroyagePayload:
     total_population: int
     output_file: Path
     data: Dict[str, object]
+    # Same cells as column arrays (structure of arrays) for vectorized consumers
+    lats: np.ndarray = field(default_factory=lambda: np.empty(0))
+    lons: np.ndarray = field(default_factory=lambda: np.empty(0))
+    pops: np.ndarray = field(default_factory=lambda: np.empty(0))
 
 
 class InseeCarroyageGenerator:
-    """Load the heavy CSV by chunks and keep only cells inside a bbox."""
-
-    def __init__(self, csv_path: Path, chunk_size: int = 200_000) -> None:
+    """Stream the heavy CSV in Arrow record batches and keep only cells inside a bbox."""
+
+    def __init__(
+        self,
+        csv_path: Path,
+        block_size: int = 16 << 20,
+        *,
+        pretty_json: bool = False,
+        cache_dir: Path | None = None,
+        cache_max_entries: int = 256,
+    ) -> None:
         self.csv_path = csv_path
-        self.chunk_size = chunk_size
+        self.block_size = block_size  # bytes of CSV parsed per record batch
+        self.pretty_json = pretty_json  # indented output, for debugging only
+        self.cache_dir = cache_dir  # per-bbox payload cache; None disables it
+        self.cache_max_entries = cache_max_entries  # oldest entries (by mtime) are pruned past this
         self.transformer = Transformer.from_crs("EPSG:3035", "EPSG:4326", always_xy=True)
+        self.inverse_transformer = Transformer.from_crs("EPSG:4326", "EPSG:3035", always_xy=True)
 
     def generate(self, bbox: BoundingBox, output_path: Path) -> CarroyagePayload:
         if not self.csv_path.exists():
@@ -41,35 +62,56 @@ class InseeCarroyageGenerator:
 
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        results: List[Dict[str, float]] = []
-        total_population = 0.0
+        cache_path = self._cache_path(bbox)
+        if cache_path is not None and cache_path.exists():
+            try:
+                return self._load_cached(bbox, cache_path, output_path)
+            except FileNotFoundError:  # pruned between the check and the read
+                pass
+
+        lat_parts: List[np.ndarray] = []
+        lon_parts: List[np.ndarray] = []
+        pop_parts: List[np.ndarray] = []
+
+        x_min, y_min, x_max, y_max = self._projected_bounds(bbox)
 
-        for chunk in pd.read_csv(self.csv_path, chunksize=self.chunk_size):
-            x = chunk[COL_X].astype(float) * 100.0
-            y = chunk[COL_Y].astype(float) * 100.0
+        for batch in self._iter_batches():
+            x = _column_to_numpy(batch, COL_X) * 100.0
+            y = _column_to_numpy(batch, COL_Y) * 100.0
+            pops = _column_to_numpy(batch, COL_POP)
 
-            lon, lat = self.transformer.transform(x.to_numpy(), y.to_numpy())
-            chunk.loc[:, "lat"] = lat
-            chunk.loc[:, "lon"] = lon
+            # Cheap pre-filter in the source CRS so only candidate cells get reprojected;
+            # missing population (NaN) is dropped by the "> 0" comparison.
+            candidates = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max) & (pops > 0)
+            if not candidates.any():
+                continue
+            pops = pops[candidates]
+
+            # x[candidates] / y[candidates] are fresh copies: project them in place
+            lon, lat = self.transformer.transform(x[candidates], y[candidates], inplace=True)
 
             mask = (
-                (chunk["lat"] >= bbox.south)
-                & (chunk["lat"] <= bbox.north)
-                & (chunk["lon"] >= bbox.west)
-                & (chunk["lon"] <= bbox.east)
-                & (chunk[COL_POP].fillna(0) > 0)
+                (lat >= bbox.south)
+                & (lat <= bbox.north)
+                & (lon >= bbox.west)
+                & (lon <= bbox.east)
             )
 
-            sub = chunk.loc[mask, ["lat", "lon", COL_POP]]
+            if mask.any():
+                lat_parts.append(lat[mask])
+                lon_parts.append(lon[mask])
+                pop_parts.append(pops[mask])
+
+        lats = _concat(lat_parts)
+        lons = _concat(lon_parts)
+        pops = _concat(pop_parts)
+        total_population = float(pops.sum())
 
-            for lat_val, lon_val, pop_val in sub.itertuples(index=False):
-                pop = float(pop_val)
-                results.append({
-                    "lat": float(lat_val),
-                    "lon": float(lon_val),
-                    "pop": pop,
-                })
-                total_population += pop
+        # Records are only materialized once, for the JSON file and dict-based consumers.
+        results: List[Dict[str, float]] = [
+            {"lat": lat_val, "lon": lon_val, "pop": pop}
+            for lat_val, lon_val, pop in zip(lats.tolist(), lons.tolist(), pops.tolist())
+        ]
 
         payload = {
             "bbox": bbox.model_dump(),
@@ -81,8 +123,11 @@ class InseeCarroyageGenerator:
             "cells": results,
         }
 
-        with output_path.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if self.pretty_json else 0)
+        raw = orjson.dumps(payload, option=option)
+        output_path.write_bytes(raw)
+        if cache_path is not None:
+            self._store_cached(cache_path, raw)
 
         return CarroyagePayload(
             bbox=bbox,
@@ -91,7 +136,92 @@ class InseeCarroyageGenerator:
             total_population=int(round(total_population)),
             output_file=output_path,
             data=payload,
+            lats=lats,
+            lons=lons,
+            pops=pops,
         )
 
+    # Cache ----------------------------------------------------------------
+    def _cache_path(self, bbox: BoundingBox) -> Path | None:
+        """Key on the rounded bbox (~1 m) and the CSV identity, so a new CSV invalidates entries."""
+        if self.cache_dir is None:
+            return None
+        stat = self.csv_path.stat()
+        key = (
+            f"{bbox.south:.5f},{bbox.west:.5f},{bbox.north:.5f},{bbox.east:.5f}"
+            f"|{stat.st_size}|{stat.st_mtime_ns}"
+        )
+        return self.cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+    def _store_cached(self, cache_path: Path, raw: bytes) -> None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(raw)
+        os.replace(tmp_path, cache_path)
+        self._prune_cache()
+
+    def _prune_cache(self) -> None:
+        """Drop the least recently used entries (oldest mtime) beyond cache_max_entries."""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:  # removed by a concurrent prune
+                continue
+        excess = len(entries) - self.cache_max_entries
+        if excess <= 0:
+            return
+        entries.sort()
+        for _, path in entries[:excess]:
+            path.unlink(missing_ok=True)
+
+    def _load_cached(self, bbox: BoundingBox, cache_path: Path, output_path: Path) -> CarroyagePayload:
+        raw = cache_path.read_bytes()
+        cache_path.touch()  # a hit refreshes the entry's mtime, so pruning evicts cold bboxes first
+        output_path.write_bytes(raw)
+        payload = orjson.loads(raw)
+        cells: List[Dict[str, float]] = payload["cells"]
+        count = len(cells)
+        return CarroyagePayload(
+            bbox=bbox,
+            cells=cells,
+            count_cells=count,
+            total_population=int(payload["total_population"]),
+            output_file=output_path,
+            data=payload,
+            lats=np.fromiter((cell["lat"] for cell in cells), dtype=np.float64, count=count),
+            lons=np.fromiter((cell["lon"] for cell in cells), dtype=np.float64, count=count),
+            pops=np.fromiter((cell["pop"] for cell in cells), dtype=np.float64, count=count),
+        )
+
+    # Parsing --------------------------------------------------------------
+    def _projected_bounds(self, bbox: BoundingBox) -> tuple[float, float, float, float]:
+        """EPSG:3035 envelope of the WGS84 bbox (densified edges, 1 m safety margin)."""
+        x_min, y_min, x_max, y_max = self.inverse_transformer.transform_bounds(
+            bbox.west, bbox.south, bbox.east, bbox.north, densify_pts=21
+        )
+        return x_min - 1.0, y_min - 1.0, x_max + 1.0, y_max + 1.0
+
+    def _iter_batches(self) -> Iterable[pa.RecordBatch]:
+        reader = pa_csv.open_csv(
+            self.csv_path,
+            read_options=pa_csv.ReadOptions(block_size=self.block_size),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=[COL_X, COL_Y, COL_POP],
+                column_types={COL_X: pa.float64(), COL_Y: pa.float64(), COL_POP: pa.float64()},
+            ),
+        )
+        with reader:
+            yield from reader
+
+
+def _concat(parts: List[np.ndarray]) -> np.ndarray:
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.float64)
+
+
+def _column_to_numpy(batch: pa.RecordBatch, name: str) -> np.ndarray:
+    # zero-copy view when the column has no nulls; nulls become NaN otherwise
+    return batch.column(name).to_numpy(zero_copy_only=False)
+
 
 __all__ = ["CarroyagePayload", "InseeCarroyageGenerator"]
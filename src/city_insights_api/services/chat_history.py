@@ -1,45 +1,85 @@
-"""Mongo-backed storage for chat sessions."""
+"""Mongo-backed storage for chat sessions (async PyMongo client)."""
 
 from __future__ import annotations
 
+import re
 from datetime import datetime, timezone
 from typing import List, Optional, Sequence, Tuple
 
 from bson import ObjectId
-from pymongo import DESCENDING, MongoClient
-from pymongo.collection import Collection
+from pymongo import AsyncMongoClient, DESCENDING
+from pymongo.asynchronous.collection import AsyncCollection
 
 from ..core.config import Settings, settings
 
+_OID_RE = re.compile(r"[0-9a-fA-F]{24}")
+
+
+def _oid(session_id: Optional[str]) -> Optional[ObjectId]:
+    """Return the ObjectId for a 24-char hex id, or None without raising."""
+    if session_id and _OID_RE.fullmatch(session_id):
+        return ObjectId(session_id)
+    return None
+
+
+def _pair_turns(messages: Sequence[dict], limit: int) -> List[Tuple[str, str]]:
+    turns: List[Tuple[str, str]] = []
+    current_user: Optional[str] = None
+    for message in messages:
+        role = message.get("role")
+        content = message.get("content") or ""
+        if role == "user":
+            current_user = content
+        elif role == "assistant" and current_user is not None:
+            turns.append((current_user, content))
+            current_user = None
+    return turns[-limit:]
+
+
+def _user_messages(messages: Sequence[dict], limit: int) -> List[str]:
+    return [msg.get("content", "") for msg in messages if msg.get("role") == "user"][-limit:]
+
 
 class ChatHistoryStore:
-    """Persists chat sessions and provides helpers for context retrieval."""
+    """Persists chat sessions and provides helpers for context retrieval.
+
+    One instance (and its connection pool) is created per application in the
+    FastAPI lifespan and shared through ``app.state.history_store``.
+    """
 
     def __init__(self, config: Settings = settings) -> None:
-        self.client = MongoClient(config.mongo_dsn)
+        self.client: AsyncMongoClient = AsyncMongoClient(config.mongo_dsn)
         self.db = self.client[config.mongo_db_name]
-        self.collection: Collection = self.db[config.mongo_collection]
-        self.collection.create_index([("updated_at", DESCENDING)], name="updated_at_idx")
+        self.collection: AsyncCollection = self.db[config.mongo_collection]
+        # Turns loaded as context: the same cap the agent applies when rendering history.
+        self.history_limit = config.history_max_turns
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("updated_at", DESCENDING)], name="updated_at_idx")
+
+    async def close(self) -> None:
+        await self.client.close()
 
     # Session lifecycle --------------------------------------------------
-    def ensure_session(self, session_id: Optional[str]) -> Tuple[str, bool]:
+    async def ensure_session(self, session_id: Optional[str]) -> Tuple[str, bool]:
         """Return an existing session id or create a new one.
 
         Returns (session_id, created_flag).
         """
-        if session_id:
-            try:
-                doc = self.collection.find_one({"_id": ObjectId(session_id)}, {"_id": 1})
-                if doc:
-                    return session_id, False
-            except Exception:  # noqa: BLE001 - invalid ids are ignored
-                pass
-        new_id = self._create_session("Conversation en cours", has_title=False)
+        obj_id = _oid(session_id)
+        if obj_id is not None:
+            doc = await self.collection.find_one({"_id": obj_id}, {"_id": 1})
+            if doc:
+                return session_id, False
+        new_id = await self.create_session()
         return new_id, True
 
-    def _create_session(self, title: str, *, has_title: bool) -> str:
+    async def create_session(self) -> str:
+        return await self._create_session("Conversation en cours", has_title=False)
+
+    async def _create_session(self, title: str, *, has_title: bool) -> str:
         now = datetime.now(timezone.utc)
-        result = self.collection.insert_one(
+        result = await self.collection.insert_one(
             {
                 "title": title,
                 "has_title": has_title,
@@ -50,30 +90,28 @@ class ChatHistoryStore:
         )
         return str(result.inserted_id)
 
-    def needs_title(self, session_id: str) -> bool:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception:  # noqa: BLE001
+    async def needs_title(self, session_id: str) -> bool:
+        obj_id = _oid(session_id)
+        if obj_id is None:
             return False
-        doc = self.collection.find_one(
+        doc = await self.collection.find_one(
             {"_id": obj_id},
             {"has_title": 1},
         )
         return bool(doc and not doc.get("has_title"))
 
-    def update_title(self, session_id: str, title: str) -> None:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception:  # noqa: BLE001
+    async def update_title(self, session_id: str, title: str) -> None:
+        obj_id = _oid(session_id)
+        if obj_id is None:
             return
         safe_title = title.strip() or "Nouvelle conversation"
-        self.collection.update_one(
+        await self.collection.update_one(
             {"_id": obj_id},
             {"$set": {"title": safe_title[:80], "has_title": True}},
         )
 
     # Persistence --------------------------------------------------------
-    def record_turn(
+    async def record_turn(
         self,
         session_id: str,
         user_message: str,
@@ -81,16 +119,15 @@ class ChatHistoryStore:
         *,
         assistant_view_file: Optional[str] = None,
     ) -> None:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception as exc:  # noqa: BLE001
-            raise ValueError("Identifiant de session invalide") from exc
+        obj_id = _oid(session_id)
+        if obj_id is None:
+            raise ValueError("Identifiant de session invalide")
         now = datetime.now(timezone.utc)
         payload = [
             {"role": "user", "content": user_message, "created_at": now, "view_file": None},
             {"role": "assistant", "content": agent_message, "created_at": now, "view_file": assistant_view_file},
         ]
-        self.collection.update_one(
+        await self.collection.update_one(
             {"_id": obj_id},
             {
                 "$push": {"messages": {"$each": payload}},
@@ -100,44 +137,57 @@ class ChatHistoryStore:
         )
 
     # Retrieval helpers --------------------------------------------------
-    def get_recent_turns(self, session_id: str, limit: int = 5) -> List[Tuple[str, str]]:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception:  # noqa: BLE001
+    async def get_recent_turns(self, session_id: str, limit: int | None = None) -> List[Tuple[str, str]]:
+        limit = self.history_limit if limit is None else limit
+        obj_id = _oid(session_id)
+        if obj_id is None:
             return []
-        doc = self.collection.find_one(
+        doc = await self.collection.find_one(
             {"_id": obj_id},
             {"messages": {"$slice": -limit * 2}},
         )
         if not doc:
             return []
-        messages = doc.get("messages", [])
-        turns: List[Tuple[str, str]] = []
-        current_user: Optional[str] = None
-        for message in messages:
-            role = message.get("role")
-            content = message.get("content") or ""
-            if role == "user":
-                current_user = content
-            elif role == "assistant" and current_user is not None:
-                turns.append((current_user, content))
-                current_user = None
-        return turns[-limit:]
-
-    def get_recent_user_messages(self, session_id: str, limit: int = 5) -> List[str]:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception:  # noqa: BLE001
+        return _pair_turns(doc.get("messages", []), limit)
+
+    async def get_recent_user_messages(self, session_id: str, limit: int | None = None) -> List[str]:
+        limit = self.history_limit if limit is None else limit
+        obj_id = _oid(session_id)
+        if obj_id is None:
             return []
-        doc = self.collection.find_one(
+        doc = await self.collection.find_one(
             {"_id": obj_id},
             {"messages": {"$slice": -limit * 2}},
         )
         if not doc:
             return []
-        return [msg.get("content", "") for msg in doc.get("messages", []) if msg.get("role") == "user"][-limit:]
+        return _user_messages(doc.get("messages", []), limit)
+
+    async def get_context(
+        self,
+        session_id: Optional[str],
+        limit: int | None = None,
+    ) -> Optional[Tuple[List[Tuple[str, str]], List[str], bool]]:
+        """Fetch everything a chat turn needs in a single round-trip.
+
+        Returns (recent_turns, recent_user_messages, needs_title), or None when
+        the session id is missing, invalid or unknown. ``limit`` defaults to
+        ``settings.history_max_turns``.
+        """
+        limit = self.history_limit if limit is None else limit
+        obj_id = _oid(session_id)
+        if obj_id is None:
+            return None
+        doc = await self.collection.find_one(
+            {"_id": obj_id},
+            {"messages": {"$slice": -limit * 2}, "has_title": 1},
+        )
+        if not doc:
+            return None
+        messages = doc.get("messages", [])
+        return _pair_turns(messages, limit), _user_messages(messages, limit), not doc.get("has_title")
 
-    def list_sessions(self, limit: int = 20) -> List[dict]:
+    async def list_sessions(self, limit: int = 20) -> List[dict]:
         cursor = (
             self.collection.find({}, {"title": 1, "updated_at": 1})
             .sort("updated_at", DESCENDING)
@@ -149,15 +199,14 @@ class ChatHistoryStore:
                 "title": doc.get("title") or "Conversation",
                 "updated_at": doc.get("updated_at"),
             }
-            for doc in cursor
+            async for doc in cursor
         ]
 
-    def get_session(self, session_id: str) -> Optional[dict]:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception:  # noqa: BLE001
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        obj_id = _oid(session_id)
+        if obj_id is None:
             return None
-        doc = self.collection.find_one(
+        doc = await self.collection.find_one(
             {"_id": obj_id},
             {"title": 1, "messages": 1},
         )
@@ -178,9 +227,8 @@ class ChatHistoryStore:
             "messages": messages,
         }
 
-    def delete_session(self, session_id: str) -> None:
-        try:
-            obj_id = ObjectId(session_id)
-        except Exception:  # noqa: BLE001
+    async def delete_session(self, session_id: str) -> None:
+        obj_id = _oid(session_id)
+        if obj_id is None:
             return
-        self.collection.delete_one({"_id": obj_id})
+        await self.collection.delete_one({"_id": obj_id})
@@ -2,17 +2,28 @@
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import itertools
 import logging
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import List, Literal, Optional, Sequence, Tuple
+from typing import Any, AsyncIterator, Hashable, List, Literal, Optional, Sequence, Tuple
 
-from langchain_core.prompts import ChatPromptTemplate
+import httpx
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableSequence
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
+from ..core.config import settings
 from ..models.domain import AgentPayload, PipelineArtifacts, ZoneInsight
 from .agent_adapter import AgentAdapter
 from .pipeline import PipelineService
@@ -21,6 +32,90 @@ from .web_search import WebSearchResult, WebSearchTool
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive pool shared by every LLM call of an agent (no TLS handshake per request).
+LLM_HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+# With the optional h2 package (httpx[http2]) concurrent calls multiplex over one connection.
+LLM_HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def _http_client() -> httpx.Client:
+    return httpx.Client(limits=LLM_HTTP_LIMITS, http2=LLM_HTTP2)
+
+
+def _async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=LLM_HTTP_LIMITS, http2=LLM_HTTP2)
+
+# Entry caps of the in-process LRU caches (titles; fetch and analysis results per agent).
+TITLE_CACHE_SIZE = 1024
+RESULT_CACHE_SIZE = 128
+
+
+# Background tool work overlapping an LLM call: speculative fetches (during the planner)
+# and points-map rendering (during the responder).
+_TOOL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-tools")
+FETCH_TOOLS = frozenset({"fetch_commerces", "analyze_city"})
+
+
+def _log_cache_usage(response: object) -> None:
+    """Debug-log how many input tokens were served from the provider's prompt cache."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read")
+    if cached is not None:
+        logger.debug("LLM input tokens: %s (cache read: %s)", usage.get("input_tokens"), cached)
+
+
+def _response_key(messages: Sequence[BaseMessage]) -> str:
+    # The rendered prompt holds the history and the structured context (counts, places,
+    # zones): any change in the fetched data yields a different key.
+    raw = "\0".join(str(message.content) for message in messages).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _title_key(user_message: str, agent_answer: str) -> str:
+    raw = f"{user_message}\0{agent_answer[:500]}".encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class _LruCache:
+    """Small thread-safe LRU (tools run in worker threads) that logs its hit ratio."""
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            hits, total = self.hits, self.hits + self.misses
+        logger.debug("Cache %s: %s (%d/%d hits)", self.name, "hit" if value is not None else "miss", hits, total)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+# Generated session titles, keyed on a hash of (message, start of answer). First turns are
+# very repetitive, so a hit saves a full LLM round-trip. In-process only.
+_TITLE_CACHE = _LruCache("titles", TITLE_CACHE_SIZE)
+
 
 CITY_REGEX = re.compile(r"(?:\b(?:a|à|sur|dans|pour|en)\s+)([a-zàâçéèêëîïôûùüÿñ' -]{3,})", re.IGNORECASE)
 CATEGORY_STOP_TOKENS = (" à ", " a ", " dans ", " sur ", " pour ", " vers ", "\n", ".", ",", ";", "!", "?")
@@ -67,6 +162,128 @@ CATEGORY_KEYWORDS = (
     "hôtels",
 )
 
+# Keyword -> category label used in adapter messages and notices.
+CATEGORY_PLURALS = {
+    "restaurant": "restaurants",
+    "restaurants": "restaurants",
+    "pharmacie": "pharmacies",
+    "pharmacies": "pharmacies",
+    "boulangerie": "boulangeries",
+    "boulangeries": "boulangeries",
+    "boucherie": "boucheries",
+    "boucheries": "boucheries",
+    "supermarché": "supermarchés",
+    "supermarchés": "supermarchés",
+    "supermarches": "supermarchés",
+    "supérette": "supérettes",
+    "superette": "supérettes",
+    "supérettes": "supérettes",
+    "bars": "bars",
+    "bar": "bars",
+    "café": "cafés",
+    "cafés": "cafés",
+    "coiffeur": "coiffeurs",
+    "coiffeurs": "coiffeurs",
+    "coiffure": "coiffure",
+    "pressing": "pressing",
+    "pressings": "pressing",
+    "épicerie": "épiceries",
+    "épiceries": "épiceries",
+    "epicerie": "épiceries",
+    "epiceries": "épiceries",
+    "bazar": "bazar",
+    "boutique": "boutiques",
+    "boutiques": "boutiques",
+    "magasin": "magasins",
+    "magasins": "magasins",
+    "garage": "garages",
+    "garages": "garages",
+    "hotel": "hôtels",
+    "hotels": "hôtels",
+    "hôtel": "hôtels",
+    "hôtels": "hôtels",
+    "commerce": "commerces",
+    "commerces": "commerces",
+}
+# First CATEGORY_KEYWORDS entry wins (list order, not position in the text); longest
+# alternatives first so "bars" is tried before "bar" at the same offset.
+CATEGORY_RANK = {keyword: rank for rank, keyword in enumerate(CATEGORY_KEYWORDS)}
+CATEGORY_RE = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, sorted(CATEGORY_KEYWORDS, key=len, reverse=True))) + r")\b"
+)
+
+
+ANALYSIS_KEYWORDS = (
+    "implanter",
+    "implantation",
+    "emplacement",
+    "où placer",
+    "ou placer",
+    "où installer",
+    "ou installer",
+    "où ouvrir",
+    "ou ouvrir",
+    "où implanter",
+    "ou implanter",
+    "où se situer",
+    "ou se situer",
+    "conseil",
+    "conseils",
+    "stratégie",
+    "strategie",
+    "analyse",
+    "analyser",
+    "carte",
+    "zones recommand",
+    "zone recommand",
+    "densité",
+    "densite",
+    "quartier idéal",
+    "quartier ideal",
+    "population",
+)
+LISTING_KEYWORDS = (
+    "liste",
+    "list ",
+    "quels sont",
+    "combien",
+    "nombre",
+    "compte",
+    "compter",
+    "donne",
+    "donner",
+    "affiche",
+    "afficher",
+    "montre",
+    "montrer",
+    "recense",
+    "recenser",
+    "inventaire",
+)
+WEB_SEARCH_KEYWORDS = (
+    "recherche sur le web",
+    "cherche sur le web",
+    "sur le web",
+    "sur internet",
+    "actualité",
+    "actualite",
+    "infos en ligne",
+    "information en ligne",
+    "source web",
+    "peux-tu chercher",
+    "google",
+)
+
+
+def _keyword_regex(keywords: Sequence[str]) -> re.Pattern[str]:
+    # One alternation scanned in C instead of a Python-level `in` test per keyword.
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+ANALYSIS_RE = _keyword_regex(ANALYSIS_KEYWORDS)
+LISTING_RE = _keyword_regex(LISTING_KEYWORDS)
+WEB_SEARCH_RE = _keyword_regex(WEB_SEARCH_KEYWORDS)
+
 
 class ToolAction(BaseModel):
     """Represents a single step selected by the planner LLM."""
@@ -82,6 +299,13 @@ class ToolPlan(BaseModel):
         default_factory=list,
         description="Suite d'actions à exécuter dans l'ordre.",
     )
+    direct_answer: Optional[str] = Field(
+        default=None,
+        description="Réponse finale à l'utilisateur lorsque respond_direct est la seule action, sinon vide.",
+    )
+
+
+_WEB_SEARCH_ACTION = ToolAction(tool="web_search", reason="Demande explicite d'information provenant du web.")
 
 
 @dataclass
@@ -102,11 +326,81 @@ class ConversationIntent(str, Enum):
     ANALYSIS = "analysis"
 
 
-PLANNER_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """
+# Hint extraction is a pure function of the text and history messages are re-scanned on
+# every turn of a conversation: memoize on the raw string.
+HINT_CACHE_SIZE = 2048
+
+
+@functools.lru_cache(maxsize=HINT_CACHE_SIZE)
+def _detect_intent_cached(lowered: str) -> ConversationIntent:
+    normalized = lowered.replace("’", "'")
+    if ANALYSIS_RE.search(normalized):
+        return ConversationIntent.ANALYSIS
+    if LISTING_RE.search(normalized):
+        return ConversationIntent.LISTING
+    return ConversationIntent.GENERAL
+
+
+@functools.lru_cache(maxsize=HINT_CACHE_SIZE)
+def _extract_city_cached(text: str) -> Optional[str]:
+    # CITY_REGEX is case-insensitive: lowercase the (short) candidate, not the whole text.
+    match = CITY_REGEX.search(text)
+    if not match:
+        return None
+    candidate = match.group(1).strip(" ,;.!?'\"").lower()
+    return candidate or None
+
+
+@functools.lru_cache(maxsize=HINT_CACHE_SIZE)
+def _extract_category_cached(text: str) -> tuple[Optional[str], Optional[str]]:
+    lowered = text.lower()
+    match = min(CATEGORY_RE.finditer(lowered), key=lambda m: CATEGORY_RANK[m.group()], default=None)
+    if match is None:
+        return None, None
+    qualifier = _extract_qualifier(lowered[match.end() :])
+    return CATEGORY_PLURALS.get(match.group(), match.group()), qualifier
+
+
+def _extract_qualifier(suffix: str) -> Optional[str]:
+    fragment = suffix
+    for stop in CATEGORY_STOP_TOKENS:
+        idx = fragment.find(stop)
+        if idx != -1:
+            fragment = fragment[:idx]
+            break
+    qualifier = fragment.strip(" -,:;'\"")
+    return qualifier or None
+
+
+@dataclass
+class _TurnState:
+    """Per-turn inputs and tool results shared by the sync and async paths."""
+
+    message: str
+    session_id: str
+    history_text: str
+    intent: ConversationIntent
+    web_requested: bool
+    city_hint: Optional[str]
+    category_hint: Optional[str]
+    qualifier_hint: Optional[str]
+    adapter_message: str
+    fallback_adapter_message: Optional[str]
+    fetch_result: Optional[AgentPayload] = None
+    analysis_result: Optional[PipelineArtifacts] = None
+    map_path: Optional[Path] = None
+    web_result: Optional[WebSearchResult] = None
+    fallback_notice: Optional[str] = None
+    wants_analysis: bool = False
+    prefetch: Optional[Future] = None
+    map_build: Optional[Future] = None
+    direct_answer: Optional[str] = None
+
+
+# Prompts: the system blocks are static messages built once; only the per-turn tail is
+# assembled in _planner_input / _responder_input (also keeps the prefix cacheable).
+PLANNER_SYSTEM = SystemMessage(
+    content="""
 Tu es un orchestrateur qui décide quand utiliser ces actions :
 - fetch_commerces : interroger l'agent historique avec la dernière requête utilisateur (ville + type) afin d'obtenir un JSON de commerces.
 - analyze_city : utiliser le fichier JSON le plus récent pour lancer l'analyse INSEE + KMeans et produire des zones recommandées et une carte.
@@ -120,22 +414,13 @@ Procédure :
 4. Utilise web_search UNIQUEMENT lorsque la réponse nécessite des faits externes (actualités, données générales hors commerces locaux) ou quand l'utilisateur insiste sur des sources en ligne.
 5. Utilise respond_direct pour les questions générales, les précisions ou lorsqu'aucun outil n'est nécessaire.
 6. Indique en une phrase la raison de chaque action en reprenant les éléments concrets de la demande.
-
-Intention détectée : {intent}
-Historique (du plus récent au plus ancien) :
-{history}
-""".strip(),
-        ),
-        ("human", "{message}"),
-    ]
+7. Si respond_direct est la seule action, rédige aussi dans direct_answer la réponse finale à l'utilisateur (en français, en répondant au dernier message) ; sinon laisse direct_answer vide.
+""".strip()
 )
 
 
-RESPONSE_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """
+RESPONSE_SYSTEM = SystemMessage(
+    content="""
 Tu es CityInsights, expert en stratégie commerciale.
 Priorité absolue : répondre au DERNIER message utilisateur. Si l'historique contredit la requête actuelle, suis la requête actuelle et ignore l'ancienne consigne.
 
@@ -143,9 +428,6 @@ Tu disposes éventuellement de données structurées :
 - Informations sur les commerces (ville, catégorie, nombre total, exemples).
 - Analyse habitants + zones (population estimée, concurrence, carte générée).
 
-Historique (du plus récent au plus ancien) :
-{history}
-
 Règles de réponse :
 1. Commence par reformuler brièvement la demande ou rappeler les paramètres (ville, catégorie) pour montrer que tu as compris la consigne actuelle.
 2. Lorsque seule la liste des commerces est demandée, concentre-toi sur les volumes, exemples et éventuelles limites ; n'ajoute pas de recommandation d'implantation.
@@ -153,33 +435,62 @@ Règles de réponse :
 4. Invite à consulter la carte lorsqu'elle est disponible et pertinente (ex : « Consulte la carte jointe... »).
 5. Si des informations issues du web sont fournies, cite-les clairement (ex : « D'après une recherche web récente... ») et mentionne jusqu'à deux sources.
 6. Si aucune donnée structurée n'est fournie, apporte une réponse générale en te basant sur ton expertise et propose une question de clarification si nécessaire.
-""".strip(),
-        ),
-        ("human", "{message}"),
-        ("human", "Instructions additionnelles : {instructions}"),
-        (
-            "human",
-            "Contexte structuré :\n{context}\nCompose ta réponse :",
-        ),
-    ]
+""".strip()
 )
 
 
-TITLE_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            "Tu reçois un échange utilisateur/assistant et tu dois proposer un titre très court (5 mots max). "
-            "Le titre doit être descriptif et écrit en français.",
-        ),
-        (
-            "human",
-            "Message utilisateur : {user}\n"
-            "Réponse de l'assistant : {agent}\n"
-            "Titre suggéré :",
+TITLE_SYSTEM = SystemMessage(
+    content=(
+        "Tu reçois un échange utilisateur/assistant et tu dois proposer un titre très court (5 mots max). "
+        "Le titre doit être descriptif et écrit en français."
+    )
+)
+
+
+def _title_messages(user_message: str, agent_answer: str) -> List[BaseMessage]:
+    return [
+        TITLE_SYSTEM,
+        HumanMessage(
+            content=f"Message utilisateur : {user_message}\nRéponse de l'assistant : {agent_answer}\nTitre suggéré :"
         ),
     ]
-)
+
+
+class _LlmSet:
+    """The agent's chat models on one connection pool, with the cap on in-flight async calls.
+
+    An ``httpx.AsyncClient`` pool and an ``asyncio.Semaphore`` belong to the event loop that
+    first uses them, so async calls go through one set per loop (see ``CityInsightsAgent._aio``).
+    """
+
+    def __init__(
+        self,
+        *,
+        model: str,
+        temperature: float,
+        planner_model: str,
+        http_client: httpx.Client,
+        http_async_client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.http_async_client = http_async_client
+        self.llm = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        # Routing is a small classification task: a faster model on the same connection pool.
+        self.planner_llm = ChatOpenAI(
+            model=planner_model,
+            temperature=0.0,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        self.planner = self.planner_llm.with_structured_output(ToolPlan)
+        self.responder = self.llm
+        self.titler = self.llm
+        # Caps concurrent async LLM calls across requests to stay under rate limits.
+        self.slots = asyncio.Semaphore(settings.llm_max_inflight)
 
 
 class CityInsightsAgent:
@@ -189,6 +500,7 @@ class CityInsightsAgent:
         model: str = "gpt-5.1",
         temperature: float = 0.0,
         web_model: str = "gpt-4.1-mini",
+        planner_model: str = "gpt-4.1-mini",
     ) -> None:
         self.adapter = AgentAdapter()
         self.pipeline = PipelineService()
@@ -197,10 +509,60 @@ class CityInsightsAgent:
         except Exception as exc:  # noqa: BLE001
             logger.warning("Impossible d'initialiser la recherche web: %s", exc)
             self.web_search_tool = None
-        self.llm = ChatOpenAI(model=model, temperature=temperature)
-        self.planner = PLANNER_PROMPT | self.llm.with_structured_output(ToolPlan)
-        self.responder = RESPONSE_PROMPT | self.llm
-        self.titler = TITLE_PROMPT | self.llm
+        self._llm_options = {"model": model, "temperature": temperature, "planner_model": planner_model}
+        # The sync pool is loop-independent: one for the agent's lifetime.
+        self._http_client = _http_client()
+        sync_llms = _LlmSet(**self._llm_options, http_client=self._http_client)
+        self.llm = sync_llms.llm
+        self.planner_llm = sync_llms.planner_llm
+        self.planner = sync_llms.planner
+        self.responder = sync_llms.responder
+        self.titler = sync_llms.titler
+        # Async models per event loop: the app loop, plus one per run_batch call.
+        self._loop_llms: dict[asyncio.AbstractEventLoop, _LlmSet] = {}
+        # Same adapter message / same fetched dataset -> reuse the legacy fetch and the analysis.
+        self._fetch_cache = _LruCache("fetch", RESULT_CACHE_SIZE)
+        self._analysis_cache = _LruCache("analysis", RESULT_CACHE_SIZE)
+        # Exact-prompt answer cache; only deterministic (temperature 0) answers are reused.
+        self._response_cache: Optional[_LruCache] = (
+            _LruCache("responses", RESULT_CACHE_SIZE) if temperature == 0.0 else None
+        )
+        # Turns planned locally, without the planner LLM (see _local_plan).
+        self.planner_skipped_total = 0
+
+    def _aio(self) -> _LlmSet:
+        """Async models, connection pool and in-flight cap of the running event loop."""
+        loop = asyncio.get_running_loop()
+        llms = self._loop_llms.get(loop)
+        if llms is None:
+            # Loops closed without releasing their set (their pool can no longer be closed).
+            for stale in [other for other in self._loop_llms if other.is_closed()]:
+                del self._loop_llms[stale]
+            llms = _LlmSet(
+                **self._llm_options,
+                http_client=self._http_client,
+                http_async_client=_async_http_client(),
+            )
+            self._loop_llms[loop] = llms
+        return llms
+
+    async def _arelease_loop(self) -> None:
+        """Close the running loop's async connection pool (before that loop ends)."""
+        llms = self._loop_llms.pop(asyncio.get_running_loop(), None)
+        if llms is not None:
+            await llms.http_async_client.aclose()
+
+    async def aclose(self) -> None:
+        """Close the LLM connection pools (application shutdown)."""
+        self._http_client.close()
+        await self._arelease_loop()
+
+    def clear_cache(self) -> None:
+        """Drop memoized fetch, analysis and answer results (e.g. after a data refresh)."""
+        self._fetch_cache.clear()
+        self._analysis_cache.clear()
+        if self._response_cache is not None:
+            self._response_cache.clear()
 
     def run(
         self,
@@ -214,37 +576,201 @@ class CityInsightsAgent:
         try:
             outcome = self._execute_turn(
                 message,
+                session_id=session_id,
                 prior_turns=prior_turns,
                 prior_user_messages=prior_user_messages,
             )
         except Exception as exc:  # noqa: BLE001
             logger.exception("Agent error while processing message")
-            answer = self.build_error_answer(message, exc)
-            return AgentOutcome(
-                answer=answer,
-                fetch=None,
-                analysis=None,
-                map_file=None,
-                web_result=None,
-                intent=ConversationIntent.GENERAL,
-            )
+            return self._error_outcome(message, exc)
         return outcome
 
-    def _execute_turn(
+    async def arun(
         self,
         message: str,
         *,
+        session_id: str,
         prior_turns: Sequence[Tuple[str, str]],
         prior_user_messages: Sequence[str],
     ) -> AgentOutcome:
-        fetch_result: AgentPayload | None = None
-        analysis_result: PipelineArtifacts | None = None
-        map_path: Path | None = None
-        web_result: WebSearchResult | None = None
-        fallback_notice: Optional[str] = None
+        """Async variant of :meth:`run`: LLM calls are awaited, blocking tools run in a worker thread."""
+        logger.debug("Processing session %s with new message (async)", session_id)
+        try:
+            state = self._prepare_turn(
+                message,
+                session_id=session_id,
+                prior_turns=prior_turns,
+                prior_user_messages=prior_user_messages,
+            )
+            self._start_prefetch(state)
+            plan = await self._aplan(state)
+            await self._arun_actions(state, plan)
+            if state.direct_answer is not None:
+                return self._build_outcome(state, state.direct_answer)
+            messages = self._responder_input(state)
+            answer = self._cached_answer(messages)
+            if answer is None:
+                llms = self._aio()
+                async with llms.slots:
+                    response = await self._cache_keyed(llms.responder, state).ainvoke(messages)
+                answer = self._store_answer(messages, response)
+            if state.map_build is not None:
+                state.map_path = await asyncio.wrap_future(state.map_build)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Agent error while processing message")
+            return self._error_outcome(message, exc)
+        return self._build_outcome(state, answer)
+
+    async def arun_batch(self, messages: Sequence[str], *, max_concurrency: int = 8) -> List[AgentOutcome]:
+        """Run independent single-turn messages concurrently (evaluation / bulk use).
+
+        Each message is a fresh conversation; outcomes are returned in input order.
+        """
+        slots = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _one(index: int, message: str) -> AgentOutcome:
+            async with slots:
+                return await self.arun(
+                    message,
+                    session_id=f"batch-{index}",
+                    prior_turns=(),
+                    prior_user_messages=(),
+                )
+
+        return list(await asyncio.gather(*(_one(i, m) for i, m in enumerate(messages))))
 
+    def run_batch(self, messages: Sequence[str], *, max_concurrency: int = 8) -> List[AgentOutcome]:
+        """Blocking wrapper around :meth:`arun_batch` for scripts (not for use inside a running loop).
+
+        Each call runs on a new event loop with its own async connection pool, closed before
+        the loop ends, so the agent can be batched repeatedly and still serve the app loop.
+        """
+
+        async def _batch() -> List[AgentOutcome]:
+            try:
+                return await self.arun_batch(messages, max_concurrency=max_concurrency)
+            finally:
+                await self._arelease_loop()
+
+        return asyncio.run(_batch())
+
+    async def astream(
+        self,
+        message: str,
+        *,
+        session_id: str,
+        prior_turns: Sequence[Tuple[str, str]],
+        prior_user_messages: Sequence[str],
+    ) -> AsyncIterator[str | AgentOutcome]:
+        """Like :meth:`arun`, but yields the answer text as it is generated.
+
+        Yields ``str`` deltas, then the complete :class:`AgentOutcome` as the last item.
+        """
+        logger.debug("Processing session %s with new message (stream)", session_id)
+        try:
+            state = self._prepare_turn(
+                message,
+                session_id=session_id,
+                prior_turns=prior_turns,
+                prior_user_messages=prior_user_messages,
+            )
+            self._start_prefetch(state)
+            plan = await self._aplan(state)
+            await self._arun_actions(state, plan)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Agent error while processing message")
+            outcome = self._error_outcome(message, exc)
+            yield outcome.answer
+            yield outcome
+            return
+
+        if state.direct_answer is not None:
+            yield state.direct_answer
+            yield self._build_outcome(state, state.direct_answer)
+            return
+
+        parts: List[str] = []
+        messages = self._responder_input(state)
+        cached = self._cached_answer(messages)
+        if cached is not None:
+            parts.append(cached)
+            yield cached
+        else:
+            try:
+                llms = self._aio()
+                async with llms.slots:
+                    async for chunk in self._cache_keyed(llms.responder, state).astream(messages):
+                        delta = getattr(chunk, "content", "")
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Agent error while streaming answer")
+                if not parts:
+                    outcome = self._error_outcome(message, exc)
+                    yield outcome.answer
+                    yield outcome
+                    return
+            else:
+                if self._response_cache is not None and parts:
+                    self._response_cache.put(_response_key(messages), "".join(parts))
+        if state.map_build is not None:
+            try:
+                state.map_path = await asyncio.wrap_future(state.map_build)
+            except Exception as exc:  # noqa: BLE001 - the answer is already out: drop the map only
+                logger.warning("Carte des commerces indisponible: %s", exc)
+                state.map_path = None
+        yield self._build_outcome(state, "".join(parts))
+
+    def _error_outcome(self, message: str, exc: Exception) -> AgentOutcome:
+        return AgentOutcome(
+            answer=self.build_error_answer(message, exc),
+            fetch=None,
+            analysis=None,
+            map_file=None,
+            web_result=None,
+            intent=ConversationIntent.GENERAL,
+        )
+
+    def _execute_turn(
+        self,
+        message: str,
+        *,
+        session_id: str,
+        prior_turns: Sequence[Tuple[str, str]],
+        prior_user_messages: Sequence[str],
+    ) -> AgentOutcome:
+        state = self._prepare_turn(
+            message,
+            session_id=session_id,
+            prior_turns=prior_turns,
+            prior_user_messages=prior_user_messages,
+        )
+        self._start_prefetch(state)
+        plan = self._local_plan(state) or self._cache_keyed(self.planner, state).invoke(self._planner_input(state))
+        self._run_actions(state, plan)
+        if state.direct_answer is not None:
+            return self._build_outcome(state, state.direct_answer)
+        messages = self._responder_input(state)
+        answer = self._cached_answer(messages)
+        if answer is None:
+            response = self._cache_keyed(self.responder, state).invoke(messages)
+            answer = self._store_answer(messages, response)
+        if state.map_build is not None:
+            state.map_path = state.map_build.result()
+        return self._build_outcome(state, answer)
+
+    def _prepare_turn(
+        self,
+        message: str,
+        *,
+        session_id: str,
+        prior_turns: Sequence[Tuple[str, str]],
+        prior_user_messages: Sequence[str],
+    ) -> _TurnState:
         history_text = self._format_history(prior_turns)
-        intent = self._detect_intent(message)
+        lowered = message.lower()
+        intent = self._detect_intent(lowered)
         city_hint, category_hint, qualifier_hint = self._infer_parameters(
             prior_user_messages,
             latest_message=message,
@@ -269,107 +795,253 @@ class CityInsightsAgent:
             if qualifier_hint
             else None
         )
-        plan = self.planner.invoke(
-            {
-                "message": message,
-                "history": history_text,
-                "intent": self._describe_intent(intent),
-            }
+        return _TurnState(
+            message=message,
+            session_id=session_id,
+            history_text=history_text,
+            intent=intent,
+            web_requested=self._needs_web_search(lowered),
+            city_hint=city_hint,
+            category_hint=category_hint,
+            qualifier_hint=qualifier_hint,
+            adapter_message=adapter_message,
+            fallback_adapter_message=fallback_adapter_message,
+        )
+
+    def _cache_keyed(self, runnable: Runnable, state: _TurnState) -> Runnable:
+        """``runnable`` with the session's prompt_cache_key bound on the chat model call.
+
+        Routes a session's calls to the same OpenAI cache shard, so the static system prefix
+        (and the shared history block) is served from the prompt cache. The structured-output
+        planner is a model | parser sequence: the key is bound on its model step.
+        """
+        if isinstance(runnable, RunnableSequence):
+            return RunnableSequence(
+                runnable.first.bind(prompt_cache_key=state.session_id), *runnable.middle, runnable.last
+            )
+        return runnable.bind(prompt_cache_key=state.session_id)
+
+    def _planner_input(self, state: _TurnState) -> List[BaseMessage]:
+        return [
+            PLANNER_SYSTEM,
+            # History before the per-turn intent line: system + history is then a prefix
+            # shared with the next turn's planner call.
+            HumanMessage(content=f"Historique :\n{state.history_text}"),
+            HumanMessage(content=f"Intention détectée : {self._describe_intent(state.intent)}"),
+            HumanMessage(content=state.message),
+        ]
+
+    def _local_plan(self, state: _TurnState) -> Optional[ToolPlan]:
+        """Plan deterministically when the planner's answer could not change the tools run.
+
+        An explicit web search always resolves to web_search alone, and a listing or
+        analysis request with a known city and category always resolves to fetch
+        (+ analysis): the planner LLM round trip is skipped in both cases.
+        """
+        if state.web_requested:
+            plan = ToolPlan(actions=[_WEB_SEARCH_ACTION])
+        elif state.intent != ConversationIntent.GENERAL and state.city_hint and state.category_hint:
+            actions = [ToolAction(tool="fetch_commerces", reason="Ville et type de commerce déduits de la demande.")]
+            if state.intent == ConversationIntent.ANALYSIS:
+                actions.append(ToolAction(tool="analyze_city", reason="Analyse requise pour recommander un emplacement."))
+            plan = ToolPlan(actions=actions)
+        else:
+            return None
+        self.planner_skipped_total += 1
+        logger.debug("Planner skipped (%d so far)", self.planner_skipped_total)
+        return plan
+
+    async def _aplan(self, state: _TurnState) -> ToolPlan:
+        plan = self._local_plan(state)
+        if plan is not None:
+            return plan
+        llms = self._aio()
+        async with llms.slots:
+            return await self._cache_keyed(llms.planner, state).ainvoke(self._planner_input(state))
+
+    def _start_prefetch(self, state: _TurnState) -> None:
+        """Start the legacy fetch while the planner runs, when it is certainly needed.
+
+        Only listing/analysis intents prefetch: :meth:`_resolve_actions` adds a fetch for
+        them whatever the plan. A running fetch cannot be cancelled (LLM, Overpass, JSON
+        written) and holds a _TOOL_POOL worker that map rendering needs, so other turns
+        fetch only if the planner asks. Explicit web searches never fetch.
+        """
+        if state.web_requested:
+            return
+        if state.intent not in (ConversationIntent.LISTING, ConversationIntent.ANALYSIS):
+            return
+        state.prefetch = _TOOL_POOL.submit(
+            self._run_fetch_with_fallback,
+            state.adapter_message,
+            fallback_message=state.fallback_adapter_message,
+            category_hint=state.category_hint,
+            qualifier=state.qualifier_hint,
+        )
+
+    def _run_actions(self, state: _TurnState, plan: ToolPlan) -> None:
+        """Execute the planned tools (blocking: legacy agent, pipeline, web search)."""
+        actions, needs_fetch = self._resolve_actions(state, plan)
+        if self._answer_directly(state, plan, actions):
+            return
+        self._run_data_tools(state, actions, needs_fetch)
+        self._run_web_tool(state, actions)
+
+    async def _arun_actions(self, state: _TurnState, plan: ToolPlan) -> None:
+        """Async variant of :meth:`_run_actions`.
+
+        Web search and the data tools (fetch, analysis, map) write disjoint fields of
+        ``state``, so they run side by side in worker threads.
+        """
+        actions, needs_fetch = self._resolve_actions(state, plan)
+        if self._answer_directly(state, plan, actions):
+            return
+        await asyncio.gather(
+            asyncio.to_thread(self._run_data_tools, state, actions, needs_fetch),
+            asyncio.to_thread(self._run_web_tool, state, actions),
         )
+
+    def _answer_directly(self, state: _TurnState, plan: ToolPlan, actions: Sequence[ToolAction]) -> bool:
+        """Adopt the planner's own answer when no tool has to run (saves the responder call)."""
+        answer = (plan.direct_answer or "").strip()
+        if not answer or any(a.tool != "respond_direct" for a in actions):
+            return False
+        if state.prefetch is not None:
+            state.prefetch.cancel()
+            state.prefetch = None
+        state.direct_answer = answer
+        return True
+
+    def _resolve_actions(self, state: _TurnState, plan: ToolPlan) -> Tuple[List[ToolAction], bool]:
+        intent = state.intent
         actions = plan.actions or [ToolAction(tool="fetch_commerces", reason="Par défaut")]  # type: ignore[arg-type]
+        tools = {a.tool for a in actions}
         analysis_required = intent == ConversationIntent.ANALYSIS
-        if analysis_required and not any(a.tool == "analyze_city" for a in actions):
-            if not any(a.tool == "fetch_commerces" for a in actions):
+        if analysis_required and "analyze_city" not in tools:
+            if "fetch_commerces" not in tools:
                 actions.insert(
                     0,
                     ToolAction(tool="fetch_commerces", reason="Analyse requise pour recommander un emplacement."),
                 )
             actions.append(ToolAction(tool="analyze_city", reason="Analyse requise pour recommander un emplacement."))
-        if intent == ConversationIntent.LISTING and not any(a.tool == "fetch_commerces" for a in actions):
+            tools.update(("fetch_commerces", "analyze_city"))
+        if intent == ConversationIntent.LISTING and "fetch_commerces" not in tools:
             actions.insert(
                 0,
                 ToolAction(tool="fetch_commerces", reason="L'utilisateur demande un recensement précis des commerces."),
             )
+            tools.add("fetch_commerces")
 
-        needs_fetch = any(a.tool in {"fetch_commerces", "analyze_city"} for a in actions)
-        wants_analysis = analysis_required or any(a.tool == "analyze_city" for a in actions)
+        needs_fetch = not tools.isdisjoint(FETCH_TOOLS)
+        state.wants_analysis = analysis_required or "analyze_city" in tools
 
-        if self._needs_web_search(message):
-            actions = [
-                ToolAction(tool="web_search", reason="Demande explicite d'information provenant du web.")
-            ]
+        if state.web_requested:
+            # Web-only turn: nothing is fetched, so nothing is required from the data tools.
+            return [_WEB_SEARCH_ACTION], False
+        return actions, needs_fetch
 
-        for action in actions:
-            if action.tool == "fetch_commerces" and fetch_result is None:
-                fetch_result, note = self._run_fetch_with_fallback(
-                    adapter_message,
-                    fallback_message=fallback_adapter_message,
-                    category_hint=category_hint,
-                    qualifier=qualifier_hint,
-                )
+    def _run_data_tools(self, state: _TurnState, actions: Sequence[ToolAction], needs_fetch: bool) -> None:
+        prefetch, state.prefetch = state.prefetch, None
+        if prefetch is not None:
+            if any(a.tool in FETCH_TOOLS for a in actions):
+                state.fetch_result, note = prefetch.result()
                 if note:
-                    fallback_notice = fallback_notice or note
-            elif action.tool == "analyze_city":
-                if not fetch_result:
-                    fetch_result, note = self._run_fetch_with_fallback(
-                        adapter_message,
-                        fallback_message=fallback_adapter_message,
-                        category_hint=category_hint,
-                        qualifier=qualifier_hint,
-                    )
-                    if note:
-                        fallback_notice = fallback_notice or note
-                analysis_result = self.pipeline.run_from_agent(fetch_result)
-                map_path = analysis_result.map_file
-            elif action.tool == "web_search" and web_result is None:
-                if self.web_search_tool is None:
-                    logger.info("Web search tool indisponible, action ignorée.")
-                    continue
-                query = self._build_search_query(message, city_hint=city_hint, category_hint=category_hint)
-                try:
-                    web_result = self.web_search_tool.search(query)
-                except Exception as exc:  # noqa: BLE001
-                    logger.warning("Recherche web impossible: %s", exc)
-            elif action.tool == "respond_direct":
-                continue
+                    state.fallback_notice = state.fallback_notice or note
+            else:
+                prefetch.cancel()  # plan does not need it: drop (no-op if already running)
+        handlers = {"fetch_commerces": self._handle_fetch, "analyze_city": self._handle_analyze}
+        for action in actions:
+            handler = handlers.get(action.tool)
+            if handler is not None:
+                handler(state)
 
-        if needs_fetch and fetch_result is None:
+        if needs_fetch and state.fetch_result is None:
             raise RuntimeError("Impossible d'obtenir les commerces depuis la requête utilisateur.")
 
-        if fetch_result and fetch_result.places and not wants_analysis:
-            map_path = self.pipeline.build_points_map(fetch_result)
+        if state.fetch_result and state.fetch_result.places and not state.wants_analysis:
+            # The responder only needs the (deterministic) path: render the map alongside it.
+            state.map_path = self.pipeline.points_map_path(state.fetch_result)
+            state.map_build = _TOOL_POOL.submit(self.pipeline.build_points_map, state.fetch_result)
+
+    def _handle_fetch(self, state: _TurnState) -> None:
+        if state.fetch_result is not None:
+            return
+        state.fetch_result, note = self._run_fetch_with_fallback(
+            state.adapter_message,
+            fallback_message=state.fallback_adapter_message,
+            category_hint=state.category_hint,
+            qualifier=state.qualifier_hint,
+        )
+        if note:
+            state.fallback_notice = state.fallback_notice or note
+
+    def _handle_analyze(self, state: _TurnState) -> None:
+        if state.analysis_result is not None:
+            return
+        self._handle_fetch(state)
+        state.analysis_result = self._analyze(state.fetch_result)
+        state.map_path = state.analysis_result.map_file
+
+    def _run_web_tool(self, state: _TurnState, actions: Sequence[ToolAction]) -> None:
+        if not any(a.tool == "web_search" for a in actions):
+            return
+        if self.web_search_tool is None:
+            logger.info("Web search tool indisponible, action ignorée.")
+            return
+        query = self._build_search_query(
+            state.message,
+            city_hint=state.city_hint,
+            category_hint=state.category_hint,
+        )
+        try:
+            state.web_result = self.web_search_tool.search(query)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Recherche web impossible: %s", exc)
 
+    def _responder_input(self, state: _TurnState) -> List[BaseMessage]:
         context = self._build_context(
-            fetch_result,
-            analysis_result,
-            map_file=map_path,
-            web_result=web_result,
-            include_analysis_details=wants_analysis,
-            intent=intent,
+            state.fetch_result,
+            state.analysis_result,
+            map_file=state.map_path,
+            web_result=state.web_result,
+            include_analysis_details=state.wants_analysis,
+            intent=state.intent,
         )
         instructions = self._build_instructions(
-            intent,
-            fallback_notice=fallback_notice,
-            web_result=web_result,
-        )
-        if fallback_notice:
-            context += "\n\nNote : " + fallback_notice
-        response = self.responder.invoke(
-            {
-                "message": message,
-                "context": context,
-                "history": history_text,
-                "instructions": instructions,
-            }
+            state.intent,
+            fallback_notice=state.fallback_notice,
+            web_result=state.web_result,
         )
+        if state.fallback_notice:
+            context += "\n\nNote : " + state.fallback_notice
+        return [
+            RESPONSE_SYSTEM,
+            HumanMessage(content=f"Historique :\n{state.history_text}"),
+            HumanMessage(content=state.message),
+            HumanMessage(content=f"Instructions additionnelles : {instructions}"),
+            HumanMessage(content=f"Contexte structuré :\n{context}\nCompose ta réponse :"),
+        ]
+
+    def _cached_answer(self, messages: Sequence[BaseMessage]) -> Optional[str]:
+        if self._response_cache is None:
+            return None
+        return self._response_cache.get(_response_key(messages))
+
+    def _store_answer(self, messages: Sequence[BaseMessage], response: object) -> str:
+        _log_cache_usage(response)
         answer = getattr(response, "content", "Réponse générée.")
+        if answer and self._response_cache is not None:
+            self._response_cache.put(_response_key(messages), answer)
+        return answer
+
+    def _build_outcome(self, state: _TurnState, answer: str) -> AgentOutcome:
         return AgentOutcome(
             answer=answer,
-            fetch=fetch_result,
-            analysis=analysis_result,
-            map_file=map_path,
-             web_result=web_result,
-            intent=intent,
+            fetch=state.fetch_result,
+            analysis=state.analysis_result,
+            map_file=state.map_path,
+            web_result=state.web_result,
+            intent=state.intent,
         )
 
     # ------------------------------------------------------------------
@@ -425,10 +1097,13 @@ class CityInsightsAgent:
         return "\n\n".join(parts)
 
     def _format_history(self, prior_turns: Sequence[Tuple[str, str]]) -> str:
+        """Render the last turns oldest first: a new exchange is appended at the end instead of
+        renumbering every line, which keeps the prompt prefix cacheable."""
         if not prior_turns:
             return "Aucun échange précédent."
-        lines: List[str] = []
-        for idx, (user, agent) in enumerate(reversed(prior_turns), start=1):
+        recent = prior_turns[-settings.history_max_turns :]
+        lines: List[str] = [f"Derniers {len(recent)} échanges (du plus ancien au plus récent) :"]
+        for idx, (user, agent) in enumerate(recent, start=1):
             lines.append(f"{idx}. Utilisateur : {user}")
             lines.append(f"   Agent : {agent}")
         return "\n".join(lines)
@@ -501,60 +1176,9 @@ class CityInsightsAgent:
                 best_zone = zone
         return best_zone, best_score
 
-    def _detect_intent(self, message: str) -> ConversationIntent:
-        normalized = message.lower().replace("’", "'")
-        analysis_keywords = (
-            "implanter",
-            "implantation",
-            "emplacement",
-            "où placer",
-            "ou placer",
-            "où installer",
-            "ou installer",
-            "où ouvrir",
-            "ou ouvrir",
-            "où implanter",
-            "ou implanter",
-            "où se situer",
-            "ou se situer",
-            "conseil",
-            "conseils",
-            "stratégie",
-            "strategie",
-            "analyse",
-            "analyser",
-            "carte",
-            "zones recommand",
-            "zone recommand",
-            "densité",
-            "densite",
-            "quartier idéal",
-            "quartier ideal",
-            "population",
-        )
-        listing_keywords = (
-            "liste",
-            "list ",
-            "quels sont",
-            "combien",
-            "nombre",
-            "compte",
-            "compter",
-            "donne",
-            "donner",
-            "affiche",
-            "afficher",
-            "montre",
-            "montrer",
-            "recense",
-            "recenser",
-            "inventaire",
-        )
-        if any(keyword in normalized for keyword in analysis_keywords):
-            return ConversationIntent.ANALYSIS
-        if any(keyword in normalized for keyword in listing_keywords):
-            return ConversationIntent.LISTING
-        return ConversationIntent.GENERAL
+    def _detect_intent(self, lowered: str) -> ConversationIntent:
+        """Classify an already lowercased message (lowered once per turn in _prepare_turn)."""
+        return _detect_intent_cached(lowered)
 
     def _describe_intent(self, intent: ConversationIntent) -> str:
         if intent == ConversationIntent.ANALYSIS:
@@ -574,8 +1198,9 @@ class CityInsightsAgent:
         include_qualifier: bool,
     ) -> str:
         """Construit une requête claire pour l'agent legacy en réutilisant les infos implicites."""
-        recent_users = [user.strip() for user in prior_user_messages if user.strip()]
-        tail = recent_users[-2:]
+        # Only the last two non-empty messages are kept: walk backwards, stop early.
+        recent = (text for text in map(str.strip, reversed(prior_user_messages)) if text)
+        tail = list(itertools.islice(recent, 2))[::-1]
         hints: List[str] = []
         if category_hint:
             category_text = category_hint
@@ -603,8 +1228,7 @@ class CityInsightsAgent:
         city: Optional[str] = None
         category: Optional[str] = None
         qualifier: Optional[str] = None
-        history = list(prior_user_messages) + [latest_message]
-        for raw_text in reversed(history):
+        for raw_text in itertools.chain((latest_message,), reversed(prior_user_messages)):
             text = raw_text.strip()
             if not text:
                 continue
@@ -631,16 +1255,40 @@ class CityInsightsAgent:
         category_hint: Optional[str],
         qualifier: Optional[str],
     ) -> tuple[AgentPayload, Optional[str]]:
+        # The generalized fetch (a full legacy tool loop) only runs once the precise one
+        # came back empty: never speculatively, so a hit costs a single fetch.
         try:
-            return self.adapter.run_from_message(primary_message), None
+            return self._fetch(primary_message), None
         except Exception as exc:  # noqa: BLE001
             if not fallback_message or not qualifier or not self._should_retry_with_general(exc):
                 raise
             logger.info("Retrying commerce fetch with generalized parameters: %s", exc)
-            payload = self.adapter.run_from_message(fallback_message)
+            payload = self._fetch(fallback_message)
             notice = self._build_fallback_notice(category_hint, qualifier)
             return payload, notice
 
+    def _fetch(self, adapter_message: str) -> AgentPayload:
+        key = hashlib.sha1(adapter_message.encode("utf-8")).hexdigest()
+        payload = self._fetch_cache.get(key)
+        if payload is None:
+            payload = self.adapter.run_from_message(adapter_message)
+            self._fetch_cache.put(key, payload)
+        return payload
+
+    def _analyze(self, fetch_result: AgentPayload) -> PipelineArtifacts:
+        bbox = fetch_result.bbox
+        key = (
+            fetch_result.city,
+            fetch_result.category_key,
+            fetch_result.count,
+            (bbox.south, bbox.west, bbox.north, bbox.east),
+        )
+        artifacts = self._analysis_cache.get(key)
+        if artifacts is None:
+            artifacts = self.pipeline.run_from_agent(fetch_result)
+            self._analysis_cache.put(key, artifacts)
+        return artifacts
+
     def _should_retry_with_general(self, error: Exception) -> bool:
         message = str(error).lower()
         keywords = (
@@ -661,22 +1309,8 @@ class CityInsightsAgent:
             )
         return "Impossible de trouver la version spécifique demandée. Présente les résultats les plus proches."
 
-    def _needs_web_search(self, message: str) -> bool:
-        normalized = message.lower()
-        keywords = (
-            "recherche sur le web",
-            "cherche sur le web",
-            "sur le web",
-            "sur internet",
-            "actualité",
-            "actualite",
-            "infos en ligne",
-            "information en ligne",
-            "source web",
-            "peux-tu chercher",
-            "google",
-        )
-        return any(keyword in normalized for keyword in keywords)
+    def _needs_web_search(self, lowered: str) -> bool:
+        return WEB_SEARCH_RE.search(lowered) is not None
 
     def _build_search_query(
         self,
@@ -698,88 +1332,42 @@ class CityInsightsAgent:
         return base or "tendances commerces France"
 
     def _extract_city_hint(self, text: str) -> Optional[str]:
-        match = CITY_REGEX.search(text.lower())
-        if not match:
-            return None
-        candidate = match.group(1).strip(" ,;.!?'\"")
-        if not candidate:
-            return None
-        return candidate
+        return _extract_city_cached(text)
 
     def _extract_category_hint(self, text: str) -> tuple[Optional[str], Optional[str]]:
-        lowered = text.lower()
-        for keyword in CATEGORY_KEYWORDS:
-            pattern = rf"\b{re.escape(keyword)}\b"
-            match = re.search(pattern, lowered)
-            if not match:
-                continue
-            qualifier = self._extract_qualifier(lowered[match.end() :])
-            normalized = self._normalize_category(keyword)
-            return normalized, qualifier
-        return None, None
-
-    def _extract_qualifier(self, suffix: str) -> Optional[str]:
-        fragment = suffix
-        for stop in CATEGORY_STOP_TOKENS:
-            idx = fragment.find(stop)
-            if idx != -1:
-                fragment = fragment[:idx]
-                break
-        qualifier = fragment.strip(" -,:;'\"")
-        return qualifier or None
-
-    def _normalize_category(self, keyword: str) -> str:
-        singular_map = {
-            "restaurant": "restaurants",
-            "restaurants": "restaurants",
-            "pharmacie": "pharmacies",
-            "pharmacies": "pharmacies",
-            "boulangerie": "boulangeries",
-            "boulangeries": "boulangeries",
-            "boucherie": "boucheries",
-            "boucheries": "boucheries",
-            "supermarché": "supermarchés",
-            "supermarchés": "supermarchés",
-            "supermarches": "supermarchés",
-            "supérette": "supérettes",
-            "superette": "supérettes",
-            "supérettes": "supérettes",
-            "bars": "bars",
-            "bar": "bars",
-            "café": "cafés",
-            "cafés": "cafés",
-            "coiffeur": "coiffeurs",
-            "coiffeurs": "coiffeurs",
-            "coiffure": "coiffure",
-            "pressing": "pressing",
-            "pressings": "pressing",
-            "épicerie": "épiceries",
-            "épiceries": "épiceries",
-            "epicerie": "épiceries",
-            "epiceries": "épiceries",
-            "bazar": "bazar",
-            "boutique": "boutiques",
-            "boutiques": "boutiques",
-            "magasin": "magasins",
-            "magasins": "magasins",
-            "garage": "garages",
-            "garages": "garages",
-            "hotel": "hôtels",
-            "hotels": "hôtels",
-            "hôtel": "hôtels",
-            "hôtels": "hôtels",
-            "commerce": "commerces",
-            "commerces": "commerces",
-        }
-        return singular_map.get(keyword, keyword)
+        return _extract_category_cached(text)
 
     def build_title(self, user_message: str, agent_answer: str) -> str:
+        key = _title_key(user_message, agent_answer)
+        title = _TITLE_CACHE.get(key)
+        if title is not None:
+            return title
         try:
-            response = self.titler.invoke({"user": user_message, "agent": agent_answer})
+            response = self.titler.invoke(_title_messages(user_message, agent_answer))
             title = getattr(response, "content", "").strip()
         except Exception:  # noqa: BLE001
             title = ""
-        if not title:
+        if title:
+            _TITLE_CACHE.put(key, title)
+        else:
+            title = user_message.strip().capitalize()[:60] or "Conversation"
+        return title
+
+    async def abuild_title(self, user_message: str, agent_answer: str) -> str:
+        key = _title_key(user_message, agent_answer)
+        title = _TITLE_CACHE.get(key)
+        if title is not None:
+            return title
+        try:
+            llms = self._aio()
+            async with llms.slots:
+                response = await llms.titler.ainvoke(_title_messages(user_message, agent_answer))
+            title = getattr(response, "content", "").strip()
+        except Exception:  # noqa: BLE001
+            title = ""
+        if title:
+            _TITLE_CACHE.put(key, title)
+        else:
             title = user_message.strip().capitalize()[:60] or "Conversation"
         return title
 
@@ -2,65 +2,366 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import shutil
 import sys
+import threading
+import time
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Any, BinaryIO
+
+import httpx
 
 INSEE_CARROYAGE_RESOURCE_ID = "2803f01d-13a1-488e-ab2b-fb47b482111b"
 INSEE_CARROYAGE_URL = f"https://www.data.gouv.fr/api/1/datasets/r/{INSEE_CARROYAGE_RESOURCE_ID}"
+INSEE_CARROYAGE_METADATA_URL = (
+    f"https://www.data.gouv.fr/api/2/datasets/resources/{INSEE_CARROYAGE_RESOURCE_ID}/"
+)
+
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MiB socket reads / file writes
+PROGRESS_INTERVAL = 0.25  # seconds between two progress lines
+SEGMENTS = 4  # parallel Range requests for a fresh download
+MIN_SEGMENTED_SIZE = 16 * 1024 * 1024  # below this, one stream is as fast
+_USER_AGENT = "Mozilla/5.0 (CityInsights downloader)"
+
+
+class _RangeRejected(Exception):
+    """A segment request was answered without ``206 Partial Content``."""
+
+
+class _ProgressWriter:
+    """File shim for ``shutil.copyfileobj`` that counts bytes and throttles progress output.
+
+    ``hashers`` (a download written from byte 0) are fed each chunk as it is written.
+    """
+
+    def __init__(
+        self,
+        fh: BinaryIO,
+        downloaded: int,
+        total: int | None,
+        show_progress: bool,
+        hashers: dict[str, Any] | None = None,
+    ) -> None:
+        self._fh = fh
+        self.downloaded = downloaded
+        self._total = total
+        self._show_progress = show_progress
+        self._hashers = hashers or {}
+        self._last_report = 0.0
+
+    def write(self, chunk: bytes) -> int:
+        written = self._fh.write(chunk)
+        for hasher in self._hashers.values():
+            hasher.update(chunk)
+        self.downloaded += len(chunk)
+        if self._show_progress:
+            now = time.monotonic()
+            if now - self._last_report >= PROGRESS_INTERVAL:
+                self._last_report = now
+                _display_progress(self.downloaded, self._total)
+        return written
 
 
 def download_insee_carroyage(dest_path: Path, *, show_progress: bool = True) -> Path:
-    """Download the official INSEE CSV into ``dest_path``."""
+    """Download the official INSEE CSV into ``dest_path``.
+
+    A fresh download is split into ``SEGMENTS`` byte ranges fetched in
+    parallel when the server advertises ``Accept-Ranges: bytes``. Otherwise
+    (or when resuming) a single stream is used: an existing ``.part`` file
+    left by an interrupted download is resumed with an HTTP ``Range`` request,
+    guarded by ``If-Range`` so a file changed on the server is fetched again
+    in full instead of being spliced onto the old bytes.
+    """
 
     dest = Path(dest_path)
     dest.parent.mkdir(parents=True, exist_ok=True)
     tmp_path = dest.with_name(dest.name + ".part")
+    published = _published_checksum()
 
-    req = urllib.request.Request(
-        INSEE_CARROYAGE_URL,
-        headers={"User-Agent": "Mozilla/5.0 (CityInsights downloader)"},
-        method="GET",
-    )
+    if not tmp_path.exists() and _download_segmented(tmp_path, show_progress=show_progress):
+        return _finalize(dest, tmp_path, expected=None, published=published, show_progress=show_progress)
+    return _download_single(dest, tmp_path, published=published, show_progress=show_progress)
 
-    downloaded = 0
-    chunk_size = 1024 * 1024  # 1 MB
-    try:
-        with urllib.request.urlopen(req) as resp, tmp_path.open("wb") as fh:
-            total = resp.headers.get("Content-Length")
-            total = int(total) if total and total.isdigit() else None
-
-            while True:
-                chunk = resp.read(chunk_size)
-                if not chunk:
-                    break
-                fh.write(chunk)
-                downloaded += len(chunk)
-
-                if show_progress:
-                    _display_progress(downloaded, total)
-    except Exception:
-        if tmp_path.exists():
+
+def _download_segmented(tmp_path: Path, *, show_progress: bool) -> bool:
+    """Fetch the file as parallel byte ranges into a preallocated ``tmp_path``.
+
+    Returns False, leaving nothing on disk, when the server does not support
+    ranges or the file is too small to benefit; the caller then falls back to
+    the single-stream path.
+    """
+
+    headers = {"User-Agent": _USER_AGENT, "Accept-Encoding": "identity"}
+    limits = httpx.Limits(max_connections=SEGMENTS, max_keepalive_connections=SEGMENTS)
+    with httpx.Client(headers=headers, limits=limits, follow_redirects=True, timeout=60.0) as client:
+        try:
+            head = client.head(INSEE_CARROYAGE_URL)
+            head.raise_for_status()
+        except httpx.HTTPError:
+            return False
+        length = head.headers.get("Content-Length", "")
+        if head.headers.get("Accept-Ranges", "").lower() != "bytes" or not length.isdigit():
+            return False
+        total = int(length)
+        if total < MIN_SEGMENTED_SIZE:
+            return False
+        url = head.url  # resolved once: segments skip the redirect
+
+        with tmp_path.open("wb") as fh:
+            fh.truncate(total)
+
+        step = -(-total // SEGMENTS)
+        bounds = [(start, min(start + step, total) - 1) for start in range(0, total, step)]
+        lock = threading.Lock()
+        progress = [0]
+
+        def fetch(start: int, end: int) -> None:
+            with client.stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as resp:
+                if resp.status_code != 206:
+                    raise _RangeRejected
+                with tmp_path.open("r+b") as out:
+                    out.seek(start)
+                    for chunk in resp.iter_raw(CHUNK_SIZE):
+                        out.write(chunk)
+                        with lock:
+                            progress[0] += len(chunk)
+                    if out.tell() != end + 1:
+                        raise RuntimeError(
+                            f"Segment {start}-{end} incomplet ({out.tell() - start} octets reçus)."
+                        )
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(bounds), thread_name_prefix="insee-dl") as pool:
+                futures = [pool.submit(fetch, start, end) for start, end in bounds]
+                pending = futures
+                while pending:
+                    _, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+                    if show_progress:
+                        _display_progress(progress[0], total)
+                for future in futures:
+                    future.result()
+        except _RangeRejected:
             tmp_path.unlink(missing_ok=True)
-        raise
+            return False
+        except BaseException:
+            # A preallocated file cannot be resumed by size: never leave it behind.
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            if show_progress:
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+    return True
+
+
+def _download_single(
+    dest: Path,
+    tmp_path: Path,
+    *,
+    published: tuple[str, str] | None,
+    show_progress: bool,
+) -> Path:
+    headers = {"User-Agent": _USER_AGENT}
+    validator_path = _validator_path(tmp_path)
+    offset = tmp_path.stat().st_size if tmp_path.exists() else 0
+    validator = _read_validator(validator_path) if offset else None
+    if offset and validator is None:
+        # Nothing proves the remote file is still the one the .part started from.
+        tmp_path.unlink()
+        offset = 0
+    if offset:
+        # If-Range: the server answers 200 with the whole file when it changed meanwhile.
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    req = urllib.request.Request(INSEE_CARROYAGE_URL, headers=headers, method="GET")
+
+    try:
+        resp = urllib.request.urlopen(req)
+    except urllib.error.HTTPError as exc:
+        if exc.code != 416 or not offset:
+            raise
+        # Range not satisfiable: the partial file is unusable, start over.
+        tmp_path.unlink(missing_ok=True)
+        validator_path.unlink(missing_ok=True)
+        return _download_single(dest, tmp_path, published=published, show_progress=show_progress)
+
+    digests = None
+    try:
+        with resp:
+            if offset and resp.status != 206:
+                offset = 0  # file changed or Range ignored: the server sends the whole file again
+            if not offset:
+                _write_validator(validator_path, resp.headers)
+            length = resp.headers.get("Content-Length")
+            expected = offset + int(length) if length and length.isdigit() else None
+
+            # Written from byte 0: hash while writing. A resumed file is hashed once complete.
+            hashers = None if offset else {name: hashlib.new(name) for name in _algorithms(published)}
+            with tmp_path.open("ab" if offset else "wb") as fh:
+                writer = _ProgressWriter(fh, offset, expected, show_progress, hashers)
+                shutil.copyfileobj(resp, writer, CHUNK_SIZE)
+            if hashers is not None:
+                digests = {name: hasher.hexdigest() for name, hasher in hashers.items()}
+            if show_progress:
+                _display_progress(writer.downloaded, expected)
     finally:
+        # The .part file is kept on failure so the next call can resume it.
         if show_progress:
             sys.stdout.write("\n")
             sys.stdout.flush()
 
+    return _finalize(
+        dest, tmp_path, expected=expected, published=published, digests=digests, show_progress=show_progress
+    )
+
+
+def _finalize(
+    dest: Path,
+    tmp_path: Path,
+    *,
+    expected: int | None,
+    published: tuple[str, str] | None,
+    digests: dict[str, str] | None = None,
+    show_progress: bool,
+) -> Path:
     size = tmp_path.stat().st_size
+    if expected is not None and size != expected:
+        raise RuntimeError(
+            f"Téléchargement incomplet : {size} octets reçus sur {expected} attendus (relancez pour reprendre)."
+        )
     if size < 1_000_000:
         tmp_path.unlink(missing_ok=True)
         raise RuntimeError(
             f"Le fichier téléchargé est trop petit ({size} octets) : téléchargement incomplet ?"
         )
 
+    # Data on disk before the rename: a crash can no longer leave a truncated dest.
+    with tmp_path.open("r+b") as fh:
+        os.fsync(fh.fileno())
+
+    if digests is None:  # segmented or resumed download: one read pass once complete
+        digests = _file_digests(tmp_path, _algorithms(published))
+    if published and digests[published[0]] != published[1]:
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(
+            f"Somme de contrôle {published[0]} invalide pour le CSV INSEE : fichier corrompu, supprimé."
+        )
+
     tmp_path.replace(dest)
+    _validator_path(tmp_path).unlink(missing_ok=True)
+    _write_checksum(dest, digests["sha256"])
     if show_progress:
         print(f"✅ CSV INSEE téléchargé dans {dest} ({size / 1e6:.1f} MB)")
     return dest
 
 
+def verify_insee_carroyage(dest_path: Path) -> bool:
+    """Tell whether ``dest_path`` is still the file recorded in its sidecar.
+
+    The sidecar written after a download (or by ``adopt_insee_carroyage``) records the
+    file's size and mtime next to its SHA-256. Only those are compared: the CSV is never
+    read here, so an app start does not hash hundreds of MB. False means the file was
+    replaced, edited or has no usable sidecar -- not necessarily that it is corrupt.
+    """
+
+    dest = Path(dest_path)
+    stat = dest.stat()
+    recorded = _read_checksum(dest)
+    return recorded is not None and (recorded.get("size"), recorded.get("mtime_ns")) == (
+        stat.st_size,
+        stat.st_mtime_ns,
+    )
+
+
+def adopt_insee_carroyage(dest_path: Path) -> None:
+    """Trust ``dest_path`` as it is now (file replaced or edited by the operator).
+
+    The sidecar is rewritten with the current size and mtime; the SHA-256 is left
+    unknown rather than computed, to keep this cheap.
+    """
+
+    _write_checksum(Path(dest_path), None)
+
+
+def _checksum_path(dest: Path) -> Path:
+    return dest.with_suffix(".sha256")
+
+
+def _write_checksum(dest: Path, digest: str | None) -> None:
+    stat = dest.stat()
+    record = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    _checksum_path(dest).write_text(json.dumps(record) + "\n", encoding="ascii")
+
+
+def _read_checksum(dest: Path) -> dict[str, Any] | None:
+    try:
+        record = json.loads(_checksum_path(dest).read_text(encoding="ascii"))
+    except (OSError, ValueError):
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _validator_path(tmp_path: Path) -> Path:
+    return tmp_path.with_name(tmp_path.name + ".validator")
+
+
+def _write_validator(path: Path, headers: Any) -> None:
+    """Record the response's ETag (strong only, as If-Range requires) or Last-Modified."""
+
+    etag = headers.get("ETag") or ""
+    validator = etag if etag and not etag.startswith("W/") else headers.get("Last-Modified")
+    if validator:
+        path.write_text(validator, encoding="ascii")
+    else:
+        path.unlink(missing_ok=True)  # this .part will not be resumable
+
+
+def _read_validator(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="ascii").strip() or None
+    except OSError:
+        return None
+
+
+def _algorithms(published: tuple[str, str] | None) -> set[str]:
+    return {"sha256"} | ({published[0]} if published else set())
+
+
+def _published_checksum() -> tuple[str, str] | None:
+    """``(algorithm, hex digest)`` published by data.gouv.fr for the resource, if any."""
+
+    req = urllib.request.Request(INSEE_CARROYAGE_METADATA_URL, headers={"User-Agent": _USER_AGENT})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            payload = json.load(resp)
+    except Exception:  # noqa: BLE001 - the check is best effort: size checks still apply
+        return None
+    resource = payload.get("resource", payload) if isinstance(payload, dict) else {}
+    checksum = resource.get("checksum") or {}
+    algorithm = str(checksum.get("type") or "").lower()
+    value = str(checksum.get("value") or "").lower()
+    if not value or algorithm not in hashlib.algorithms_available:
+        return None
+    return algorithm, value
+
+
+def _file_digests(path: Path, algorithms: set[str]) -> dict[str, str]:
+    # One read pass feeds every requested hash.
+    hashers = {name: hashlib.new(name) for name in algorithms}
+    with path.open("rb") as fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
 def _display_progress(downloaded: int, total: int | None) -> None:
     if total:
         pct = downloaded * 100 / total
@@ -72,4 +373,10 @@ def _display_progress(downloaded: int, total: int | None) -> None:
     sys.stdout.flush()
 
 
-__all__ = ["download_insee_carroyage", "INSEE_CARROYAGE_RESOURCE_ID", "INSEE_CARROYAGE_URL"]
+__all__ = [
+    "adopt_insee_carroyage",
+    "download_insee_carroyage",
+    "verify_insee_carroyage",
+    "INSEE_CARROYAGE_RESOURCE_ID",
+    "INSEE_CARROYAGE_URL",
+]
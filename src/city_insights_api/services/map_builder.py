@@ -2,17 +2,59 @@
 
 from __future__ import annotations
 
-import math
+import hashlib
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib.metadata import version
 from pathlib import Path
-from typing import Any, Dict, List, Sequence
+from typing import TYPE_CHECKING, Any, Dict, Sequence
 
-import branca.colormap as cm
-import folium
-from folium.plugins import HeatMap
+import numpy as np
+import orjson
 
 from ..models.domain import AgentPlace, BoundingBox, ZoneInsight
 from .carroyage import CarroyagePayload
 
+if TYPE_CHECKING:
+    import folium
+
+# Population percentiles used by the heatmap: p5 (scale floor), legend p10..p95 (p95 = scale ceiling).
+HEATMAP_QUANTILES = np.array([0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95])
+
+# Zone label style, emitted once in the page header instead of inline on every badge.
+ZONE_BADGE_STYLE = (
+    "<style>.zone-badge { background: rgba(37,99,235,0.1); color:#1d4ed8; font-weight:600; "
+    "padding:4px 10px; border-radius:9999px; border:1px solid #1d4ed833; font-size:12px; }</style>"
+)
+
+
+@dataclass(slots=True)
+class _DeferredRows:
+    """Layer points spliced into the page after rendering (see ``MapBuilder._render``).
+
+    folium's template output is wrapped back into a Jinja template by branca, so megabytes of
+    points would be lexed and compiled again on every save. The layer renders a short
+    placeholder instead and the serialised rows replace it in the final HTML.
+    """
+
+    placeholder: str
+    rows: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def _heat_rows_spliceable() -> bool:
+    """Whether HeatMap emits its ``data`` verbatim through ``tojson`` (probed once per process)."""
+    import folium
+    from folium.plugins import HeatMap
+
+    probe = f"heat-rows-{uuid.uuid4().hex}"
+    fmap = folium.Map()
+    layer = HeatMap([])
+    layer.data = probe
+    layer.add_to(fmap)
+    return orjson.dumps(probe).decode() in fmap.get_root().render()
+
 
 class MapBuilder:
     def __init__(self, *, scale: str = "log", radius: int = 22, blur: int = 18, min_opacity: float = 0.25) -> None:
@@ -20,6 +62,9 @@ class MapBuilder:
         self.radius = radius
         self.blur = blur
         self.min_opacity = min_opacity
+        # folium/branca take ~0.7 s to import: they are only loaded when a map is actually
+        # rendered, so cache hits (and processes that never draw) do not pay for them.
+        self._folium_version = version("folium")
 
     def build(
         self,
@@ -33,18 +78,34 @@ class MapBuilder:
         bbox = self._normalize_bbox(inhabitants_payload["bbox"])
         cells = inhabitants_payload.get("cells", [])
         commerce_items = commerce_data.get("items") or commerce_data.get("places") or []
+        lats, lons, pops = self._cell_columns(inhabitants, cells)
+
+        signature = self._signature(
+            bbox.model_dump_json().encode("utf-8"),
+            lats.tobytes(),
+            lons.tobytes(),
+            pops.tobytes(),
+            self._dump(commerce_items),
+            self._dump([zone.model_dump(mode="json") for zone in zones or ()]),
+        )
+        if self._is_current(output_html, signature):
+            return output_html
+
+        import folium
 
         center_lat = (bbox.south + bbox.north) / 2.0
         center_lon = (bbox.west + bbox.east) / 2.0
         fmap = folium.Map(location=[center_lat, center_lon], zoom_start=13)
 
-        self._add_heatmap(fmap, cells)
+        heat_rows = self._add_heatmap(fmap, lats, lons, pops)
         if zones:
             self._add_zones(fmap, zones)
         self._add_commerce_layer(fmap, commerce_items)
+        # The layer switch only matters when the heatmap shares the map with another overlay.
+        if zones or commerce_items:
+            folium.LayerControl(collapsed=False).add_to(fmap)
 
-        output_html.parent.mkdir(parents=True, exist_ok=True)
-        fmap.save(output_html)
+        self._save(fmap, output_html, signature, heat_rows)
         return output_html
 
     def build_points_map(
@@ -53,60 +114,122 @@ class MapBuilder:
         places: Sequence[AgentPlace],
         output_html: Path,
     ) -> Path:
-        center_lat = (bbox.south + bbox.north) / 2.0
-        center_lon = (bbox.west + bbox.east) / 2.0
-        fmap = folium.Map(location=[center_lat, center_lon], zoom_start=13)
-
         items = [
             {"lat": place.lat, "lon": place.lon, "name": place.name}
             for place in places
             if place.lat is not None and place.lon is not None
         ]
+        signature = self._signature(bbox.model_dump_json().encode("utf-8"), self._dump(items))
+        if self._is_current(output_html, signature):
+            return output_html
+
+        import folium
+
+        center_lat = (bbox.south + bbox.north) / 2.0
+        center_lon = (bbox.west + bbox.east) / 2.0
+        fmap = folium.Map(location=[center_lat, center_lon], zoom_start=13)
         self._add_commerce_layer(fmap, items)
 
-        output_html.parent.mkdir(parents=True, exist_ok=True)
-        fmap.save(output_html)
+        self._save(fmap, output_html, signature)
         return output_html
 
-    # Heatmap --------------------------------------------------------------
-    def _add_heatmap(self, fmap: folium.Map, cells: Sequence[Dict[str, Any]]) -> None:
-        pops = [float(cell.get("pop", 0.0)) for cell in cells if "lat" in cell and "lon" in cell]
-        if not pops:
-            return
+    # Render cache ---------------------------------------------------------
+    # Each HTML file has a ``.sig`` sidecar holding the digest of the inputs it was rendered
+    # from; an unchanged digest means the folium render (the costly part) can be skipped.
+    def _signature(self, *parts: bytes) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((self._folium_version, self.scale, self.radius, self.blur, self.min_opacity)).encode())
+        for part in parts:
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _dump(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY, default=str)
+
+    def _is_current(self, output_html: Path, signature: str) -> bool:
+        try:
+            return output_html.exists() and output_html.with_suffix(".sig").read_text() == signature
+        except OSError:
+            return False
+
+    def _save(
+        self,
+        fmap: folium.Map,
+        output_html: Path,
+        signature: str,
+        deferred: _DeferredRows | None = None,
+    ) -> None:
+        sig_path = output_html.with_suffix(".sig")
+        output_html.parent.mkdir(parents=True, exist_ok=True)
+        sig_path.unlink(missing_ok=True)  # never pair a half-written HTML with a valid digest
+        output_html.write_bytes(self._render(fmap, deferred).encode("utf-8"))
+        sig_path.write_text(signature)
 
-        pops_sorted = sorted(pops)
-        p10 = self._quantile(pops_sorted, 0.10)
-        p25 = self._quantile(pops_sorted, 0.25)
-        p50 = self._quantile(pops_sorted, 0.50)
-        p75 = self._quantile(pops_sorted, 0.75)
-        p90 = self._quantile(pops_sorted, 0.90)
-        p95 = self._quantile(pops_sorted, 0.95)
-
-        lo_raw = self._quantile(pops_sorted, 0.05)
-        hi_raw = self._quantile(pops_sorted, 0.95)
-        lo_t = self._transform_pop(lo_raw)
-        hi_t = self._transform_pop(hi_raw)
-        denom = (hi_t - lo_t) if (hi_t - lo_t) > 1e-12 else 1.0
+    def _render(self, fmap: folium.Map, deferred: _DeferredRows | None) -> str:
+        html = fmap.get_root().render()
+        if deferred is None:
+            return html
+        token = orjson.dumps(deferred.placeholder).decode()  # as rendered by the `tojson` filter
+        return html.replace(token, orjson.dumps(deferred.rows, option=orjson.OPT_SERIALIZE_NUMPY).decode(), 1)
 
-        def weight(pop_raw: float) -> float:
-            value = self._transform_pop(pop_raw)
-            w01 = (value - lo_t) / denom
-            w01 = self._clamp(w01, 0.0, 1.0)
-            return max(0.03, w01)
+    # Heatmap --------------------------------------------------------------
+    def _cell_columns(
+        self,
+        inhabitants: CarroyagePayload | Dict[str, Any],
+        cells: Sequence[Dict[str, Any]],
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Latitude, longitude and population columns of the located cells."""
+        if isinstance(inhabitants, CarroyagePayload) and inhabitants.lats.size == len(cells):
+            return inhabitants.lats, inhabitants.lons, inhabitants.pops
+
+        # Plain dict payload: one pass over the records, skipping cells without coordinates.
+        out = np.empty((len(cells), 3), dtype=np.float64)
+        count = 0
+        for cell in cells:
+            if "lat" in cell and "lon" in cell:
+                out[count] = (float(cell["lat"]), float(cell["lon"]), float(cell.get("pop", 0.0)))
+                count += 1
+        lats, lons, pops = out[:count].T
+        return lats, lons, pops
+
+    def _add_heatmap(
+        self, fmap: folium.Map, lats: np.ndarray, lons: np.ndarray, pops: np.ndarray
+    ) -> _DeferredRows | None:
+        if not pops.size:
+            return None
+
+        import branca.colormap as cm
+        from folium.plugins import HeatMap
+
+        # One selection pass for every percentile (same linear interpolation as before).
+        lo_raw, p10, p25, p50, p75, p90, p95 = np.quantile(pops, HEATMAP_QUANTILES).tolist()
+        hi_raw = p95
+        lo_t, hi_t = self._transform_pops(np.array([lo_raw, hi_raw])).tolist()
+        denom = (hi_t - lo_t) if (hi_t - lo_t) > 1e-12 else 1.0
 
-        heat_data = [
-            [float(cell["lat"]), float(cell["lon"]), weight(float(cell.get("pop", 0.0)))]
-            for cell in cells
-            if "lat" in cell and "lon" in cell
-        ]
+        # Weights for every cell at once: scale transform, normalise to [0, 1], keep a floor.
+        weights = np.maximum(np.clip((self._transform_pops(pops) - lo_t) / denom, 0.0, 1.0), 0.03)
+        heat_data = np.column_stack((lats, lons, weights))
+        if not np.isfinite(heat_data).all():
+            raise ValueError("Coordonnées ou poids non finis dans les données de la heatmap.")
 
-        HeatMap(
-            heat_data,
+        # HeatMap validates every point in Python; the array is already checked above, so
+        # build the layer empty. Its points are filled in after rendering (see _render).
+        heat = HeatMap(
+            [],
             radius=self.radius,
             blur=self.blur,
             max_zoom=14,
             min_opacity=self.min_opacity,
-        ).add_to(fmap)
+        )
+        deferred = None
+        if _heat_rows_spliceable():
+            deferred = _DeferredRows(placeholder=f"heat-rows-{uuid.uuid4().hex}", rows=heat_data)
+            heat.data = deferred.placeholder
+        else:  # HeatMap template changed: let folium serialise the rows
+            heat.data = heat_data.tolist()
+        heat.add_to(fmap)
 
         legend = cm.LinearColormap(
             colors=[
@@ -129,13 +252,16 @@ class MapBuilder:
             f"p75={self._fmt_int(p75)} p90={self._fmt_int(p90)} p95={self._fmt_int(p95)}"
         )
         legend.add_to(fmap)
+        return deferred
 
     # Commerce markers -----------------------------------------------------
     def _add_commerce_layer(self, fmap: folium.Map, commerce_items: Sequence[Dict[str, Any]]) -> None:
         if not commerce_items:
             return
 
-        feature_group = folium.FeatureGroup(name="Commerces", show=True)
+        import folium
+
+        features = []
         for item in commerce_items:
             try:
                 lat = float(item["lat"])
@@ -143,26 +269,33 @@ class MapBuilder:
             except (KeyError, TypeError, ValueError):  # pragma: no cover - malformed entries
                 continue
             label = item.get("name") or item.get("label") or "Commerce"
-
-            folium.Marker(
-                location=[lat, lon],
-                tooltip=f"📍 {label}",
-                icon=folium.Icon(icon="shopping-cart", prefix="fa"),
-            ).add_to(feature_group)
-
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=10,
-                weight=2,
-                fill=True,
-                fill_opacity=0.25,
-            ).add_to(feature_group)
-
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                    "properties": {"tooltip": f"📍 {label}"},
+                }
+            )
+        collection = {"type": "FeatureCollection", "features": features}
+
+        # One GeoJSON blob per layer, turned into markers client-side, instead of two
+        # Leaflet objects (and template fragments) per commerce.
+        feature_group = folium.FeatureGroup(name="Commerces", show=True)
+        folium.GeoJson(
+            collection,
+            marker=folium.Marker(icon=folium.Icon(icon="shopping-cart", prefix="fa")),
+            tooltip=folium.GeoJsonTooltip(fields=["tooltip"], labels=False),
+        ).add_to(feature_group)
+        folium.GeoJson(
+            collection,
+            marker=folium.CircleMarker(radius=10, weight=2, fill=True, fill_opacity=0.25),
+        ).add_to(feature_group)
         feature_group.add_to(fmap)
 
-        folium.LayerControl(collapsed=False).add_to(fmap)
-
     def _add_zones(self, fmap: folium.Map, zones: Sequence[ZoneInsight]) -> None:
+        import folium
+
+        fmap.get_root().header.add_child(folium.Element(ZONE_BADGE_STYLE), name="zone_badge_style")
         zone_layer = folium.FeatureGroup(name="Zones", show=True)
         for zone in zones:
             bounds = zone.bounds
@@ -182,12 +315,7 @@ class MapBuilder:
                 icon=folium.DivIcon(
                     icon_size=(120, 30),
                     icon_anchor=(30, 15),
-                    html=(
-                        f'<div style="background: rgba(37,99,235,0.1); '
-                        f'color:#1d4ed8; font-weight:600; padding:4px 10px; '
-                        f'border-radius:9999px; border:1px solid #1d4ed833; '
-                        f'font-size:12px;">Zone {zone.zone_id}</div>'
-                    ),
+                    html=f'<div class="zone-badge">Zone {zone.zone_id}</div>',
                 ),
             ).add_to(zone_layer)
 
@@ -209,33 +337,13 @@ class MapBuilder:
             value = value[0]
         return float(value)
 
-    def _transform_pop(self, pop: float) -> float:
-        pop = max(0.0, float(pop))
+    def _transform_pops(self, pops: np.ndarray) -> np.ndarray:
+        pops = np.maximum(pops, 0.0)
         if self.scale == "linear":
-            return pop
+            return pops
         if self.scale == "sqrt":
-            return pop ** 0.5
-        return math.log1p(pop)
-
-    def _quantile(self, values: List[float], q: float) -> float:
-        if not values:
-            return 0.0
-        if q <= 0:
-            return values[0]
-        if q >= 1:
-            return values[-1]
-
-        n = len(values)
-        pos = (n - 1) * q
-        lo = int(math.floor(pos))
-        hi = int(math.ceil(pos))
-        if lo == hi:
-            return values[lo]
-        weight = pos - lo
-        return values[lo] * (1 - weight) + values[hi] * weight
-
-    def _clamp(self, value: float, lo: float, hi: float) -> float:
-        return max(lo, min(hi, value))
+            return np.sqrt(pops)
+        return np.log1p(pops)
 
     def _fmt_int(self, value: float) -> str:
         return f"{int(round(value)):,}".replace(",", " ")
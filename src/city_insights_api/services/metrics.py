@@ -2,19 +2,38 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Sequence, Tuple
+import os
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
 
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.metrics import davies_bouldin_score, silhouette_score
 
 from ..models.domain import KMeansMetrics
 
+if TYPE_CHECKING:
+    from sklearn.cluster import KMeans
+
+CellColumns = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# The silhouette needs every pairwise distance. Up to this many cells the n x n matrix
+# (~128 MB at 4000) is computed once for the whole k sweep; above it, each k lets
+# scikit-learn stream the distances in chunks. Both give the exact score.
+PRECOMPUTED_DISTANCES_MAX_CELLS = 4000
+
+
+def cell_columns(cells: Sequence[Dict[str, float]]) -> CellColumns:
+    """Latitude, longitude and population (default 1.0) arrays of ``cells``, in one pass."""
+    table = np.array(
+        [(cell["lat"], cell["lon"], cell.get("pop", 1.0)) for cell in cells],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    return table[:, 0], table[:, 1], table[:, 2]
+
 
 class KMeansEvaluator:
-    def __init__(self, default_k_min: int = 2, default_k_max: int = 10) -> None:
+    def __init__(self, default_k_min: int = 2, default_k_max: int = 10, *, n_jobs: int | None = None) -> None:
         self.default_k_min = default_k_min
         self.default_k_max = default_k_max
+        self.n_jobs = n_jobs or os.cpu_count() or 1  # threads scoring k values side by side
 
     def suggest_k_range(
         self,
@@ -47,51 +66,98 @@ class KMeansEvaluator:
         k_min: int | None = None,
         k_max: int | None = None,
     ) -> KMeansMetrics | None:
+        return self.evaluate_with_models(cells, k_min=k_min, k_max=k_max)[0]
+
+    def evaluate_with_models(
+        self,
+        cells: Sequence[Dict[str, float]],
+        *,
+        k_min: int | None = None,
+        k_max: int | None = None,
+        columns: CellColumns | None = None,
+    ) -> Tuple[KMeansMetrics | None, Dict[int, KMeans]]:
+        """Like :meth:`evaluate`, also returning the fitted model of each k so the final
+        clustering can reuse it instead of fitting the same model again.
+
+        ``columns`` are the cells as (lats, lons, pops) arrays when the caller already has them.
+        """
+        models: Dict[int, KMeans] = {}
         if not cells:
-            return None
+            return None, models
 
         count = len(cells)
 
         k_min, k_max = self.suggest_k_range(count, k_min=k_min, k_max=k_max)
 
         if count <= k_min:
-            return None
+            return None, models
 
         k_values = [k for k in range(k_min, k_max + 1) if k < count]
         if not k_values:
-            return None
+            return None, models
+
+        # scikit-learn (and joblib) cost over a second to import: loaded on the first evaluation.
+        from joblib import Parallel, delayed
+        from sklearn.cluster import KMeans
+        from threadpoolctl import threadpool_limits
+        from sklearn.metrics import davies_bouldin_score, pairwise_distances, silhouette_score
 
-        lats = np.array([cell["lat"] for cell in cells], dtype=float)
-        lons = np.array([cell["lon"] for cell in cells], dtype=float)
-        pops = np.array([cell.get("pop", 1.0) for cell in cells], dtype=float)
+        lats, lons, pops = columns if columns is not None else cell_columns(cells)
 
         X = np.column_stack([lons, lats])
 
-        inertias: List[float] = []
-        silhouettes: List[float] = []
-        davies_scores: List[float] = []
+        # X is the same for every k: compute the distances used by the silhouette once,
+        # unless the matrix would be too large to hold.
+        distances = pairwise_distances(X) if count <= PRECOMPUTED_DISTANCES_MAX_CELLS else None
 
-        for k in k_values:
+        jobs = min(len(k_values), self.n_jobs)
+
+        def score(k: int) -> Tuple[KMeans, float, float]:
             model = KMeans(n_clusters=k, n_init="auto", random_state=42)
-            labels = model.fit_predict(X, sample_weight=pops)
-            inertias.append(float(model.inertia_))
+            if jobs > 1:
+                # The k values already run side by side: one OpenMP thread per fit instead of
+                # every fit using all cores (jobs x cores threads). The OpenMP limit is per
+                # calling thread; KMeans already pins BLAS to one thread itself.
+                with threadpool_limits(limits=1, user_api="openmp"):
+                    labels = model.fit_predict(X, sample_weight=pops)
+            else:
+                labels = model.fit_predict(X, sample_weight=pops)
 
             try:
-                silhouettes.append(float(silhouette_score(X, labels)))
+                if distances is None:
+                    silhouette = float(silhouette_score(X, labels))
+                else:
+                    silhouette = float(silhouette_score(distances, labels, metric="precomputed"))
             except ValueError:
-                silhouettes.append(float("nan"))
+                silhouette = float("nan")
 
             try:
-                davies_scores.append(float(davies_bouldin_score(X, labels)))
+                davies = float(davies_bouldin_score(X, labels))
             except ValueError:
-                davies_scores.append(float("nan"))
+                davies = float("nan")
+            return model, silhouette, davies
+
+        # Each k is independent; threads suffice as the fits and the NumPy/BLAS work release the GIL.
+        results = Parallel(n_jobs=jobs, prefer="threads")(
+            delayed(score)(k) for k in k_values
+        )
+
+        inertias: List[float] = []
+        silhouettes: List[float] = []
+        davies_scores: List[float] = []
+        for k, (model, silhouette, davies) in zip(k_values, results):
+            models[k] = model
+            inertias.append(float(model.inertia_))
+            silhouettes.append(silhouette)
+            davies_scores.append(davies)
 
-        return KMeansMetrics(
+        metrics = KMeansMetrics(
             k_values=k_values,
             inertia=inertias,
             silhouette=silhouettes,
             davies_bouldin=davies_scores,
         )
+        return metrics, models
 
     def _adaptive_range(self, cell_count: int) -> Tuple[int, int]:
         if cell_count < 20:
@@ -107,4 +173,4 @@ class KMeansEvaluator:
         return 8, 15
 
 
-__all__ = ["KMeansEvaluator"]
+__all__ = ["CellColumns", "KMeansEvaluator", "cell_columns"]
@@ -2,14 +2,13 @@
 
 from __future__ import annotations
 
-import json
 import re
 import unicodedata
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
 
 import numpy as np
-from sklearn.cluster import KMeans
+import orjson
 
 from ..core.config import Settings, settings
 from ..models.domain import (
@@ -20,7 +19,13 @@ from ..models.domain import (
 )
 from .carroyage import InseeCarroyageGenerator
 from .map_builder import MapBuilder
-from .metrics import KMeansEvaluator
+from .metrics import CellColumns, KMeansEvaluator, cell_columns
+
+if TYPE_CHECKING:
+    from sklearn.cluster import KMeans
+
+# Any run of characters outside [a-z0-9] (underscores included) becomes one "_".
+_SLUG_SEPARATORS = re.compile(r"[^a-z0-9]+")
 
 
 class PipelineService:
@@ -33,7 +38,11 @@ class PipelineService:
         evaluator: KMeansEvaluator | None = None,
     ) -> None:
         self.config = config or settings
-        self.carroyage = carroyage or InseeCarroyageGenerator(self.config.insee_csv_path)
+        self.carroyage = carroyage or InseeCarroyageGenerator(
+            self.config.insee_csv_path,
+            cache_dir=self.config.data_dir / "cache" / "carroyage",
+            cache_max_entries=self.config.carroyage_cache_max_entries,
+        )
         self.map_builder = map_builder or MapBuilder()
         self.evaluator = evaluator or KMeansEvaluator()
 
@@ -52,9 +61,15 @@ class PipelineService:
         inhabitants_path = self.config.data_dir / f"carroyage_bbox_{city}.json"
         carroyage_payload = self.carroyage.generate(bbox, inhabitants_path)
 
-        metrics = self.evaluator.evaluate(carroyage_payload.cells)
+        cells = carroyage_payload.cells
+        # The payload already holds the cells as column arrays: no per-dict unpacking needed.
+        if carroyage_payload.lats.size == len(cells):
+            columns = (carroyage_payload.lats, carroyage_payload.lons, carroyage_payload.pops)
+        else:
+            columns = cell_columns(cells)
+        metrics, models = self.evaluator.evaluate_with_models(cells, columns=columns)
         commerce_items = data.get("items") or data.get("places") or []
-        zones = self._build_zones(carroyage_payload.cells, commerce_items, metrics)
+        zones = self._build_zones(columns, commerce_items, metrics, models=models)
 
         map_filename = f"map_insee_{city}_{category}.html"
         map_path = self.map_builder.build(
@@ -75,13 +90,16 @@ class PipelineService:
             zones=zones,
         )
 
+    def points_map_path(self, agent_payload: AgentPayload) -> Path:
+        """Where :meth:`build_points_map` writes the map (known before it is rendered)."""
+        return self.config.views_dir / f"map_points_{agent_payload.city}_{agent_payload.category_key}.html"
+
     def build_points_map(self, agent_payload: AgentPayload) -> Path:
         """Generate a lightweight map with only commerce markers."""
-        map_filename = f"map_points_{agent_payload.city}_{agent_payload.category_key}.html"
         return self.map_builder.build_points_map(
             agent_payload.bbox,
             agent_payload.places,
-            self.config.views_dir / map_filename,
+            self.points_map_path(agent_payload),
         )
 
     # Helpers --------------------------------------------------------------
@@ -92,8 +110,7 @@ class PipelineService:
     def _load_json(self, path: Path) -> Dict[str, Any]:
         if not path.exists():
             raise FileNotFoundError(f"Fichier commerce introuvable: {path}")
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        return orjson.loads(path.read_bytes())
 
     def _extract_bbox(self, data: Dict[str, Any]) -> BoundingBox:
         bbox = data.get("bbox")
@@ -108,11 +125,10 @@ class PipelineService:
 
     def _normalize_city(self, value: str) -> str:
         value = (value or "").strip().lower()
-        value = unicodedata.normalize("NFKD", value)
-        value = "".join(ch for ch in value if not unicodedata.combining(ch))
-        value = re.sub(r"[^a-z0-9]+", "_", value)
-        value = re.sub(r"_+", "_", value)
-        return value.strip("_") or "ville"
+        if not value.isascii():
+            value = unicodedata.normalize("NFKD", value)
+            value = "".join(ch for ch in value if not unicodedata.combining(ch))
+        return _SLUG_SEPARATORS.sub("_", value).strip("_") or "ville"
 
     def _category_from_filename(self, filename: str) -> str:
         base = Path(filename).stem
@@ -131,24 +147,30 @@ class PipelineService:
 
     def _build_zones(
         self,
-        cells: List[Dict[str, Any]],
+        columns: CellColumns,
         commerce_items: List[Dict[str, Any]],
         metrics,
+        *,
+        models: Dict[int, KMeans] | None = None,
     ) -> List[ZoneInsight]:
-        if not cells:
+        lats, lons, pops = columns
+        if not lats.size:
             return []
 
-        k = self._choose_k(metrics, len(cells))
-        if k < 2 or len(cells) < k:
+        k = self._choose_k(metrics, lats.size)
+        if k < 2 or lats.size < k:
             return []
 
-        lats = np.array([cell["lat"] for cell in cells], dtype=float)
-        lons = np.array([cell["lon"] for cell in cells], dtype=float)
-        pops = np.array([cell.get("pop", 1.0) for cell in cells], dtype=float)
+        # The evaluator already fitted this exact model (same data, k and seed) while scoring k.
+        model = (models or {}).get(k)
+        if model is not None:
+            labels = model.labels_
+        else:
+            from sklearn.cluster import KMeans
 
-        X = np.column_stack([lons, lats])
-        model = KMeans(n_clusters=k, n_init="auto", random_state=42)
-        labels = model.fit_predict(X, sample_weight=pops)
+            X = np.column_stack([lons, lats])
+            model = KMeans(n_clusters=k, n_init="auto", random_state=42)
+            labels = model.fit_predict(X, sample_weight=pops)
 
         commerce_coords: List[tuple[float, float]] = []
         for item in commerce_items:
@@ -157,38 +179,39 @@ class PipelineService:
             except (KeyError, TypeError, ValueError):
                 continue
 
-        commerce_counts = {idx: 0 for idx in range(k)}
+        commerce_counts = np.zeros(k, dtype=np.intp)
         if commerce_coords:
-            coords = np.array(commerce_coords, dtype=float)
-            predicted = model.predict(coords)
-            for label in predicted:
-                commerce_counts[int(label)] = commerce_counts.get(int(label), 0) + 1
+            predicted = model.predict(np.array(commerce_coords, dtype=float))
+            commerce_counts = np.bincount(predicted, minlength=k)
+
+        # Per-cluster sums, extents and weighted centres in O(n) instead of one mask per cluster.
+        sizes = np.bincount(labels, minlength=k)
+        pop_sums = np.bincount(labels, weights=pops, minlength=k)
+        lon_centers = np.bincount(labels, weights=pops * lons, minlength=k) / pop_sums
+        lat_centers = np.bincount(labels, weights=pops * lats, minlength=k) / pop_sums
+        south = np.full(k, np.inf)
+        north = np.full(k, -np.inf)
+        west = np.full(k, np.inf)
+        east = np.full(k, -np.inf)
+        np.minimum.at(south, labels, lats)
+        np.maximum.at(north, labels, lats)
+        np.minimum.at(west, labels, lons)
+        np.maximum.at(east, labels, lons)
 
         raw_zones = []
-        for idx in range(k):
-            mask = labels == idx
-            if not np.any(mask):
-                continue
-            weights = pops[mask]
-            lon_center = float(np.average(lons[mask], weights=weights))
-            lat_center = float(np.average(lats[mask], weights=weights))
-            total_pop = float(weights.sum())
-            lat_values = lats[mask]
-            lon_values = lons[mask]
-            bounds = BoundingBox(
-                south=float(lat_values.min()),
-                north=float(lat_values.max()),
-                west=float(lon_values.min()),
-                east=float(lon_values.max()),
-            )
-
+        for idx in np.flatnonzero(sizes).tolist():
             raw_zones.append(
                 {
                     "cluster": idx,
-                    "lat": lat_center,
-                    "lon": lon_center,
-                    "population": total_pop,
-                    "bounds": bounds,
+                    "lat": float(lat_centers[idx]),
+                    "lon": float(lon_centers[idx]),
+                    "population": float(pop_sums[idx]),
+                    "bounds": BoundingBox(
+                        south=float(south[idx]),
+                        north=float(north[idx]),
+                        west=float(west[idx]),
+                        east=float(east[idx]),
+                    ),
                 }
             )
 
@@ -203,7 +226,7 @@ class PipelineService:
                     lat=zone["lat"],
                     lon=zone["lon"],
                     population=zone["population"],
-                    existing_commerces=commerce_counts.get(cluster_idx, 0),
+                    existing_commerces=int(commerce_counts[cluster_idx]),
                     bounds=zone["bounds"],
                 )
             )
@@ -4,12 +4,15 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Any, List, Optional
 
-from openai import OpenAI
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
+MAX_SOURCES = 5
+
 
 @dataclass(slots=True)
 class WebSearchResult:
@@ -30,7 +33,11 @@ class WebSearchTool:
     ) -> None:
         self.model = model
         self.max_output_tokens = max_output_tokens
-        self.client = client or OpenAI()
+        if client is None:
+            from openai import OpenAI  # imported only when the tool is actually built
+
+            client = OpenAI()
+        self.client = client
 
     def search(self, query: str) -> WebSearchResult:
         prompt = (
@@ -85,26 +92,24 @@ class WebSearchTool:
         except AttributeError:
             data = {}
 
+        # Iterative pre-order walk (same order as a recursive one): children are pushed
+        # reversed so the first child is visited next; stops at MAX_SOURCES distinct URLs.
+        seen: set[str] = set()
         urls: List[str] = []
-
-        def _walk(node: Any) -> None:
+        stack: List[Any] = [data]
+        while stack:
+            node = stack.pop()
             if isinstance(node, dict):
                 url = node.get("url")
-                if isinstance(url, str):
+                if isinstance(url, str) and url not in seen:
+                    seen.add(url)
                     urls.append(url)
-                for value in node.values():
-                    _walk(value)
+                    if len(urls) == MAX_SOURCES:
+                        break
+                stack.extend(reversed(node.values()))
             elif isinstance(node, list):
-                for item in node:
-                    _walk(item)
-
-        _walk(data)
-
-        unique_urls: List[str] = []
-        for url in urls:
-            if url not in unique_urls:
-                unique_urls.append(url)
-        return unique_urls[:5]
+                stack.extend(reversed(node))
+        return urls
 
 
 __all__ = ["WebSearchTool", "WebSearchResult"]
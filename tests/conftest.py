@@ -0,0 +1,72 @@
+"""Shared fixtures: a CityInsightsAgent talking to an in-process fake of the OpenAI API."""
+
+from __future__ import annotations
+
+from types import ModuleType
+from typing import Any, Dict, List
+
+import httpx
+import orjson
+import pytest
+
+from city_insights_api.services import conversation_agent
+from city_insights_api.services.agent_adapter import AgentAdapter
+
+
+PLAN = '{"actions": [{"tool": "respond_direct", "reason": "test"}], "direct_answer": null}'
+
+
+class FakeOpenAI:
+    """Chat completions endpoint answering every call and recording the request payloads."""
+
+    def __init__(self) -> None:
+        self.payloads: List[Dict[str, Any]] = []
+        self.plan = PLAN
+        self.answer = "Bonjour !"
+        self.async_clients: List[httpx.AsyncClient] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        payload = orjson.loads(request.content)
+        self.payloads.append(payload)
+        # Structured (planner) calls get a plan without tools, the others a plain answer.
+        content = self.plan if "response_format" in payload else self.answer
+        return httpx.Response(
+            200,
+            json={
+                "id": f"chatcmpl-{len(self.payloads)}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": payload["model"],
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            },
+        )
+
+
+@pytest.fixture
+def openai_api(monkeypatch: pytest.MonkeyPatch) -> FakeOpenAI:
+    api = FakeOpenAI()
+    transport = httpx.MockTransport(api)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(conversation_agent, "_http_client", lambda: httpx.Client(transport=transport))
+
+    def async_client() -> httpx.AsyncClient:
+        client = httpx.AsyncClient(transport=transport)
+        api.async_clients.append(client)
+        return client
+
+    monkeypatch.setattr(conversation_agent, "_async_http_client", async_client)
+    return api
+
+
+@pytest.fixture
+def agent(openai_api: FakeOpenAI) -> conversation_agent.CityInsightsAgent:
+    return conversation_agent.CityInsightsAgent()
+
+
+@pytest.fixture
+def legacy() -> ModuleType:
+    """The legacy agent script, loaded the way the API loads it."""
+    return AgentAdapter()._module
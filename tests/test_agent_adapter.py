@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from city_insights_api.services import agent_adapter
+from city_insights_api.services.agent_adapter import AgentAdapter
+
+
+@pytest.fixture
+def adapter() -> AgentAdapter:
+    # _build_places does not touch the legacy module: skip loading it.
+    return AgentAdapter.__new__(AgentAdapter)
+
+
+def test_build_places_validates_and_drops_unlocated(adapter: AgentAdapter) -> None:
+    places = adapter._build_places(
+        [
+            {"id": 123, "name": "Boulangerie", "lat": "47.81", "lon": 7.10},
+            {"id": "node/4", "name": "Sans position", "lat": None, "lon": 7.2},
+            {"name": "Sans id", "lat": 47.8, "lon": 7.1, "tags": {"shop": "bakery"}},
+        ]
+    )
+
+    assert [(p.id, p.name, p.lat, p.lon) for p in places] == [
+        ("123", "Boulangerie", 47.81, 7.10),
+        (None, "Sans id", 47.8, 7.1),
+    ]
+
+
+def test_build_places_rejects_malformed_coordinates(adapter: AgentAdapter) -> None:
+    with pytest.raises(ValidationError):
+        adapter._build_places([{"name": "Cassé", "lat": "n/a", "lon": 7.1}])
+
+
+def test_module_cache_keeps_one_entry_per_script(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(agent_adapter, "_MODULE_CACHE", {})
+    script = tmp_path / "agent.py"
+    script.write_text("VERSION = 1\n", encoding="utf-8")
+
+    first = AgentAdapter(script)._module
+    assert AgentAdapter(script)._module is first  # unchanged script: loaded once
+
+    script.write_text("VERSION = 2\n", encoding="utf-8")
+    os.utime(script, ns=(1_000_000_000, 1_000_000_000))
+    second = AgentAdapter(script)._module
+
+    assert (first.VERSION, second.VERSION) == (1, 2)
+    assert list(agent_adapter._MODULE_CACHE) == [script.resolve()]
+    assert agent_adapter._MODULE_CACHE[script.resolve()][1] is second
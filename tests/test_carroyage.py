@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from city_insights_api.models.domain import BoundingBox
+from city_insights_api.services.carroyage import InseeCarroyageGenerator
+
+
+def _bbox(offset: float) -> BoundingBox:
+    return BoundingBox(south=48.80 + offset, west=2.25, north=48.90 + offset, east=2.40)
+
+
+def test_cache_prunes_least_recently_used_entries(tmp_path: Path) -> None:
+    csv = tmp_path / "carroyage.csv"
+    csv.write_text("X,Y,ind_c\n37600,28890,12\n37610,28900,7\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+    generator = InseeCarroyageGenerator(csv, cache_dir=cache_dir, cache_max_entries=2)
+
+    def generate(offset: float, mtime_ns: int) -> Path:
+        generator.generate(_bbox(offset), tmp_path / "out.json")
+        entry = generator._cache_path(_bbox(offset))
+        os.utime(entry, ns=(mtime_ns, mtime_ns))  # explicit clock: filesystem mtime granularity varies
+        return entry
+
+    first = generate(0.0, 1_000)
+    second = generate(0.1, 2_000)
+    generate(0.0, 3_000)  # cache hit: the first bbox becomes the most recently used
+    third = generate(0.2, 4_000)
+
+    assert sorted(cache_dir.glob("*.json")) == sorted([first, third])
+    assert not second.exists()
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from data._aho import match_query
+from data.categories import CATEGORIES, KEY_INDEX, SYNONYM_INDEX, _norm
+
+
+def test_synonym_index_covers_every_key_label_and_synonym() -> None:
+    for category in CATEGORIES:
+        for text in (category.key, category.label, *category.synonyms):
+            assert _norm(text) in SYNONYM_INDEX
+
+
+def test_synonym_index_prefers_keys_then_first_declared_category() -> None:
+    assert all(SYNONYM_INDEX[_norm(key)] == key for key in KEY_INDEX)
+    # "vélo" is a synonym of both; bicycle_rental is declared first.
+    assert SYNONYM_INDEX[_norm("Vélo")] == "bicycle_rental"
+    assert SYNONYM_INDEX[_norm("bricolage")] == "hardware"
+
+
+def test_match_query_finds_whole_word_synonyms_in_free_text() -> None:
+    assert match_query("Je veux une Boulangerie et une pharmacie près d'ici") == ["bakery", "pharmacy"]
+    assert match_query("un bar") == ["bar"]
+    assert match_query("barbecue") == []  # "bar" is not a whole word here
+    assert match_query("aucune idée") == []
+
+
+def test_match_query_puts_the_most_specific_synonym_first() -> None:
+    assert match_query("une station velo en ville") == ["bicycle_rental", "train_station"]
+    assert match_query("on mange des fruits de mer") == ["seafood", "greengrocer"]
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from city_insights_api.services import conversation_agent
+from city_insights_api.services.conversation_agent import CityInsightsAgent, ConversationIntent, ToolAction, ToolPlan
+
+from .conftest import FakeOpenAI
+
+
+def test_run_batch_can_be_called_repeatedly(agent: CityInsightsAgent, openai_api: FakeOpenAI) -> None:
+    # Distinct messages per batch: answers are not served from the response cache.
+    first = agent.run_batch(["Bonjour", "Merci pour ton aide"])
+    second = agent.run_batch(["Salut", "Que peux-tu faire ?"])
+
+    assert [outcome.answer for outcome in first + second] == ["Bonjour !"] * 4
+    # Planner + responder for each of the four messages, all through a live pool.
+    assert len(openai_api.payloads) == 8
+    # One async pool per batch loop, each closed before its loop ended.
+    assert len(openai_api.async_clients) == 2
+    assert all(client.is_closed for client in openai_api.async_clients)
+    assert agent._loop_llms == {}
+
+
+def _ask(agent: CityInsightsAgent, message: str, *, session_id: str, asynchronous: bool) -> None:
+    kwargs = {"session_id": session_id, "prior_turns": (), "prior_user_messages": ()}
+    if asynchronous:
+        asyncio.run(agent.arun(message, **kwargs))
+    else:
+        agent.run(message, **kwargs)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_prompt_cache_key_reaches_planner_and_responder(
+    agent: CityInsightsAgent, openai_api: FakeOpenAI, asynchronous: bool
+) -> None:
+    _ask(agent, "Bonjour, que sais-tu faire ?", session_id="session-42", asynchronous=asynchronous)
+
+    planner, responder = openai_api.payloads
+    assert "response_format" in planner and "response_format" not in responder
+    assert planner["prompt_cache_key"] == "session-42"
+    assert responder["prompt_cache_key"] == "session-42"
+
+
+class _FakeAdapter:
+    """Legacy adapter stub: records fetched messages, fails those listed in ``misses``."""
+
+    def __init__(self, misses: set[str]) -> None:
+        self.misses = misses
+        self.calls: list[str] = []
+
+    def run_from_message(self, message: str) -> str:
+        self.calls.append(message)
+        if message in self.misses:
+            raise RuntimeError("Aucun résultat pour cette requête")
+        return f"payload:{message}"
+
+
+def _fetch(agent: CityInsightsAgent) -> tuple[object, object]:
+    return agent._run_fetch_with_fallback(
+        "précis",
+        fallback_message="général",
+        category_hint="restaurants",
+        qualifier="végans",
+    )
+
+
+def test_fallback_fetch_is_not_started_when_the_precise_one_succeeds(agent: CityInsightsAgent) -> None:
+    agent.adapter = _FakeAdapter(misses=set())
+
+    assert _fetch(agent) == ("payload:précis", None)
+    assert agent.adapter.calls == ["précis"]
+
+
+def test_fallback_fetch_runs_after_an_empty_precise_one(agent: CityInsightsAgent) -> None:
+    agent.adapter = _FakeAdapter(misses={"précis"})
+
+    payload, notice = _fetch(agent)
+
+    assert payload == "payload:général"
+    assert "végans" in notice
+    assert agent.adapter.calls == ["précis", "général"]
+
+
+@pytest.mark.parametrize(
+    ("message", "prefetched"),
+    [
+        ("Liste les boulangeries à Thann", True),
+        ("Où implanter une pharmacie à Belfort ?", True),
+        ("Je pars en vacances en Bretagne, une idée ?", False),  # city hint, but chit-chat
+    ],
+)
+def test_prefetch_only_for_listing_and_analysis(
+    agent: CityInsightsAgent, monkeypatch: pytest.MonkeyPatch, message: str, prefetched: bool
+) -> None:
+    submitted: list[tuple] = []
+    monkeypatch.setattr(conversation_agent._TOOL_POOL, "submit", lambda *args, **kw: submitted.append(args))
+    state = agent._prepare_turn(message, session_id="s", prior_turns=(), prior_user_messages=())
+    assert state.city_hint
+
+    agent._start_prefetch(state)
+
+    assert bool(submitted) is prefetched
+
+
+def _listing_state(agent: CityInsightsAgent) -> object:
+    return agent._prepare_turn(
+        "Liste les boulangeries à Thann", session_id="s", prior_turns=(), prior_user_messages=()
+    )
+
+
+def test_planned_fetch_adopts_the_prefetched_result(agent: CityInsightsAgent) -> None:
+    agent.adapter = _FakeAdapter(misses=set())
+    state = _listing_state(agent)
+    state.prefetch = Future()
+    state.prefetch.set_result((SimpleNamespace(places=[]), "Aucun résultat précis."))
+
+    agent._run_data_tools(state, [ToolAction(tool="fetch_commerces", reason="test")], needs_fetch=True)
+
+    assert state.fetch_result.places == []
+    assert state.fallback_notice == "Aucun résultat précis."
+    assert state.prefetch is None
+    assert agent.adapter.calls == []  # not fetched a second time
+
+
+def test_prefetch_is_dropped_when_the_plan_does_not_fetch(agent: CityInsightsAgent) -> None:
+    agent.adapter = _FakeAdapter(misses=set())
+    state = _listing_state(agent)
+    prefetch = state.prefetch = Future()
+
+    agent._run_data_tools(state, [ToolAction(tool="respond_direct", reason="test")], needs_fetch=False)
+
+    assert prefetch.cancelled()
+    assert state.fetch_result is None and state.prefetch is None
+
+
+def test_planner_direct_answer_skips_the_responder(agent: CityInsightsAgent, openai_api: FakeOpenAI) -> None:
+    openai_api.plan = orjson.dumps(
+        {"actions": [{"tool": "respond_direct", "reason": "salutation"}], "direct_answer": "Salut, que cherches-tu ?"}
+    ).decode()
+
+    outcome = agent.run("Salut", session_id="s", prior_turns=(), prior_user_messages=())
+
+    assert outcome.answer == "Salut, que cherches-tu ?"
+    assert len(openai_api.payloads) == 1  # planner only
+
+
+def test_direct_answer_cancels_the_prefetch(agent: CityInsightsAgent) -> None:
+    state = _listing_state(agent)
+    prefetch = state.prefetch = Future()
+    plan = ToolPlan(actions=[ToolAction(tool="respond_direct", reason="test")], direct_answer=" Voici. ")
+
+    assert agent._answer_directly(state, plan, plan.actions)
+    assert state.direct_answer == "Voici."
+    assert prefetch.cancelled() and state.prefetch is None
+
+
+def test_direct_answer_is_ignored_when_a_tool_must_run(agent: CityInsightsAgent) -> None:
+    state = _listing_state(agent)
+    plan = ToolPlan(actions=[ToolAction(tool="fetch_commerces", reason="test")], direct_answer="Voici.")
+
+    assert not agent._answer_directly(state, plan, plan.actions)
+    assert state.direct_answer is None
+
+
+@pytest.mark.parametrize(
+    ("message", "tools"),
+    [
+        ("Liste les boulangeries à Thann", ["fetch_commerces"]),
+        ("Où implanter une pharmacie à Belfort ?", ["fetch_commerces", "analyze_city"]),
+        ("Cherche sur le web les actualités des pharmacies à Belfort", ["web_search"]),
+        ("Liste les boulangeries", None),  # no city: the planner decides
+        ("Bonjour, que sais-tu faire ?", None),
+    ],
+)
+def test_local_plan(agent: CityInsightsAgent, message: str, tools: list[str] | None) -> None:
+    state = agent._prepare_turn(message, session_id="s", prior_turns=(), prior_user_messages=())
+
+    plan = agent._local_plan(state)
+
+    assert (plan and [action.tool for action in plan.actions]) == tools
+    assert agent.planner_skipped_total == (tools is not None)
+
+
+def test_local_plan_skips_the_planner_call(agent: CityInsightsAgent, openai_api: FakeOpenAI) -> None:
+    agent.web_search_tool = None
+
+    agent.run("Cherche sur le web les actualités de Thann", session_id="s", prior_turns=(), prior_user_messages=())
+
+    assert ["response_format" in payload for payload in openai_api.payloads] == [False]  # responder only
+
+
+def test_prompts_share_a_static_prefix_across_turns(agent: CityInsightsAgent) -> None:
+    history = [("Liste les boulangeries à Thann", "Il y en a 4.")]
+    turns = [
+        agent._prepare_turn(message, session_id="s", prior_turns=history, prior_user_messages=[history[0][0]])
+        for message in ("Et les pharmacies ?", "Bonjour")
+    ]
+
+    planner = [agent._planner_input(state) for state in turns]
+    responder = [agent._responder_input(state) for state in turns]
+
+    assert planner[0][0] is conversation_agent.PLANNER_SYSTEM
+    assert responder[0][0] is conversation_agent.RESPONSE_SYSTEM
+    assert planner[0][:2] == planner[1][:2]  # system + history
+    assert responder[0][:2] == responder[1][:2]
+    assert "Liste les boulangeries à Thann" in planner[0][1].content
+    assert [messages[-1].content for messages in planner] == ["Et les pharmacies ?", "Bonjour"]
+    assert responder[1][2].content == "Bonjour"
+
+
+def test_identical_prompt_reuses_the_responder_answer(agent: CityInsightsAgent, openai_api: FakeOpenAI) -> None:
+    _ask(agent, "Que peux-tu faire ?", session_id="s", asynchronous=False)
+    _ask(agent, "Que peux-tu faire ?", session_id="s", asynchronous=True)
+
+    # Planner twice, responder once: the second answer comes from the cache.
+    assert ["response_format" in payload for payload in openai_api.payloads] == [True, False, True]
+
+
+def test_answers_are_not_cached_above_temperature_zero(openai_api: FakeOpenAI) -> None:
+    agent = CityInsightsAgent(temperature=0.7)
+    _ask(agent, "Que peux-tu faire ?", session_id="s", asynchronous=False)
+    _ask(agent, "Que peux-tu faire ?", session_id="s", asynchronous=False)
+
+    assert len(openai_api.payloads) == 4
+
+
+def test_titles_are_cached_and_failures_are_not(
+    agent: CityInsightsAgent, openai_api: FakeOpenAI, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(conversation_agent, "_TITLE_CACHE", conversation_agent._LruCache("titles", 2))
+    openai_api.answer = ""
+
+    assert agent.build_title("pharmacies à Belfort", "Voici.") == "Pharmacies à belfort"  # fallback
+    openai_api.answer = "Pharmacies de Belfort"
+    assert agent.build_title("pharmacies à Belfort", "Voici.") == "Pharmacies de Belfort"
+    assert asyncio.run(agent.abuild_title("pharmacies à Belfort", "Voici.")) == "Pharmacies de Belfort"
+
+    assert len(openai_api.payloads) == 2  # the empty title was retried, the real one reused
+
+
+class _FakePipeline:
+    def __init__(self) -> None:
+        self.analysed: list[str] = []
+
+    def run_from_agent(self, fetch_result: object) -> str:
+        self.analysed.append(fetch_result.city)
+        return f"analysis:{fetch_result.city}"
+
+
+def test_fetches_and_analyses_are_memoized_per_agent(agent: CityInsightsAgent) -> None:
+    agent.adapter = _FakeAdapter(misses=set())
+    agent.pipeline = _FakePipeline()
+    bbox = SimpleNamespace(south=47.7, west=7.0, north=47.9, east=7.2)
+    thann = SimpleNamespace(city="Thann", category_key="bakery", count=4, bbox=bbox)
+
+    assert agent._fetch("boulangeries Thann") == agent._fetch("boulangeries Thann") == "payload:boulangeries Thann"
+    assert agent._analyze(thann) == agent._analyze(SimpleNamespace(**vars(thann))) == "analysis:Thann"
+    agent._analyze(SimpleNamespace(**{**vars(thann), "count": 5}))  # refreshed data: analysed again
+    assert (agent.adapter.calls, agent.pipeline.analysed) == (["boulangeries Thann"], ["Thann", "Thann"])
+
+    agent.clear_cache()
+    agent._fetch("boulangeries Thann")
+    assert len(agent.adapter.calls) == 2
+
+
+def test_analysis_runs_at_most_once_per_turn(agent: CityInsightsAgent, monkeypatch: pytest.MonkeyPatch) -> None:
+    analysed: list[object] = []
+    monkeypatch.setattr(agent, "_fetch", lambda message: SimpleNamespace(places=[]))
+    monkeypatch.setattr(agent, "_analyze", lambda fetched: analysed.append(fetched) or SimpleNamespace(map_file=None))
+    state = agent._prepare_turn(
+        "Où implanter une pharmacie à Belfort ?", session_id="s", prior_turns=(), prior_user_messages=()
+    )
+    plan = ToolPlan(actions=[ToolAction(tool="analyze_city", reason="test")] * 2)
+
+    agent._run_actions(state, plan)
+
+    assert len(analysed) == 1
+
+
+@pytest.mark.parametrize(
+    ("message", "category", "qualifier"),
+    [
+        ("Où ouvrir une Pharmacie à Belfort ?", "pharmacies", None),
+        ("Je cherche des restaurants végans à Lyon", "restaurants", "végans"),
+        ("Combien de restaurants italiens dans Mulhouse, merci", "restaurants", "italiens"),
+        ("des cafés et des bars à Paris", "bars", None),  # keyword rank, not position in the text
+        ("Bonjour", None, None),
+    ],
+)
+def test_extract_category_hint(message: str, category: str | None, qualifier: str | None) -> None:
+    assert conversation_agent._extract_category_cached(message) == (category, qualifier)
+
+
+@pytest.mark.parametrize(
+    ("message", "city"),
+    [
+        ("Liste les boulangeries à Saint-Étienne", "saint-étienne"),
+        ("Où ouvrir une Pharmacie à BELFORT ?", "belfort"),
+        ("Combien de restaurants italiens dans Mulhouse, merci", "mulhouse"),
+        ("Bonjour", None),
+    ],
+)
+def test_extract_city_hint(message: str, city: str | None) -> None:
+    assert conversation_agent._extract_city_cached(message) == city
+
+
+@pytest.mark.parametrize(
+    ("message", "intent"),
+    [
+        ("Où ouvrir une Pharmacie à Belfort ?", ConversationIntent.ANALYSIS),
+        ("Combien de restaurants à Mulhouse ?", ConversationIntent.LISTING),
+        ("Liste les boulangeries à Thann", ConversationIntent.LISTING),
+        ("Bonjour, merci !", ConversationIntent.GENERAL),
+    ],
+)
+def test_detect_intent(agent: CityInsightsAgent, message: str, intent: ConversationIntent) -> None:
+    assert agent._detect_intent(message.lower()) is intent
+
+
+def test_needs_web_search(agent: CityInsightsAgent) -> None:
+    assert agent._needs_web_search("quelles sont les actualités sur internet ?")
+    assert not agent._needs_web_search("liste les boulangeries à thann")
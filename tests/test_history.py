@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from typing import Any, Dict, List
+
+import pytest
+from bson import ObjectId
+
+from city_insights_api.core.config import settings
+from city_insights_api.services.chat_history import ChatHistoryStore
+from city_insights_api.services.conversation_agent import CityInsightsAgent
+
+
+class FakeCollection:
+    """One stored session; honours the ``$slice`` projection on ``messages``."""
+
+    def __init__(self, doc: Dict[str, Any]) -> None:
+        self.doc = doc
+
+    async def find_one(self, query: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any] | None:
+        if query["_id"] != self.doc["_id"]:
+            return None
+        messages = self.doc["messages"]
+        window = projection.get("messages", {}).get("$slice")
+        return {**self.doc, "messages": messages[window:] if window else messages}
+
+
+def _session(turns: int) -> Dict[str, Any]:
+    messages: List[Dict[str, str]] = []
+    for index in range(1, turns + 1):
+        messages.append({"role": "user", "content": f"question {index}"})
+        messages.append({"role": "assistant", "content": f"réponse {index}"})
+    return {"_id": ObjectId(), "messages": messages, "has_title": True}
+
+
+def test_get_context_loads_history_max_turns() -> None:
+    doc = _session(12)
+    store = ChatHistoryStore(dataclasses.replace(settings, history_max_turns=3))
+    store.collection = FakeCollection(doc)
+
+    turns, users, needs_title = asyncio.run(store.get_context(str(doc["_id"])))
+
+    assert turns == [(f"question {i}", f"réponse {i}") for i in (10, 11, 12)]
+    assert users == ["question 10", "question 11", "question 12"]
+    assert not needs_title
+
+
+def test_format_history_keeps_the_last_turns(agent: CityInsightsAgent, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "history_max_turns", 2)
+    turns = [(f"question {i}", f"réponse {i}") for i in range(1, 6)]
+
+    text = agent._format_history(turns)
+
+    assert text.splitlines() == [
+        "Derniers 2 échanges (du plus ancien au plus récent) :",
+        "1. Utilisateur : question 4",
+        "   Agent : réponse 4",
+        "2. Utilisateur : question 5",
+        "   Agent : réponse 5",
+    ]
+
+
+def test_malformed_session_id_is_not_looked_up() -> None:
+    doc = _session(1)
+    store = ChatHistoryStore(settings)
+    store.collection = FakeCollection(doc)
+    store.collection.find_one = None  # any query would fail
+
+    for session_id in ("", "not-an-id", str(doc["_id"]) + "0", str(doc["_id"])[:-1] + "z"):
+        assert asyncio.run(store.get_context(session_id)) is None
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import functools
+import io
+import os
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, List
+
+import httpx
+import pytest
+
+from city_insights_api.core import config
+from city_insights_api.services import insee_downloader
+
+
+@pytest.fixture
+def hashed(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Names of the files read in full by the checksum code."""
+    calls: List[str] = []
+    file_digests = insee_downloader._file_digests
+
+    def counting(path: Path, algorithms: set[str]) -> dict[str, str]:
+        calls.append(path.name)
+        return file_digests(path, algorithms)
+
+    monkeypatch.setattr(insee_downloader, "_file_digests", counting)
+    return calls
+
+
+def test_verify_never_reads_the_csv(tmp_path: Path, hashed: List[str]) -> None:
+    csv = tmp_path / "carroyage.csv"
+    csv.write_bytes(b"idcar;ind\n" * 1000)
+
+    assert not insee_downloader.verify_insee_carroyage(csv)  # no sidecar yet
+    insee_downloader.adopt_insee_carroyage(csv)
+    assert insee_downloader.verify_insee_carroyage(csv)
+
+    os.utime(csv, ns=(1_000_000_000, 1_000_000_000))  # coarse clocks may not move mtime by themselves
+    assert not insee_downloader.verify_insee_carroyage(csv)
+    assert hashed == []
+
+
+def test_ensure_files_keeps_a_replaced_csv(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def no_download(dest: Path, **_: object) -> Path:
+        raise AssertionError("the operator's CSV must not be replaced")
+
+    monkeypatch.setattr(config, "download_insee_carroyage", no_download)
+    settings = config.Settings(data_dir=tmp_path)
+    csv = settings.insee_csv_path
+    csv.write_bytes(b"idcar;ind\n" * 1000)
+    insee_downloader._write_checksum(csv, "0" * 64)  # sidecar of the originally downloaded file
+
+    csv.write_bytes(b"idcar;ind\n" * 999)  # replaced by hand
+    os.utime(csv, ns=(1_000_000_000, 1_000_000_000))
+    settings.ensure_files()
+
+    assert csv.read_bytes() == b"idcar;ind\n" * 999
+    assert insee_downloader.verify_insee_carroyage(csv)  # re-adopted: no warning on the next start
+
+
+_V1 = b"1" * 1_200_000
+_V2 = b"2" * 1_300_000
+
+
+class _FakeResponse(io.BytesIO):
+    def __init__(self, status: int, body: bytes, headers: dict[str, str]) -> None:
+        super().__init__(body)
+        self.status = status
+        self.headers = {"Content-Length": str(len(body)), **headers}
+
+
+class _FakeServer:
+    """urlopen stand-in serving ``body`` under ``etag``; a stale If-Range turns a Range into a 200."""
+
+    def __init__(self, body: bytes, etag: str) -> None:
+        self.body = body
+        self.etag = etag
+        self.requests: list[dict[str, str | None]] = []
+
+    def __call__(self, req: urllib.request.Request, timeout: float | None = None) -> _FakeResponse:
+        if req.full_url != insee_downloader.INSEE_CARROYAGE_URL:
+            raise urllib.error.URLError("no metadata")  # no published checksum
+        range_header, if_range = req.get_header("Range"), req.get_header("If-range")
+        self.requests.append({"range": range_header, "if_range": if_range})
+        if range_header and if_range in (None, self.etag):
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            return _FakeResponse(206, self.body[start:], {"ETag": self.etag})
+        return _FakeResponse(200, self.body, {"ETag": self.etag})
+
+
+@pytest.fixture
+def part_file(tmp_path: Path) -> Path:
+    """Half of version 1 of the file, left by an interrupted download."""
+    part = tmp_path / "carroyage.csv.part"
+    part.write_bytes(_V1[: len(_V1) // 2])
+    return part
+
+
+def _download(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, server: _FakeServer) -> bytes:
+    monkeypatch.setattr(insee_downloader.urllib.request, "urlopen", server)
+    dest = insee_downloader.download_insee_carroyage(tmp_path / "carroyage.csv", show_progress=False)
+    return dest.read_bytes()
+
+
+def test_resume_appends_when_the_remote_file_is_unchanged(
+    tmp_path: Path, part_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    part_file.with_name("carroyage.csv.part.validator").write_text('"v1"', encoding="ascii")
+    server = _FakeServer(_V1, '"v1"')
+
+    assert _download(monkeypatch, tmp_path, server) == _V1
+    assert server.requests == [{"range": f"bytes={len(_V1) // 2}-", "if_range": '"v1"'}]
+    assert not part_file.with_name("carroyage.csv.part.validator").exists()
+
+
+def test_resume_restarts_when_the_remote_file_changed(
+    tmp_path: Path, part_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    part_file.with_name("carroyage.csv.part.validator").write_text('"v1"', encoding="ascii")
+    server = _FakeServer(_V2, '"v2"')  # If-Range mismatch: the server sends 200 and the full file
+
+    assert _download(monkeypatch, tmp_path, server) == _V2
+
+
+def test_part_without_validator_is_not_resumed(
+    tmp_path: Path, part_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    server = _FakeServer(_V2, '"v2"')
+
+    assert _download(monkeypatch, tmp_path, server) == _V2
+    assert server.requests == [{"range": None, "if_range": None}]
+
+
+class _RangeServer:
+    """httpx transport handler serving ``body``; ``ranges=False`` ignores Range headers."""
+
+    def __init__(self, body: bytes, *, accept_ranges: bool = True, ranges: bool = True) -> None:
+        self.body = body
+        self.accept_ranges = accept_ranges
+        self.ranges = ranges
+        self.requested: list[str | None] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        headers = {"Content-Length": str(len(self.body))}
+        if self.accept_ranges:
+            headers["Accept-Ranges"] = "bytes"
+        if request.method == "HEAD":
+            return httpx.Response(200, headers=headers)
+        range_header = request.headers.get("Range")
+        self.requested.append(range_header)
+        if not (range_header and self.ranges):
+            return httpx.Response(200, headers=headers, stream=httpx.ByteStream(self.body))
+        start, end = map(int, range_header.removeprefix("bytes=").split("-"))
+        return httpx.Response(206, stream=httpx.ByteStream(self.body[start : end + 1]))
+
+
+@pytest.fixture
+def range_server(monkeypatch: pytest.MonkeyPatch) -> Callable[..., _RangeServer]:
+    monkeypatch.setattr(insee_downloader, "MIN_SEGMENTED_SIZE", 1_000_000)
+    client = httpx.Client
+
+    def install(body: bytes, **options: bool) -> _RangeServer:
+        server = _RangeServer(body, **options)
+        transport = httpx.MockTransport(server)
+        monkeypatch.setattr(insee_downloader.httpx, "Client", functools.partial(client, transport=transport))
+        return server
+
+    return install
+
+
+def test_fresh_download_fetches_parallel_ranges(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, range_server: Callable[..., _RangeServer]
+) -> None:
+    body = bytes(range(256)) * 4_700  # 1_203_200 bytes, not a multiple of SEGMENTS
+    server = range_server(body)
+    single = _FakeServer(_V2, '"v2"')
+
+    assert _download(monkeypatch, tmp_path, single) == body
+    assert sorted(server.requested) == sorted(
+        ["bytes=0-300799", "bytes=300800-601599", "bytes=601600-902399", "bytes=902400-1203199"]
+    )
+    assert single.requests == []  # no single-stream download
+
+
+@pytest.mark.parametrize("options", [{"ranges": False}, {"accept_ranges": False}])
+def test_download_falls_back_to_one_stream_without_ranges(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    range_server: Callable[..., _RangeServer],
+    options: dict[str, bool],
+) -> None:
+    range_server(_V1, **options)
+    single = _FakeServer(_V2, '"v2"')
+
+    assert _download(monkeypatch, tmp_path, single) == _V2
+    assert single.requests == [{"range": None, "if_range": None}]
+    assert not (tmp_path / "carroyage.csv.part").exists()
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import io
+import threading
+import time
+from collections import OrderedDict
+from types import ModuleType
+from typing import Any, List
+
+import orjson
+import pytest
+import requests
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+
+class _ScriptedLlm:
+    """Tool-calling model stand-in: replays ``replies`` and records what it was sent."""
+
+    def __init__(self, replies: List[AIMessage]) -> None:
+        self.replies = replies
+        self.received: List[List[BaseMessage]] = []
+
+    def invoke(self, messages: List[BaseMessage]) -> AIMessage:
+        self.received.append(list(messages))
+        return self.replies[len(self.received) - 1]
+
+
+class _StaticTool:
+    def __init__(self, result: Any) -> None:
+        self.result = result
+
+    def invoke(self, args: Any) -> Any:
+        return self.result
+
+
+def test_run_agent_sends_tool_results_unchanged(legacy: ModuleType, monkeypatch: pytest.MonkeyPatch) -> None:
+    result = {
+        "ok": True,
+        "count": 2,
+        "items": [
+            {"id": 1, "name": "Boulangerie Pâtissière", "lat": 47.81, "lon": 7.1},
+            {"id": 2, "name": None, "lat": 47.82, "lon": 7.2},
+        ],
+    }
+    call = {"name": "overpass_places_bbox", "args": {}, "id": "call-1"}
+    llm = _ScriptedLlm([AIMessage(content="", tool_calls=[call]), AIMessage(content="fini")])
+    monkeypatch.setattr(legacy, "_get_llm", lambda: llm)
+    monkeypatch.setitem(legacy.TOOL_REGISTRY, "overpass_places_bbox", _StaticTool(result))
+
+    assert legacy.run_agent("Liste les boulangeries à Thann", []).content == "fini"
+
+    tool_message = llm.received[1][-1]
+    assert isinstance(tool_message, ToolMessage)
+    assert orjson.loads(tool_message.content) == result  # items included, accents kept as UTF-8
+    assert "Pâtissière" in tool_message.content
+
+
+class _MeetingTool:
+    """Tool that returns only once ``parties`` calls are running at the same time."""
+
+    def __init__(self, barrier: threading.Barrier, result: Any) -> None:
+        self.barrier = barrier
+        self.result = result
+
+    def invoke(self, args: Any) -> Any:
+        self.barrier.wait()
+        return self.result
+
+
+def test_run_agent_runs_parallel_tool_calls_concurrently(
+    legacy: ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    barrier = threading.Barrier(2, timeout=5)  # sequential calls would time out here
+    calls = [
+        {"name": "city_to_bbox", "args": {}, "id": "call-1"},
+        {"name": "list_categories", "args": {}, "id": "call-2"},
+    ]
+    llm = _ScriptedLlm([AIMessage(content="", tool_calls=calls), AIMessage(content="fini")])
+    monkeypatch.setattr(legacy, "_get_llm", lambda: llm)
+    monkeypatch.setitem(legacy.TOOL_REGISTRY, "city_to_bbox", _MeetingTool(barrier, {"ok": True, "n": 1}))
+    monkeypatch.setitem(legacy.TOOL_REGISTRY, "list_categories", _MeetingTool(barrier, {"ok": True, "n": 2}))
+
+    assert legacy.run_agent("Boulangeries à Thann", []).content == "fini"
+
+    tool_messages = llm.received[1][-2:]
+    assert [(m.tool_call_id, orjson.loads(m.content)["n"]) for m in tool_messages] == [("call-1", 1), ("call-2", 2)]
+
+
+@pytest.mark.parametrize(
+    ("query", "category_key", "match"),
+    [
+        ("bakery", "bakery", "strict:index"),
+        ("Boulangeries", "bakery", "strict:index"),
+        ("Pharmacie !", "pharmacy", "norm:label"),  # punctuation only goes away once normalized
+        ("boucheries!", "butcher", "norm:label"),  # normalized, then singularized
+        ("cafes!", "cafe", "norm:key"),
+        ("garages", "car_repair", "norm:synonym"),
+        ("Je cherche une boulangerie", "bakery", "substring"),
+        ("boulangeire", "bakery", "fuzzy"),  # one typo: single rapidfuzz stage
+        ("pharmacei", "pharmacy", "fuzzy"),
+    ],
+)
+def test_resolve_category_key_stages(legacy: ModuleType, query: str, category_key: str, match: str) -> None:
+    assert legacy.resolve_category_key.func(query) == {"ok": True, "category_key": category_key, "match": match}
+
+
+def test_fuzzy_match_tolerates_typos_but_not_truncation(legacy: ModuleType) -> None:
+    candidates = [("boulangerie", "bakery"), ("pharmacie", "pharmacy")]
+
+    assert legacy._best_fuzzy_match("Boulangeries", candidates) == "bakery"  # singularized retry
+    assert legacy._best_fuzzy_match("phramacie", candidates) == "pharmacy"
+    assert legacy._best_fuzzy_match("boulang", candidates) is None
+    assert legacy._best_fuzzy_match("pharma", candidates) is None
+
+
+def test_resolve_category_key_rejects_unknown(legacy: ModuleType) -> None:
+    result = legacy.resolve_category_key.func("xyzzy")
+    assert result["ok"] is False
+    assert "bakery" in result["available_keys"]
+
+
+def test_build_overpass_unions_selectors_per_tag(legacy: ModuleType) -> None:
+    query = legacy.build_overpass(
+        [("amenity", "school"), ("shop", "bakery"), ("amenity", "college"), ("amenity", "school")],
+        (47.7, 7.0, 47.9, 7.2),
+    )
+
+    assert query == (
+        "[out:json][timeout:25];\n(\n"
+        '  node["amenity"~"^(school|college)$"](47.7,7.0,47.9,7.2);\n'
+        '  node["shop"="bakery"](47.7,7.0,47.9,7.2);\n'
+        ");\nout;"
+    )
+
+
+def _overpass_body(*elements: dict[str, Any]) -> bytes:
+    return orjson.dumps({"elements": list(elements)})
+
+
+def test_parse_overpass_drops_duplicate_elements(legacy: ModuleType) -> None:
+    bakery = {"type": "node", "id": 7, "lat": 47.8, "lon": 7.1, "tags": {"name": "Fournil"}}
+    body = _overpass_body(
+        bakery,
+        {"type": "node", "id": 8, "lat": 47.81, "lon": 7.11, "tags": {"name": "Pharmacie"}},
+        bakery,  # matched by two selectors of the union
+        {"type": "way", "id": 7, "tags": {"name": "Rue"}},
+    )
+
+    assert [place["id"] for place in legacy._parse_overpass_json(body)] == ["7", "8"]
+
+
+def test_parse_overpass_rounds_coordinates(legacy: ModuleType) -> None:
+    body = _overpass_body({"type": "node", "id": 1, "lat": 47.80812345678, "lon": 7.1049999999, "tags": {"name": "A"}})
+
+    assert legacy._parse_overpass_json(body) == [{"id": "1", "name": "A", "lat": 47.808123, "lon": 7.105}]
+
+
+def _response(status: int, headers: dict[str, str] | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "test"
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b"{}")
+    return response
+
+
+@pytest.fixture
+def sleeps(legacy: ModuleType, monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """Backoff delays, recorded instead of slept; jitter always draws its upper bound."""
+    recorded: List[float] = []
+    monkeypatch.setattr(legacy.time, "sleep", recorded.append)
+    monkeypatch.setattr(legacy.random, "uniform", lambda low, high: high)
+    return recorded
+
+
+def _serve(legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, responses: List[requests.Response]) -> None:
+    replies = iter(responses)
+    monkeypatch.setattr(legacy.SESSION, "request", lambda *args, **kwargs: next(replies))
+
+
+def test_retry_backoff_window_starts_at_base_delay(
+    legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, sleeps: List[float]
+) -> None:
+    _serve(legacy, monkeypatch, [_response(503), _response(503), _response(503), _response(200)])
+
+    assert legacy._request_with_retry("GET", "https://example.test").status_code == 200
+    assert sleeps == [1.0, 2.0, 4.0]
+
+
+def test_retry_after_is_capped_at_max_delay(
+    legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, sleeps: List[float]
+) -> None:
+    _serve(legacy, monkeypatch, [_response(429, {"Retry-After": "3600"}), _response(200)])
+
+    legacy._request_with_retry("GET", "https://example.test", max_delay=15.0)
+    assert sleeps == [15.0]
+
+
+class _Mirrors:
+    """_request_with_retry stand-in: each URL answers after ``delay`` seconds, or fails."""
+
+    def __init__(self, behaviour: dict[str, float | None]) -> None:
+        self.behaviour = behaviour  # url -> delay, None = error
+        self.started: List[str] = []
+
+    def __call__(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        self.started.append(url)
+        delay = self.behaviour[url]
+        if delay is None:
+            raise requests.ConnectionError(f"{url} down")
+        time.sleep(delay)
+        response = _response(200)
+        response.url = url
+        return response
+
+
+@pytest.fixture
+def mirrors(legacy: ModuleType, monkeypatch: pytest.MonkeyPatch) -> Any:
+    monkeypatch.setattr(legacy, "_MIRROR_STATE", {})
+
+    def install(behaviour: dict[str, float | None]) -> _Mirrors:
+        fake = _Mirrors(behaviour)
+        monkeypatch.setattr(legacy, "_request_with_retry", fake)
+        return fake
+
+    return install
+
+
+def test_hedged_request_starts_the_next_mirror_when_the_first_is_slow(legacy: ModuleType, mirrors: Any) -> None:
+    fake = mirrors({"a": 0.5, "b": 0.0})
+
+    response = legacy._hedged_request("GET", ["a", "b"], hedge_delay=0.05)
+
+    assert response.url == "b"
+    assert fake.started == ["a", "b"]
+
+
+def test_unhedged_request_waits_for_the_first_mirror(legacy: ModuleType, mirrors: Any) -> None:
+    fake = mirrors({"a": 0.1, "b": 0.0})
+
+    assert legacy._hedged_request("GET", ["a", "b"], hedge_delay=None).url == "a"
+    assert fake.started == ["a"]  # no duplicate request while "a" is still answering
+
+
+def test_unhedged_request_fails_over_after_an_error(legacy: ModuleType, mirrors: Any) -> None:
+    fake = mirrors({"a": None, "b": 0.0})
+
+    assert legacy._hedged_request("GET", ["a", "b"], hedge_delay=None).url == "b"
+    assert fake.started == ["a", "b"]
+
+
+def test_circuit_breaker_skips_a_failing_mirror(legacy: ModuleType, mirrors: Any) -> None:
+    fake = mirrors({"a": None, "b": 0.0})
+    for _ in range(legacy.MIRROR_FAILURE_THRESHOLD):
+        legacy._hedged_request("GET", ["a", "b"], hedge_delay=None)
+    fake.started.clear()
+
+    legacy._hedged_request("GET", ["a", "b"], hedge_delay=None)
+    assert fake.started == ["b"]  # "a" is in cooldown
+
+
+@pytest.fixture
+def nominatim(legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> List[dict[str, Any]]:
+    """Nominatim calls made by city_to_bbox, answered with Thann's bbox; empty geocode caches."""
+    calls: List[dict[str, Any]] = []
+
+    def hedged(method: str, urls: Any, **kwargs: Any) -> requests.Response:
+        calls.append({"urls": list(urls), "hedge_delay": kwargs["hedge_delay"]})
+        response = _response(200)
+        response.raw = io.BytesIO(b'[{"display_name": "Thann", "boundingbox": ["47.7", "47.9", "7.0", "7.2"]}]')
+        return response
+
+    monkeypatch.setattr(legacy, "_hedged_request", hedged)
+    monkeypatch.setattr(legacy, "GEOCODE_CACHE_PATH", tmp_path / "geocode.sqlite")
+    monkeypatch.setattr(legacy, "_GEOCODE_MEMO", OrderedDict())
+    return calls
+
+
+def test_city_to_bbox_does_not_hedge_nominatim(legacy: ModuleType, nominatim: List[dict[str, Any]]) -> None:
+    result = legacy.city_to_bbox.func("Thann")
+
+    assert result["ok"] and result["south"] == 47.7 and result["west"] == 7.0
+    assert nominatim == [{"urls": list(legacy.NOMINATIM_MIRRORS), "hedge_delay": None}]
+
+
+def test_city_to_bbox_is_cached_in_memory_and_on_disk(
+    legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, nominatim: List[dict[str, Any]]
+) -> None:
+    first = legacy.city_to_bbox.func("Thann")
+    assert legacy.city_to_bbox.func(" THANN ") == {**first, "city": " THANN "}  # same key once normalized
+
+    monkeypatch.setattr(legacy, "_GEOCODE_MEMO", OrderedDict())  # new process: only the SQLite file is left
+    assert legacy.city_to_bbox.func("Thann") == first
+    assert len(nominatim) == 1
+
+
+def test_city_to_bbox_refreshes_expired_entries(
+    legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, nominatim: List[dict[str, Any]]
+) -> None:
+    legacy.city_to_bbox.func("Thann")
+    later = time.time() + legacy.GEOCODE_TTL_SECONDS + 60
+    monkeypatch.setattr(legacy.time, "time", lambda: later)
+
+    legacy.city_to_bbox.func("Thann")
+    legacy.city_to_bbox.func("Thann")  # refreshed entry: cached again
+    assert len(nominatim) == 2
+
+
+def test_normalize_text_strips_accents_and_separators(legacy: ModuleType) -> None:
+    assert legacy._normalize_text("  Épicerie-Fine_à Thann ") == "epicerie fine a thann"
+    assert legacy._normalize_text("Crème BRÛLÉE, ça!") == "creme brulee ca"
+    assert legacy._slugify("Saint-Étienne") == "saint_etienne"
+
+
+def test_find_category_by_key(legacy: ModuleType) -> None:
+    assert legacy._find_category(" Bakery ").key == "bakery"
+    assert legacy._find_category("boulangerie") is None  # labels are not keys
+    assert legacy._find_category("") is None
+
+
+def test_write_json_replaces_the_file_atomically(
+    legacy: ModuleType, monkeypatch: pytest.MonkeyPatch, tmp_path: Any
+) -> None:
+    monkeypatch.setattr(legacy, "RESULT_DIR", tmp_path / "results")  # created on first write
+
+    assert legacy.write_json.func("../thann_bakery.json", {"items": [1, 2]})["count"] == 2
+    final = tmp_path / "results" / "thann_bakery.json"
+    assert orjson.loads(final.read_bytes()) == {"items": [1, 2]}
+
+    def crash(src: Any, dst: Any) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(legacy.os, "replace", crash)
+    assert legacy.write_json.func("thann_bakery.json", {"items": [3]})["ok"] is False
+
+    assert orjson.loads(final.read_bytes()) == {"items": [1, 2]}  # previous file intact
+    assert [path.name for path in final.parent.iterdir()] == ["thann_bakery.json"]  # no temp file left
+
+
+def test_expand_bounds_pads_clamps_and_keeps_degenerate_boxes(legacy: ModuleType) -> None:
+    assert legacy.expand_bounds(47.0, 7.0, 48.0, 9.0, 0.5) == (46.5, 6.0, 48.5, 10.0)
+    assert legacy.expand_bounds(89.0, 179.0, 90.0, 180.0, 5.0) == (88.0, 178.0, 90.0, 180.0)  # ratio capped at 1
+    assert legacy.expand_bounds(47.0, 7.0, 47.0, 8.0, 0.5) == (47.0, 7.0, 47.0, 8.0)
+    assert legacy._expand_bbox({"south": 47.0, "west": 7.0, "north": 48.0, "east": 9.0}, 0.5) == {
+        "south": 46.5,
+        "west": 6.0,
+        "north": 48.5,
+        "east": 10.0,
+    }
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import itertools
+import json
+import re
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pytest
+
+from city_insights_api.models.domain import AgentPlace, BoundingBox
+from city_insights_api.services import map_builder
+from city_insights_api.services.map_builder import MapBuilder
+
+HEAT_ROWS = re.compile(r"L\.heatLayer\(\s*(\[\[.*?\]\])", re.S)
+
+
+def _render(tmp_path: Path, name: str, monkeypatch: pytest.MonkeyPatch) -> Tuple[str, list]:
+    import branca.element
+
+    # Deterministic element ids, restarted for every map, so two renders compare equal.
+    counter = itertools.count()
+    monkeypatch.setattr(branca.element, "urandom", lambda size: next(counter).to_bytes(size, "big"))
+
+    rng = np.random.default_rng(0)
+    cells = [
+        {"lat": float(lat), "lon": float(lon), "pop": float(pop)}
+        for lat, lon, pop in zip(rng.uniform(45.7, 45.8, 500), rng.uniform(4.8, 4.9, 500), rng.uniform(0, 300, 500))
+    ]
+    payload = {"bbox": {"south": 45.7, "north": 45.8, "west": 4.8, "east": 4.9}, "cells": cells}
+    commerces = {"items": [{"lat": 45.75, "lon": 4.85, "name": "Boulangerie {{ test }} & <b>fils</b>"}]}
+    html = MapBuilder().build(payload, commerces, tmp_path / f"{name}.html").read_text(encoding="utf-8")
+    match = HEAT_ROWS.search(html)
+    assert match is not None
+    return html.replace(match.group(1), "ROWS"), json.loads(match.group(1))
+
+
+def test_heat_rows_spliced_after_render_match_folium_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # The installed folium renders HeatMap data verbatim (probed before ids are made stable).
+    assert map_builder._heat_rows_spliceable()
+    fast_html, fast_rows = _render(tmp_path, "fast", monkeypatch)
+
+    # Reference: folium serialises the layer rows itself.
+    monkeypatch.setattr(map_builder, "_heat_rows_spliceable", lambda: False)
+    reference_html, reference_rows = _render(tmp_path, "reference", monkeypatch)
+
+    assert "heat-rows-" not in fast_html
+    assert fast_html == reference_html
+    assert fast_rows == reference_rows
+    assert len(fast_rows) == 500
+
+
+def test_points_map_is_rendered_again_only_when_inputs_change(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    builder = MapBuilder()
+    renders: list[int] = []
+    render = builder._render
+    monkeypatch.setattr(builder, "_render", lambda fmap, deferred: (renders.append(1), render(fmap, deferred))[1])
+    bbox = BoundingBox(south=47.7, west=7.0, north=47.9, east=7.2)
+    output = tmp_path / "points.html"
+    bakery = AgentPlace(id="1", name="Fournil", lat=47.8, lon=7.1)
+
+    builder.build_points_map(bbox, [bakery], output)
+    builder.build_points_map(bbox, [bakery], output)  # same inputs: file reused
+    assert len(renders) == 1
+
+    builder.build_points_map(bbox, [bakery, AgentPlace(id="2", name="Pharmacie", lat=47.81, lon=7.11)], output)
+    output.with_suffix(".sig").unlink()  # lost digest: rendered again
+    builder.build_points_map(bbox, [bakery], output)
+    assert len(renders) == 3
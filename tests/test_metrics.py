@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+from city_insights_api.services import metrics
+
+
+@pytest.fixture
+def cells() -> list[dict[str, float]]:
+    rng = np.random.RandomState(0)
+    centers = np.array([[47.75, 7.33], [47.80, 7.40], [47.72, 7.28]])
+    points = np.concatenate([center + rng.normal(scale=0.01, size=(150, 2)) for center in centers])
+    return [{"lat": lat, "lon": lon, "pop": float(rng.randint(1, 50))} for lat, lon in points]
+
+
+@pytest.mark.parametrize("precomputed", [True, False])
+def test_silhouette_is_exact_on_every_cell(
+    cells: list[dict[str, float]], monkeypatch: pytest.MonkeyPatch, precomputed: bool
+) -> None:
+    # Both paths (one distance matrix for the sweep, or streamed per k) score every cell.
+    monkeypatch.setattr(metrics, "PRECOMPUTED_DISTANCES_MAX_CELLS", len(cells) if precomputed else 0)
+
+    result, models = metrics.KMeansEvaluator(n_jobs=1).evaluate_with_models(cells, k_min=2, k_max=4)
+
+    X = np.array([[cell["lon"], cell["lat"]] for cell in cells])
+    pops = np.array([cell["pop"] for cell in cells])
+    expected = []
+    for k in result.k_values:
+        labels = KMeans(n_clusters=k, n_init="auto", random_state=42).fit_predict(X, sample_weight=pops)
+        np.testing.assert_array_equal(models[k].labels_, labels)
+        expected.append(silhouette_score(X, labels))
+    np.testing.assert_allclose(result.silhouette, expected, rtol=1e-9)
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import pytest
+
+from city_insights_api.services.pipeline import PipelineService
+
+
+@pytest.mark.parametrize(
+    ("value", "slug"),
+    [
+        ("Saint-Étienne", "saint_etienne"),
+        ("  Thann ", "thann"),
+        ("L'Haÿ-les-Roses", "l_hay_les_roses"),
+        ("Aix en Provence", "aix_en_provence"),
+        ("---", "ville"),
+        ("", "ville"),
+    ],
+)
+def test_normalize_city(value: str, slug: str) -> None:
+    # The slug helper does not touch the pipeline's collaborators: skip building them.
+    assert PipelineService.__new__(PipelineService)._normalize_city(value) == slug
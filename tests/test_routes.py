@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator
+
+import orjson
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+
+from city_insights_api.api import routes
+from city_insights_api.models.api import ChatRequest
+from city_insights_api.services.conversation_agent import AgentOutcome, ConversationIntent
+
+
+@pytest.fixture
+def view_cache(monkeypatch: pytest.MonkeyPatch) -> OrderedDict[str, tuple[int, bytes]]:
+    cache: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+    monkeypatch.setattr(routes, "_view_cache", cache)
+    monkeypatch.setattr(routes, "_view_cache_bytes", 0)
+    monkeypatch.setattr(routes, "_VIEW_CACHE_BUDGET_BYTES", 250)
+    return cache
+
+
+def _load(path: Path) -> bytes:
+    return routes._load_view(str(path), os.stat(path).st_mtime_ns)
+
+
+def test_view_cache_is_bounded_by_total_bytes(tmp_path: Path, view_cache: OrderedDict) -> None:
+    views = [tmp_path / f"view-{index}.html" for index in range(3)]
+    for index, view in enumerate(views):
+        view.write_bytes(bytes([65 + index]) * 100)
+
+    _load(views[0])
+    _load(views[1])
+    _load(views[0])  # hit: view-0 becomes the most recently used
+    assert _load(views[2]) == b"C" * 100
+
+    assert list(view_cache) == [str(views[0]), str(views[2])]
+    assert routes._view_cache_bytes == 200
+
+
+def test_view_cache_rereads_a_regenerated_file(tmp_path: Path, view_cache: OrderedDict) -> None:
+    view = tmp_path / "view.html"
+    view.write_bytes(b"old")
+    assert _load(view) == b"old"
+
+    view.write_bytes(b"fresh map")
+    os.utime(view, ns=(1_000_000_000, 1_000_000_000))
+    assert _load(view) == b"fresh map"
+    assert len(view_cache) == 1
+    assert routes._view_cache_bytes == len(b"fresh map")
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, view_cache: OrderedDict) -> TestClient:
+    monkeypatch.setattr(routes.settings, "views_dir", tmp_path)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_view_supports_conditional_get(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, streamed: bool
+) -> None:
+    if streamed:  # served by FileResponse instead of the in-memory cache
+        monkeypatch.setattr(routes, "_VIEW_CACHE_MAX_FILE_BYTES", 0)
+    (tmp_path / "map.html").write_bytes(b"<html>carte</html>")
+
+    first = client.get("/api/views/map.html")
+    assert first.status_code == 200 and first.content == b"<html>carte</html>"
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+    by_etag = client.get("/api/views/map.html", headers={"If-None-Match": etag})
+    assert by_etag.status_code == 304 and by_etag.content == b""
+    assert by_etag.headers["etag"] == etag
+    by_date = client.get("/api/views/map.html", headers={"If-Modified-Since": last_modified})
+    assert by_date.status_code == 304
+
+    (tmp_path / "map.html").write_bytes(b"<html>nouvelle carte</html>")
+    os.utime(tmp_path / "map.html", ns=(2_000_000_000_000_000_000, 2_000_000_000_000_000_000))
+    changed = client.get("/api/views/map.html", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.content == b"<html>nouvelle carte</html>"
+    assert changed.headers["etag"] != etag
+
+
+class _FakeStore:
+    def __init__(self) -> None:
+        self.turns: list[tuple[str, str, str]] = []
+        self.titles: dict[str, str] = {}
+
+    async def get_context(self, session_id: str | None) -> None:
+        return None
+
+    async def create_session(self) -> str:
+        return "s1"
+
+    async def record_turn(self, session_id: str, user: str, answer: str, **_: object) -> None:
+        self.turns.append((session_id, user, answer))
+
+    async def update_title(self, session_id: str, title: str) -> None:
+        self.titles[session_id] = title
+
+
+class _FakeAgent:
+    def __init__(self) -> None:
+        self.outcome = AgentOutcome(
+            answer="Bonjour !",
+            fetch=None,
+            analysis=None,
+            map_file=None,
+            web_result=None,
+            intent=ConversationIntent.GENERAL,
+        )
+
+    async def arun(self, message: str, **_: object) -> AgentOutcome:
+        return self.outcome
+
+    async def astream(self, message: str, **_: object) -> AsyncIterator[object]:
+        yield "Bon"
+        yield "jour !"
+        yield self.outcome
+
+    async def abuild_title(self, message: str, answer: str) -> str:
+        return "Salutations"
+
+
+@pytest.fixture
+def store(monkeypatch: pytest.MonkeyPatch) -> _FakeStore:
+    monkeypatch.setattr(routes, "city_agent", _FakeAgent())
+    return _FakeStore()
+
+
+def test_chat_records_the_turn_before_answering(store: _FakeStore) -> None:
+    background = BackgroundTasks()
+
+    response = asyncio.run(routes.chat(ChatRequest(message="Salut"), background, history_store=store))
+
+    assert orjson.loads(response.body)["answer"] == "Bonjour !"
+    assert store.turns == [("s1", "Salut", "Bonjour !")]  # not left to a background task
+    assert [task.func for task in background.tasks] == [routes._generate_title]
+    assert store.titles == {}
+
+
+def test_chat_stream_records_the_turn_before_done(store: _FakeStore) -> None:
+    async def consume() -> list[tuple[bytes, list]]:
+        response = await routes.chat_stream(ChatRequest(message="Salut"), history_store=store)
+        seen = []
+        async for chunk in response.body_iterator:
+            seen.append((chunk.split(b"\n", 1)[0], list(store.turns)))
+        await response.background()
+        return seen
+
+    seen = asyncio.run(consume())
+
+    assert [event for event, _ in seen] == [b"event: session", b"event: delta", b"event: delta", b"event: done"]
+    assert seen[-1][1] == [("s1", "Salut", "Bonjour !")]  # stored when the client sees "done"
+    assert store.titles == {"s1": "Salutations"}
+
+
+def test_chat_stream_sends_server_sent_events(client: TestClient, store: _FakeStore) -> None:
+    client.app.dependency_overrides[routes.get_history_store] = lambda: store
+
+    response = client.post("/api/chat/stream", json={"message": "Salut"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["x-accel-buffering"] == "no"
+    events = [block.split("\ndata: ") for block in response.text.split("\n\n") if block]
+    assert [name for name, _ in events] == ["event: session", "event: delta", "event: delta", "event: done"]
+    assert [orjson.loads(data) for _, data in events[:3]] == [
+        {"session_id": "s1"},
+        {"text": "Bon"},
+        {"text": "jour !"},
+    ]
+    done = orjson.loads(events[-1][1])
+    assert (done["session_id"], done["answer"]) == ("s1", "Bonjour !")
+    assert store.titles == {"s1": "Salutations"}
+
+
+def test_chat_stream_requires_history(client: TestClient, store: _FakeStore) -> None:
+    client.app.dependency_overrides[routes.get_history_store] = lambda: None
+
+    assert client.post("/api/chat/stream", json={"message": "Salut"}).status_code == 503
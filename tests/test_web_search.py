@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+
+from city_insights_api.services.web_search import MAX_SOURCES, WebSearchTool
+
+
+class _Response:
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.data = data
+
+    def model_dump(self) -> dict[str, Any]:
+        return self.data
+
+
+def test_sources_keep_document_order_without_duplicates() -> None:
+    tool = WebSearchTool(client=SimpleNamespace())
+    annotations = [{"type": "url_citation", "url": f"https://example.test/{index}"} for index in range(8)]
+    response = _Response(
+        {
+            "output": [
+                {"type": "web_search_call", "action": {"sources": [{"url": "https://example.test/0"}]}},
+                {"type": "message", "content": [{"type": "output_text", "annotations": annotations}]},
+            ]
+        }
+    )
+
+    sources = tool._extract_sources(response)
+
+    assert sources == [f"https://example.test/{index}" for index in range(MAX_SOURCES)]